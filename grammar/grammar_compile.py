@@ -6,16 +6,32 @@ Compile a thrax grammar and the utf8 to word FST. The utf8 to word FST has to be
 word symbol table that is used for language model creation, if the grammar is going to be used with
 that language model.
 
+Per default the composition is computed eagerly in memory. For large vocabularies use --lookahead: the grammar is
+converted into an output label lookahead FST, the utf8 to word FST is relabeled accordingly (label-reachable
+relabeling), and the composition uses the lookahead filter, such that dead-end paths are never expanded. The steps
+run as OpenFst command line tools on files, so only one intermediate FST is in memory at a time.
+With --fst_type the result can be written in a compact on-disk type (e.g. const).
+
+    python3 grammar_compile.py grammar.fst utf8_to_words.fst grammar_words.fst --lookahead --fst_type const
+
+Be sure to have the OpenFst command line tools installed with lookahead FST support (--enable-lookahead-fsts)
+for --lookahead: http://www.openfst.org
+
 """
 
-import sys
+import os
+import argparse
+import resource
+import subprocess
+import tempfile
+from timeit import default_timer as timer
 import pynini as pn
+import pywrapfst as fst
 
+FST_TYPES = ['vector', 'const', 'compact_unweighted']
 
-def main():
-    grammarfile = sys.argv[1]
-    utf8_word_fst_file = sys.argv[2]
-    output_fst = sys.argv[3]
+
+def compile_eager(grammarfile, utf8_word_fst_file, output_fst, fst_type='vector'):
 
     inp_grammar = pn.Fst.read(grammarfile)
     utf8_word_fst = pn.Fst.read(utf8_word_fst_file)
@@ -24,8 +40,93 @@ def main():
     mapped = pn.arcmap(grammar, map_type="arc_sum")
     mapped.arcsort()
 
-    mapped.write(output_fst)
+    if fst_type == 'vector':
+        mapped.write(output_fst)
+    else:
+        fst.convert(mapped, fst_type=fst_type).write(output_fst)
+
+    return {'states': mapped.num_states(), 'arcs': sum(mapped.num_arcs(state) for state in mapped.states())}
+
+
+def run_step(name, cmd):
+    start = timer()
+    subprocess.check_call(cmd, shell=True)
+    peak_mem = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print('{}: {:.2f} sec, peak memory so far: {} kB'.format(name, timer() - start, peak_mem))
+
+
+def compile_lookahead(grammarfile, utf8_word_fst_file, output_fst, fst_type='vector'):
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        grammar_la = os.path.join(tmp_dir, 'grammar_la.fst')
+        relabel_pairs = os.path.join(tmp_dir, 'relabel.pairs')
+        lexicon_relabeled = os.path.join(tmp_dir, 'utf8_word_relabeled.fst')
+        composed = os.path.join(tmp_dir, 'composed.fst')
+        mapped = os.path.join(tmp_dir, 'mapped.fst')
+
+        cmd = "fstconvert --fst_type=olabel_lookahead --save_relabel_opairs={} {} {}".format(
+            relabel_pairs, grammarfile, grammar_la)
+        run_step('lookahead conversion', cmd)
+        cmd = "fstrelabel --relabel_ipairs={} {} | fstarcsort --sort_type=ilabel - {}".format(
+            relabel_pairs, utf8_word_fst_file, lexicon_relabeled)
+        run_step('relabeling', cmd)
+        cmd = "fstcompose {} {} {}".format(grammar_la, lexicon_relabeled, composed)
+        run_step('lookahead composition', cmd)
+        cmd = "fstrmepsilon {} | fstmap --map_type=arc_sum - | fstarcsort - {}".format(composed, mapped)
+        run_step('rmepsilon/arc_sum/arcsort', cmd)
+        if fst_type == 'vector':
+            os.replace(mapped, output_fst)
+        else:
+            cmd = "fstconvert --fst_type={} {} {}".format(fst_type, mapped, output_fst)
+            run_step('conversion to ' + fst_type, cmd)
+
+    return fst_info(output_fst)
+
+
+def fst_info(fst_file):
+    """
+    Reads number of states and arcs of fst_file from fstinfo, without loading the FST into this process.
+    """
+    info = subprocess.check_output("fstinfo {}".format(fst_file), shell=True).decode('utf-8')
+    counts = {}
+    for line in info.splitlines():
+        if line.startswith('# of states'):
+            counts['states'] = int(line.split()[-1])
+        elif line.startswith('# of arcs'):
+            counts['arcs'] = int(line.split()[-1])
+
+    return counts
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("grammarfile", type=str, help='the compiled thrax grammar')
+    parser.add_argument("utf8_word_fst", type=str, help='the utf8 to word FST (see utf8_to_wordsyms.py)')
+    parser.add_argument("output_fst", type=str, help='the composed grammar')
+    parser.add_argument("--lookahead", action='store_true',
+                        help='memory bounded composition with lookahead/label-reachable filters')
+    parser.add_argument("--fst_type", type=str, default='vector', choices=FST_TYPES,
+                        help='FST type of the output, compact_unweighted drops the weights of the grammar')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+
+    start = timer()
+    if args.lookahead:
+        counts = compile_lookahead(args.grammarfile, args.utf8_word_fst, args.output_fst, args.fst_type)
+    else:
+        counts = compile_eager(args.grammarfile, args.utf8_word_fst, args.output_fst, args.fst_type)
+    duration = timer() - start
+
+    peak_mem = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print('Compiled {} in {:.2f} sec'.format(args.output_fst, duration))
+    print('Peak memory: {} kB'.format(peak_mem))
+    print('States: {}, arcs: {}'.format(counts.get('states'), counts.get('arcs')))
 
 
 if __name__=='__main__':
-    main()
\ No newline at end of file
+    main()
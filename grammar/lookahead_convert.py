@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Convert the runtime grammars of the normalizer (classify/TOKENIZE_AND_CLASSIFY and verbalize_tags/ALL) into input
+label lookahead FSTs. The input labels of the grammar are relabeled such that the labels reachable from a state
+form intervals, the relabel pairs are written to '<output_fst>.relabel'. At runtime the input strings are
+relabeled accordingly and composed with the lookahead matcher (see normalizing/lookahead_grammar.py).
+
+    python3 lookahead_convert.py thrax_grammar/classify/TOKENIZE_AND_CLASSIFY \
+        thrax_grammar/classify/TOKENIZE_AND_CLASSIFY_lookahead
+
+Configure the converted grammars as 'classifier lookahead grammar' and 'verbalizer lookahead grammar' in
+normalizer.conf (see normalizing/normalizer_config.py) and run the normalizer with lookahead=True.
+
+Be sure to have the OpenFst command line tools installed with lookahead FST support (--enable-lookahead-fsts):
+http://www.openfst.org
+
+"""
+
+import os
+import argparse
+import tempfile
+from timeit import default_timer as timer
+from grammar_compile import run_step, fst_info
+
+RELABEL_EXTENSION = '.relabel'
+
+
+def convert_to_lookahead(grammarfile, output_fst):
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sorted_fst = os.path.join(tmp_dir, 'grammar_sorted.fst')
+        cmd = "fstarcsort --sort_type=ilabel {} {}".format(grammarfile, sorted_fst)
+        run_step('arcsort', cmd)
+        cmd = "fstconvert --fst_type=ilabel_lookahead --save_relabel_ipairs={} {} {}".format(
+            output_fst + RELABEL_EXTENSION, sorted_fst, output_fst)
+        run_step('lookahead conversion', cmd)
+
+    return fst_info(output_fst)
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("grammarfile", type=str, help='a runtime grammar FST (classifier or verbalizer)')
+    parser.add_argument("output_fst", type=str, help='the grammar as ilabel_lookahead FST')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+
+    start = timer()
+    counts = convert_to_lookahead(args.grammarfile, args.output_fst)
+    print('Converted {} in {:.2f} sec'.format(args.output_fst, timer() - start))
+    print('States: {}, arcs: {}'.format(counts.get('states'), counts.get('arcs')))
+    print('Relabel pairs: ' + args.output_fst + RELABEL_EXTENSION)
+
+
+if __name__ == '__main__':
+    main()
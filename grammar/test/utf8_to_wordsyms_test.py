@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import itertools
+
+import pynini as pn
+
+import utf8_to_wordsyms
+from utf8_to_wordsyms import build_lexicon_fst, compile_legacy, compile_utf8_to_words_trie
+
+WORDS = ['a', 'ab', 'abc', 'ac', 'aftur', 'b', 'bað', 'baki', 'bakinu', 'ð']
+
+
+def output_labels(lexicon_fst, labels):
+    # the word labels the lexicon FST outputs for the utf8 labels, None if they are not accepted
+    inp = pn.Fst()
+    state = inp.add_state()
+    inp.set_start(state)
+    for label in labels:
+        next_state = inp.add_state()
+        inp.add_arc(state, pn.Arc(label, label, pn.Weight.one(inp.weight_type()), next_state))
+        state = next_state
+    inp.set_final(state)
+    composed = pn.compose(inp, lexicon_fst)
+    if composed.start() == -1:
+        return None
+    path = pn.shortestpath(composed).topsort()
+    olabels = []
+    state = path.start()
+    while path.num_arcs(state):
+        arc = next(iter(path.arcs(state)))
+        if arc.olabel:
+            olabels.append(arc.olabel)
+        state = arc.nextstate
+    return olabels
+
+
+class TestLexiconFst(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.utf8_file = os.path.join(self.tmp_dir.name, 'utf8.syms')
+        self.utf8_symbols = pn.SymbolTable()
+        self.utf8_symbols.add_symbol('<eps>', 0)
+        self.utf8_symbols.add_symbol('0x0020', 32)
+        for c in 'abcfiknrtuð':
+            self.utf8_symbols.add_symbol(c, ord(c))
+        self.utf8_symbols.write_text(self.utf8_file)
+        self.word_file = os.path.join(self.tmp_dir.name, 'words.txt')
+        with open(self.word_file, 'w') as f:
+            f.write('<eps> 0\n')
+            for i, word in enumerate(WORDS):
+                f.write('{} {}\n'.format(word, i + 1))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def labels(self, words):
+        return [label for wrd in words for label in utf8_to_wordsyms.word_labels(wrd, self.utf8_symbols)]
+
+    def test_same_as_legacy(self):
+        # make_lexicon_fst.pl is called from the directory of the script
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(utf8_to_wordsyms.__file__)))
+        try:
+            legacy = compile_legacy(self.word_file, self.utf8_file, self.tmp_dir.name)
+        finally:
+            os.chdir(cwd)
+        trie = compile_utf8_to_words_trie(self.word_file, self.utf8_file)
+        for words in itertools.product(WORDS, repeat=2):
+            expected = [WORDS.index(wrd) + 1 for wrd in words]
+            self.assertEqual(expected, output_labels(legacy, self.labels(words)), words)
+            self.assertEqual(expected, output_labels(trie, self.labels(words)), words)
+        self.assertIsNone(output_labels(trie, self.labels(['ba'])))
+
+    def test_duplicates(self):
+        lexicon_fst = build_lexicon_fst(sorted([([97, 98, 32], 5), ([97, 98, 32], 6), ([97, 99, 32], 7)]))
+        self.assertEqual([5], output_labels(lexicon_fst, [97, 98, 32]))
+        self.assertEqual([7], output_labels(lexicon_fst, [97, 99, 32]))
+
+
+if __name__ == '__main__':
+    unittest.main()
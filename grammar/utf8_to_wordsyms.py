@@ -26,14 +26,29 @@ Example ('3' is the symbol for 'aftur' in the word-symbol table):
 
     ('a':0 -> 'f':0 -> 't':'aftur' -> 'u':0 -> 'r':0 -> ' ':0)
 
+The lexicon FST is built directly in memory as a prefix tree: words share the states of their common prefixes, the
+word label is output on the arc where the word becomes unambiguous (in the example 'aftur' is the only word in the
+table starting with 'aft') and the remaining suffixes are shared between words. The result is deterministic on the
+input side, no closure()/optimize() is needed. The old path (temporary files, make_lexicon_fst.pl, closure and
+optimize) is still available with --legacy, --benchmark compares both on synthetic vocabularies:
+
+    python3 utf8_to_wordsyms.py word_syms.txt utf8.syms
+    python3 utf8_to_wordsyms.py word_syms.txt utf8.syms --benchmark 100000 1000000
+
 """
 
-import sys
 import os
+import argparse
+import random
+import resource
+import tempfile
+import multiprocessing
+from timeit import default_timer as timer
 import pynini as pn
 import pywrapfst as fst
 
 SPACE = '0x%04x' % ord(' ')
+LOOP_STATE = 0
 
 
 def convert_words2utf8(sym_table_file):
@@ -141,21 +156,230 @@ def compile_utf8_to_words(wordsymbolfile, utf8symbolfile, lex_fst_file):
     compiled.optimize()  # same as fstdeterminizestar | fstminimize ?
     compiled.arcsort()
 
-    lex_filename = wordsymbolfile.split('/')
-    lex_basename = os.path.splitext(lex_filename[-1])[0]
-    compiled.write('utf8_to_words_{}.fst'.format(lex_basename))
+    return compiled
 
 
-def main():
+def word_labels(word, utf8syms):
+    """
+    Converts a word into the list of its utf8 symbol labels, followed by the label for SPACE.
+    Returns None if a character of the word is not in the utf8 symbol table.
+    """
+    labels = []
+    for c in word + ' ':
+        label = utf8syms.find(c)
+        if label == -1:
+            # space and non-printable characters are stored with their hex-value in the utf8 table
+            label = utf8syms.find('0x%04x' % ord(c))
+        if label == -1:
+            return None
+        labels.append(label)
+
+    return labels
+
+
+def read_lexicon(wordsymbolfile, utf8syms):
+    """
+    Reads the word-symbol table and returns a list of (utf8 labels, word symbol) tuples, sorted by the labels.
+    """
+    lexicon = []
+    with open(wordsymbolfile) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            word, sym = line.split()
+            if word == '<eps>':
+                continue
+            labels = word_labels(word, utf8syms)
+            if labels is None:
+                print("symbol(s) of {} not found, skipping word!".format(word))
+                continue
+            lexicon.append((labels, int(sym)))
+    lexicon.sort()
+
+    return lexicon
+
+
+def common_prefix_length(arr1, arr2):
+    length = 0
+    for a, b in zip(arr1, arr2):
+        if a != b:
+            break
+        length += 1
+
+    return length
+
+
+def build_lexicon_fst(lexicon):
+    """
+    Builds the utf8-to-word FST as a prefix tree in one pass over the sorted lexicon.
+
+    Each word is a path from the loop state (start and final) back to the loop state, ending with SPACE. Since the
+    lexicon is sorted, the longest prefix a word shares with any other word is the one shared with one of its
+    neighbours; the states of that prefix are shared (epsilon output), the word label is output on the next arc and
+    the rest of the word is a suffix chain, shared by all words ending in the same suffix.
+
+    :param lexicon: a list of (utf8 labels, word symbol) tuples, sorted by the labels, see read_lexicon()
+    :return: an input deterministic FST mapping utf8 sequences to words
+    """
+    lexicon_fst = pn.Fst()
+    one = pn.Weight(lexicon_fst.weight_type(), 0)
+    loop_state = lexicon_fst.add_state()
+    lexicon_fst.set_start(loop_state)
+    lexicon_fst.set_final(loop_state)
+
+    # prefix_states[k]: state reached after the first k labels of the previous word (up to its unambiguous point)
+    prefix_states = [loop_state]
+    suffix_states = {}
+
+    def suffix_state(suffix):
+        # the state accepting 'suffix' (ending in SPACE) and going back to the loop state, created once per suffix
+        state = loop_state
+        for k in range(len(suffix) - 1, -1, -1):
+            key = suffix[k:]
+            if key not in suffix_states:
+                suffix_states[key] = lexicon_fst.add_state()
+                lexicon_fst.add_arc(suffix_states[key], pn.Arc(suffix[k], 0, one, state))
+            state = suffix_states[key]
+        return state
+
+    # of words with the same labels only the first one (the lowest symbol) is kept
+    unique_lexicon = []
+    for labels, sym in lexicon:
+        if unique_lexicon and unique_lexicon[-1][0] == labels:
+            print("duplicate word for symbol {}, skipping!".format(sym))
+            continue
+        unique_lexicon.append((labels, sym))
+
+    prev_labels = []
+    for i, (labels, sym) in enumerate(unique_lexicon):
+        prev_prefix = common_prefix_length(labels, prev_labels)
+        next_prefix = 0
+        if i + 1 < len(unique_lexicon):
+            next_prefix = common_prefix_length(labels, unique_lexicon[i + 1][0])
+        # the word is unambiguous after reading labels[:unique + 1]
+        unique = max(prev_prefix, next_prefix)
+
+        del prefix_states[prev_prefix + 1:]
+        for k in range(prev_prefix, unique):
+            state = lexicon_fst.add_state()
+            lexicon_fst.add_arc(prefix_states[k], pn.Arc(labels[k], 0, one, state))
+            prefix_states.append(state)
+        next_state = suffix_state(tuple(labels[unique + 1:]))
+        lexicon_fst.add_arc(prefix_states[unique], pn.Arc(labels[unique], sym, one, next_state))
+        prev_labels = labels
+
+    return lexicon_fst
+
 
-    wordsymbolfile = sys.argv[1]
-    utf8symbolfile = sys.argv[2]
+def compile_utf8_to_words_trie(wordsymbolfile, utf8symbolfile):
 
+    utf8syms = pn.SymbolTable.read_text(utf8symbolfile)
+    words2syms = pn.SymbolTable.read_text(wordsymbolfile)
+
+    compiled = build_lexicon_fst(read_lexicon(wordsymbolfile, utf8syms))
+    compiled.set_input_symbols(utf8syms)
+    compiled.set_output_symbols(words2syms)
+    compiled.arcsort()
+
+    return compiled
+
+
+def compile_legacy(wordsymbolfile, utf8symbolfile, tmp_dir='.'):
     words2utf8 = convert_words2utf8(wordsymbolfile)
-    write_list(words2utf8, 'words2utf8.tmp')
-    make_lexicon_fst('words2utf8.tmp', 'lexicon_fst.txt')
+    words2utf8_file = os.path.join(tmp_dir, 'words2utf8.tmp')
+    lexicon_file = os.path.join(tmp_dir, 'lexicon_fst.txt')
+    write_list(words2utf8, words2utf8_file)
+    make_lexicon_fst(words2utf8_file, lexicon_file)
+
+    return compile_utf8_to_words(wordsymbolfile, utf8symbolfile, lexicon_file)
+
+
+def count_arcs(compiled):
+    return sum(compiled.num_arcs(state) for state in compiled.states())
+
 
-    compile_utf8_to_words(wordsymbolfile, utf8symbolfile, 'lexicon_fst.txt')
+#
+# BENCHMARK
+#
+
+def create_vocabulary(utf8symbolfile, size, seed=1):
+    """
+    Creates 'size' distinct random words over the letters of the utf8 symbol table, with a word length distribution
+    roughly like running text. Only used for benchmarking.
+    """
+    utf8syms = pn.SymbolTable.read_text(utf8symbolfile)
+    alphabet = [c for c in 'aábdðeéfghiíjklmnoóprstuúvxyýþæö' if utf8syms.find(c) != -1]
+    rand = random.Random(seed)
+    vocabulary = set()
+    while len(vocabulary) < size:
+        length = min(3 + int(rand.expovariate(0.25)), 25)
+        vocabulary.add(''.join(rand.choice(alphabet) for _ in range(length)))
+
+    return sorted(vocabulary)
+
+
+def run_benchmark_compilation(method, wordsymbolfile, utf8symbolfile, result_queue):
+    # runs in its own process, such that the peak memory of each method is measured separately
+    start = timer()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if method == 'legacy':
+            compiled = compile_legacy(wordsymbolfile, utf8symbolfile, tmp_dir)
+        else:
+            compiled = compile_utf8_to_words_trie(wordsymbolfile, utf8symbolfile)
+    duration = timer() - start
+    peak_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + \
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    result_queue.put((duration, peak_mem, compiled.num_states(), count_arcs(compiled)))
+
+
+def benchmark(utf8symbolfile, sizes):
+    print('words\tmethod\tseconds\tpeak_mem_kb\tstates\tarcs')
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wordsymbolfile = os.path.join(tmp_dir, 'bench_words.txt')
+            with open(wordsymbolfile, 'w') as f:
+                f.write('<eps> 0\n')
+                for i, word in enumerate(create_vocabulary(utf8symbolfile, size)):
+                    f.write('{} {}\n'.format(word, i + 1))
+            for method in ['legacy', 'trie']:
+                result_queue = multiprocessing.Queue()
+                proc = multiprocessing.Process(target=run_benchmark_compilation,
+                                               args=(method, wordsymbolfile, utf8symbolfile, result_queue))
+                proc.start()
+                duration, peak_mem, states, arcs = result_queue.get()
+                proc.join()
+                print('{}\t{}\t{:.2f}\t{}\t{}\t{}'.format(size, method, duration, peak_mem, states, arcs))
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wordsymbolfile", type=str, help='the word-symbol table of the language model')
+    parser.add_argument("utf8symbolfile", type=str, help='the utf8-symbol table')
+    parser.add_argument("--legacy", action='store_true',
+                        help='compile through make_lexicon_fst.pl and closure()/optimize() as before')
+    parser.add_argument("--benchmark", type=int, nargs='+', default=None, metavar='N',
+                        help='compare legacy and prefix tree compilation on synthetic vocabularies of N words')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    wordsymbolfile = args.wordsymbolfile
+    utf8symbolfile = args.utf8symbolfile
+
+    if args.benchmark:
+        benchmark(utf8symbolfile, args.benchmark)
+        return
+
+    if args.legacy:
+        compiled = compile_legacy(wordsymbolfile, utf8symbolfile)
+    else:
+        compiled = compile_utf8_to_words_trie(wordsymbolfile, utf8symbolfile)
+
+    lex_filename = wordsymbolfile.split('/')
+    lex_basename = os.path.splitext(lex_filename[-1])[0]
+    compiled.write('utf8_to_words_{}.fst'.format(lex_basename))
 
 
 if __name__=='__main__':
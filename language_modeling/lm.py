@@ -11,6 +11,13 @@ pass the word-symbol file to use as argument.
 Remember if you are preparing text normalization that the word-symbol table used to create the language model
 has to be the same table used for the grammar and expansion algorithm.
 
+For a low-memory deployment ('compact' profile of the normalizer) the model can be pruned with ngramshrink, either
+with a threshold (--theta for relative entropy/seymore, --count_pattern for count pruning) or to one or more target
+sizes (--target_ngrams). With --compact the resulting FSTs are arcsorted, their weights quantized and they are
+converted into a read-only compact FST type (const or ngram), which the normalizer loads without copying:
+
+    python3 lm.py corpus.txt --word_symbol words.sym --prune relative_entropy --target_ngrams 1000000 --compact
+
 Be sure to have OpenGRM installed: http://www.openfst.org/twiki/bin/view/GRM/NGramLibrary
 """
 import os
@@ -42,15 +49,7 @@ def make_ngram_lm(corpus, word_syms=None, order=3):
     subprocess.call(cmd, shell=True)
     cmd = "ngrammake {}.cnt > {}.mod".format(corpus_basename, corpus_basename)
     subprocess.call(cmd, shell=True)
-    #ADD PRUNING:
-    #cmd = "ngramshrink --method=relative_entropy --theta=1.0e-7 {}.mod > {}_re_pruned.mod".format(corpus_basename, corpus_basename)
-    #cmd = "ngramshrink --count_pattern=2+:1 {}.mod > {}_count_pruned.mod".format(corpus_basename,
-    #                                                                                              corpus_basename)
-    #subprocess.call(cmd, shell=True)
-    cmd = "fstprint {}.mod | perl s2eps.pl > {}_s2eps.txt".format(corpus_basename, corpus_basename)
-    subprocess.call(cmd, shell=True)
-    cmd = "fstcompile --isymbols={} --osymbols={} {}_s2eps.txt > {}.fst".format(word_syms, word_syms, corpus_basename, corpus_basename)
-    subprocess.call(cmd, shell=True)
+    mod_to_fst(corpus_basename, word_syms)
     """
     cmd = "fstprint {}.mod | perl s2eps.pl | fstcompile --{i,o}symbols={} --keep_{i,o}symbols=false > {}.fst".format(
         corpus_basename, word_syms, corpus_basename)
@@ -69,6 +68,66 @@ def make_ngram_lm(corpus, word_syms=None, order=3):
     cmd = "ngraminfo {}.fst".format(corpus_basename)
     subprocess.call(cmd, shell=True)
 
+    return corpus_basename
+
+
+def mod_to_fst(model_basename, word_syms):
+    # replace <s> and </s> by epsilons and compile the model with the word-symbol table
+    cmd = "fstprint {}.mod | perl s2eps.pl > {}_s2eps.txt".format(model_basename, model_basename)
+    subprocess.call(cmd, shell=True)
+    cmd = "fstcompile --isymbols={} --osymbols={} {}_s2eps.txt > {}.fst".format(word_syms, word_syms, model_basename, model_basename)
+    subprocess.call(cmd, shell=True)
+
+
+def prune_ngram_lm(model_basename, word_syms, method, theta=None, count_pattern=None, target_ngrams=None):
+    """
+    Prunes '{model_basename}.mod' with ngramshrink and compiles the pruned model(s) to FSTs.
+    Creates one model per target size in target_ngrams, or one model for the given theta/count_pattern.
+
+    :return: a list of the basenames of the pruned models
+    """
+    if method == 'count_prune':
+        if not count_pattern:
+            count_pattern = '2+:1'
+        options = ['--count_pattern={}'.format(count_pattern)]
+        suffixes = ['count_pruned']
+    elif target_ngrams:
+        options = ['--target_number_of_ngrams={}'.format(size) for size in target_ngrams]
+        suffixes = ['{}_pruned_{}'.format(method, size) for size in target_ngrams]
+    else:
+        if not theta:
+            theta = 1.0e-7
+        options = ['--theta={}'.format(theta)]
+        suffixes = ['{}_pruned'.format(method)]
+
+    pruned_models = []
+    for option, suffix in zip(options, suffixes):
+        pruned_basename = '{}_{}'.format(model_basename, suffix)
+        logging.info(" Pruning {}.mod ({} {}) ...".format(model_basename, method, option))
+        cmd = "ngramshrink --method={} {} {}.mod > {}.mod".format(method, option, model_basename, pruned_basename)
+        subprocess.call(cmd, shell=True)
+        mod_to_fst(pruned_basename, word_syms)
+        cmd = "ngraminfo {}.mod".format(pruned_basename)
+        subprocess.call(cmd, shell=True)
+        pruned_models.append(pruned_basename)
+
+    return pruned_models
+
+
+def make_compact_fst(model_basename, fst_type='const', quantize_delta=0.01):
+    """
+    Converts '{model_basename}.fst' into '{model_basename}_compact.fst': sorted on the input labels (the normalizer
+    can't sort a read-only FST at runtime), weights quantized to multiples of quantize_delta and stored as fst_type.
+    """
+    compact_file = '{}_compact.fst'.format(model_basename)
+    cmd = "fstarcsort --sort_type=ilabel {}.fst | fstmap --map_type=quantize --delta={} | fstconvert --fst_type={} > {}".format(
+        model_basename, quantize_delta, fst_type, compact_file)
+    subprocess.call(cmd, shell=True)
+    logging.info(" Compact language model created in: '{}' ({} bytes, original {} bytes)".format(
+        compact_file, os.path.getsize(compact_file), os.path.getsize(model_basename + '.fst')))
+
+    return compact_file
+
 
 def arguments():
     parser = argparse.ArgumentParser()
@@ -78,6 +137,20 @@ def arguments():
                         help='word-symbol table for the language model')
     parser.add_argument("--order", type=int, default=3,
                         help='size of n-gram to use for model training')
+    parser.add_argument("--prune", type=str, default=None, choices=['relative_entropy', 'seymore', 'count_prune'],
+                        help='additionally create pruned model(s) with the given ngramshrink method')
+    parser.add_argument("--theta", type=float, default=None,
+                        help='pruning threshold for relative_entropy and seymore pruning (default 1.0e-7)')
+    parser.add_argument("--count_pattern", type=str, default=None,
+                        help='count pattern for count_prune (default 2+:1)')
+    parser.add_argument("--target_ngrams", type=int, nargs='+', default=None,
+                        help='prune to these model sizes (number of n-grams) instead of using --theta')
+    parser.add_argument("--compact", action='store_true',
+                        help='create compact, weight-quantized FSTs for the low-memory normalizer profile')
+    parser.add_argument("--compact_type", type=str, default='const', choices=['const', 'ngram'],
+                        help='FST type of the compact models (ngram needs the OpenFst ngram extension)')
+    parser.add_argument("--quantize_delta", type=float, default=0.01,
+                        help='weights of the compact models are quantized to multiples of this delta')
 
     return parser.parse_args()
 
@@ -90,7 +163,17 @@ def main():
     logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.DEBUG)
     logging.info(("\nCreating a {}-gram language model for '{}' using '{}'\n").format(ngram_order, corpus, word_sym))
 
-    make_ngram_lm(corpus, word_syms=word_sym, order=ngram_order)
+    model_basename = make_ngram_lm(corpus, word_syms=word_sym, order=ngram_order)
+    if word_sym is None:
+        word_sym = os.path.splitext(corpus)[0] + '_words.sym'
+
+    models = [model_basename]
+    if args.prune:
+        models = prune_ngram_lm(model_basename, word_sym, args.prune, theta=args.theta,
+                                count_pattern=args.count_pattern, target_ngrams=args.target_ngrams)
+    if args.compact:
+        for model in models:
+            make_compact_fst(model, fst_type=args.compact_type, quantize_delta=args.quantize_delta)
 
 
 if __name__=='__main__':
@@ -8,6 +8,12 @@ License: Apache 2.0
 
 Scores an input sentence or text from file according to a given language model (in .arpa format).
 
+In batch mode (--batch) the input file is streamed line by line and each line is scored as a sentence, spread over
+several worker processes. Output is one TSV row per input line: score, perplexity, number of OOVs and the line.
+Corpus perplexity and throughput are printed at the end. For batch mode convert the model to the kenlm binary format
+first (build_binary model.arpa model.bin), binary models are memory mapped and shared by all workers through the page
+cache, while an .arpa model is parsed into the memory of each worker.
+
 Uses the python module for kenlm language modeling toolkit:
 
 https://github.com/kpu/kenlm
@@ -17,9 +23,16 @@ pip install -e kenlm-master
 """
 
 import os
+import sys
 import argparse
+import collections
+import multiprocessing
+from timeit import default_timer as timer
 import kenlm
 
+# the language model of a batch scoring worker process, see init_worker()
+worker_model = None
+
 
 def score_input(lm, input):
 
@@ -42,10 +55,108 @@ def full_score(lm, input):
     print("")
 
 
+def init_worker(lm_file):
+    global worker_model
+    config = kenlm.Config()
+    # binary models are mmapped without reading them into memory, shared between the workers
+    config.load_method = kenlm.LoadMethod.LAZY
+    worker_model = kenlm.Model(lm_file, config)
+
+
+def score_line(lm, line):
+    """
+    Scores one line as a sentence, with sentence begin and end markers.
+
+    :return: a tuple (log10 score, number of scored tokens incl. </s>, number of OOVs)
+    """
+    score = 0.0
+    tokens = 0
+    oovs = 0
+    for prob, length, oov in lm.full_scores(line):
+        score += prob
+        tokens += 1
+        if oov:
+            oovs += 1
+
+    return score, tokens, oovs
+
+
+def score_batch(lines):
+    return [score_line(worker_model, line) for line in lines]
+
+
+def read_batches(inp_file, batch_size):
+    batch = []
+    with open(inp_file) as f:
+        for line in f:
+            batch.append(line.rstrip('\n').lower())
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def write_scores(lines, scores, out, totals):
+    for line, (score, tokens, oovs) in zip(lines, scores):
+        perpl = 10.0 ** (-score / tokens)
+        out.write('{}\t{}\t{}\t{}\n'.format(score, perpl, oovs, line))
+        totals['lines'] += 1
+        totals['tokens'] += tokens
+        totals['score'] += score
+        totals['oovs'] += oovs
+
+
+def batch_score(lm_file, inp_file, out, workers, batch_size):
+    """
+    Streams inp_file line by line and scores each line on a pool of worker processes, writing a TSV row
+    (score, perplexity, oov count, line) per input line to out, in input order.
+    Only a bounded number of batches is in flight at any time, so memory use does not grow with the input size.
+
+    :return: a dictionary with the corpus totals
+    """
+    totals = {'lines': 0, 'tokens': 0, 'score': 0.0, 'oovs': 0}
+    max_pending = 2 * workers
+    start = timer()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(lm_file,)) as pool:
+        pending = collections.deque()
+        for batch in read_batches(inp_file, batch_size):
+            pending.append((batch, pool.apply_async(score_batch, (batch,))))
+            if len(pending) >= max_pending:
+                lines, result = pending.popleft()
+                write_scores(lines, result.get(), out, totals)
+        while pending:
+            lines, result = pending.popleft()
+            write_scores(lines, result.get(), out, totals)
+    totals['seconds'] = timer() - start
+
+    return totals
+
+
+def print_totals(totals):
+    if totals['tokens'] == 0:
+        print('No input to score', file=sys.stderr)
+        return
+    corpus_perpl = 10.0 ** (-totals['score'] / totals['tokens'])
+    seconds = max(totals['seconds'], 1e-9)
+    print('\nLINES: {}'.format(totals['lines']), file=sys.stderr)
+    print('TOKENS (incl. </s>): {}'.format(totals['tokens']), file=sys.stderr)
+    print('OOVS: {}'.format(totals['oovs']), file=sys.stderr)
+    print('CORPUS PERPLEXITY: {}'.format(corpus_perpl), file=sys.stderr)
+    print('THROUGHPUT: {:.1f} lines/sec, {:.1f} tokens/sec ({:.2f} sec)'.format(
+        totals['lines'] / seconds, totals['tokens'] / seconds, totals['seconds']), file=sys.stderr)
+
+
 def arguments():
     parser = argparse.ArgumentParser()
-    parser.add_argument("lm", type=str, help='the language model in arpa format')
+    parser.add_argument("lm", type=str, help='the language model in arpa format (or kenlm binary format for --batch)')
     parser.add_argument("input", type=str, help='text to score')
+    parser.add_argument("--batch", action='store_true',
+                        help='score each line of the input file separately, output one TSV row per line')
+    parser.add_argument("--output", type=str, default=None, help='TSV output file for --batch (default: stdout)')
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help='number of scoring processes for --batch')
+    parser.add_argument("--batch_size", type=int, default=1000,
+                        help='number of lines sent to a worker process at a time for --batch')
 
     return parser.parse_args()
 
@@ -55,6 +166,18 @@ def main():
     arpa_lm = args.lm
     inp = args.input
 
+    if args.batch:
+        if not os.path.isfile(inp):
+            print('Batch mode needs an input file, ' + inp + ' not found', file=sys.stderr)
+            sys.exit(1)
+        if args.output:
+            with open(args.output, 'w') as out:
+                totals = batch_score(arpa_lm, inp, out, args.workers, args.batch_size)
+        else:
+            totals = batch_score(arpa_lm, inp, sys.stdout, args.workers, args.batch_size)
+        print_totals(totals)
+        return
+
     if os.path.isfile(inp):
         text = open(inp).read()
     else:
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruning of the inflectional alternatives of a number verbalization by the case governed by the preceding word.
+
+The verbalizations of numbers carry the case in their tags, e.g. 'tveimur_tfkfþ' (dative), 'öðrum_lkeþvf'. After a
+preposition or a verb that governs a case, e.g. 'með' (accusative or dative) or 'vegna' (genitive), the
+alternatives in other cases are removed from the verbalization of the token before it is added to the LM lattice
+(Verbalized.extend_paths()), such that the lattice is smaller. The governed cases are read from a table of
+prepositions and common verbs (data/case_government.tsv: word, tab, case letters n/o/þ/e). In tag mode, the case in
+the IFD tag of a preposition (ao, aþ, ae) is used, the table only for words tagged as prepositions or verbs.
+
+Alternatives without a case tag are always kept, and a token is left unchanged if no alternative of one of its
+words would be left. The genitive alternatives are kept when the number may modify a following genitive noun
+('á 3 ára fresti'): in tag mode if the next word is tagged as a genitive noun, otherwise for every following word.
+
+The pruning is off by default ('case government' in normalizer_config.py). Before enabling it, compare the
+normalizations with and without pruning on a test corpus (agreement, LM lattice size and LM time):
+
+    python3 case_government.py test_sentences.txt --show_differences
+
+"""
+
+import re
+import argparse
+from timeit import default_timer as timer
+from utterance_structure.utt_coll import TokenType
+
+# the case of a numeral tag (tf + gender, number, case), an adjective tag (l + gender, number, case, declension)
+# and a reduced adjective tag (gender, number, case, 'vf')
+CASE_TAGS = [re.compile(r'^tf[kvh][ef]([noþe])$'), re.compile(r'^l[kvh][ef]([noþe])[sv]f$'),
+             re.compile(r'^[kvh][ef]([noþe])vf$')]
+# IFD tag of a preposition: a + the governed case
+PREPOSITION_TAG = re.compile(r'^a([oþe])$')
+# IFD tag of a verb
+VERB_TAG = re.compile(r'^s')
+# IFD tag of a noun: n + gender, number, case
+NOUN_TAG = re.compile(r'^n[kvhx][ef]([noþe])')
+
+
+def word_case(wrd):
+    """
+    Returns the case of a tagged verbalization word ('tveimur_tfkfþ' -> 'þ'), None if it has no case tag.
+    """
+    if '_' not in wrd:
+        return None
+    tag = wrd[wrd.index('_') + 1:]
+    for case_tag in CASE_TAGS:
+        match = case_tag.match(tag)
+        if match:
+            return match.group(1)
+    return None
+
+
+def count_alternatives(words):
+    return sum(count_alternatives(elem) if isinstance(elem, list) else 1 for elem in words)
+
+
+def split_tag(wrd):
+    # in tag mode the word of a token is 'word_tag', returns the word and the tag ('' without a tag)
+    return wrd.split('_', 1) if '_' in wrd else (wrd, '')
+
+
+class CaseGovernment:
+
+    def __init__(self, table):
+        """
+        :param table: a dictionary of words (lower case) to the set of cases they govern
+        """
+        self.table = table
+        self.stats = {'tokens': 0, 'pruned': 0, 'removed': 0}
+
+    @classmethod
+    def from_file(cls, filename):
+        table = {}
+        with open(filename) as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                wrd, cases = line.rstrip('\n').split('\t')
+                table[wrd.lower()] = set(cases)
+        return cls(table)
+
+    def governed_cases(self, tok):
+        """
+        Returns the set of cases governed by the word of tok, None if tok is not a known preposition or verb.
+        """
+        if tok.token_type == TokenType.SEMIOTIC_CLASS or not tok.word:
+            return None
+        wrd, tag = split_tag(tok.word)
+        match = PREPOSITION_TAG.match(tag)
+        if match:
+            return {match.group(1)}
+        if tag and not VERB_TAG.match(tag):
+            # e.g. 'að' as a conjunction or the infinitive marker
+            return None
+        return self.table.get(wrd.lower())
+
+    @staticmethod
+    def genitive_follows(tok):
+        """
+        Returns True if the word of tok may be a genitive noun the preceding number modifies ('á 3 ára fresti'):
+        in tag mode if it is tagged as a genitive noun, without a tag for every word.
+        """
+        if tok.token_type != TokenType.WORD or not tok.word:
+            return False
+        _, tag = split_tag(tok.word)
+        if not tag:
+            return True
+        match = NOUN_TAG.match(tag)
+        return bool(match) and match.group(1) == 'e'
+
+    def prune(self, tokens, ind, words):
+        """
+        Returns words, the verbalization of the semiotic class token tokens[ind] (as returned by
+        Verbalizer.verbalize_tokens()), without the alternatives in a case not governed by the preceding word.
+
+        :return: the pruned verbalization, words if there is no governing word or nothing would be left of a word
+        """
+        if ind == 0:
+            return words
+        cases = self.governed_cases(tokens[ind - 1])
+        if not cases:
+            return words
+        if ind + 1 < len(tokens) and self.genitive_follows(tokens[ind + 1]):
+            cases = cases | {'e'}
+        self.stats['tokens'] += 1
+        pruned = self._prune(words, cases)
+        if pruned is None:
+            return words
+        removed = count_alternatives(words) - count_alternatives(pruned)
+        if removed:
+            self.stats['pruned'] += 1
+            self.stats['removed'] += removed
+        return pruned
+
+    def print_stats(self):
+        print('Tokens after a governing word: {}, pruned: {}, alternatives removed: {}'.format(
+            self.stats['tokens'], self.stats['pruned'], self.stats['removed']))
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _prune(self, words, cases):
+        # a list of alternative words, a list of word slots or a list of incompatible paths (see Verbalized)
+        if all(isinstance(wrd, str) for wrd in words):
+            return self._prune_alternatives(words, cases)
+        if all(isinstance(slot, list) and all(isinstance(wrd, str) for wrd in slot) for slot in words):
+            return self._prune_slots(words, cases)
+        paths = [path for path in (self._prune_slots(path, cases) for path in words) if path is not None]
+        return paths or None
+
+    def _prune_slots(self, slots, cases):
+        pruned = [self._prune_alternatives(slot, cases) for slot in slots]
+        return None if None in pruned else pruned
+
+    @staticmethod
+    def _prune_alternatives(alternatives, cases):
+        kept = [wrd for wrd in alternatives if word_case(wrd) in cases or word_case(wrd) is None]
+        return kept or None
+
+
+def lattice_size(verbalization):
+    # number of word alternatives in the LM lattices of a verbalization
+    return sum(count_alternatives(path) for path in verbalization.paths)
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", type=str, help='test sentences, one per line')
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--tag_mode", action='store_true')
+    parser.add_argument("--show_differences", action='store_true')
+
+    return parser.parse_args()
+
+
+def main():
+    from normalizer import Normalizer
+    from utterance_structure.utt_coll import Utterance
+
+    args = arguments()
+    sentences = [line for line in open(args.corpus).read().splitlines() if line.strip()]
+    normalizers = {'unpruned': Normalizer(configfile=args.configfile, working_dir=args.working_dir,
+                                          tag_mode=args.tag_mode),
+                   'pruned': Normalizer(configfile=args.configfile, working_dir=args.working_dir,
+                                        tag_mode=args.tag_mode)}
+    if not normalizers['pruned'].verbalizer.case_government:
+        print('No case government table configured')
+        return
+    normalizers['unpruned'].verbalizer.case_government = None
+
+    results = {}
+    report = {}
+    for name, norm in normalizers.items():
+        results[name] = []
+        report[name] = {'lattice': 0, 'lm_time': 0.0}
+        for sent in sentences:
+            utt = Utterance(sent)
+            if norm.classify_utterance(utt):
+                verbalization = norm.verbalize_utterance_tokens(utt)
+                if verbalization:
+                    report[name]['lattice'] += lattice_size(verbalization)
+                    start = timer()
+                    norm.verbalizer.finalize(utt, verbalization)
+                    report[name]['lm_time'] += timer() - start
+            results[name].append(utt.normalized_sentence)
+
+    differences = [(sent, unpruned, pruned) for sent, unpruned, pruned
+                   in zip(sentences, results['unpruned'], results['pruned']) if unpruned != pruned]
+    agreement = 1 - len(differences) / len(sentences) if sentences else 1.0
+    print('\nSentences: {}, different normalizations: {}, agreement: {:.1%}'.format(len(sentences),
+                                                                                   len(differences), agreement))
+    if args.show_differences:
+        for sent, unpruned, pruned in differences:
+            print('{}\n\tunpruned: {}\n\tpruned:   {}'.format(sent, unpruned, pruned))
+    print('verbalization\tlattice alternatives\tLM time (s)')
+    for name in normalizers:
+        print('{}\t{}\t{:.2f}'.format(name, report[name]['lattice'], report[name]['lm_time']))
+    normalizers['pruned'].verbalizer.case_government.print_stats()
+
+
+if __name__ == '__main__':
+    main()
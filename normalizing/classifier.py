@@ -4,22 +4,45 @@
 """
 Classify an utterance according to a Thrax classifying grammar
 
+Several utterances can be classified with one composition (classify_batch()): the texts are joined with a
+boundary punctuation token that no semiotic class spans, and the shortest path is split back into one classified
+FST per text at the boundary tokens. The shortest path of the joined input is the concatenation of the shortest
+paths of the texts, such that the results are the same as classifying each text on its own. Texts starting with
+punctuation are the exception: the grammar only allows a punctuation token of its own after a space
+(TOKENIZE_AND_CLASSIFY is token_plus_punct (" " (token_plus_punct|p.PUNCT))*), and such a text may be classified
+differently or not at all on its own. The texts after the first one whose classification starts with a punctuation
+token are therefore classified again on their own.
 
 """
+import re
 import pynini as pn
 import pywrapfst
 from fst_compiler import FST_Compiler
+from profiler import fst_counts
+from model_registry import REGISTRY
 
 
 class Classifier:
 
     SPACE = '0x0020'
-
-    def __init__(self, path_to_grammar, utf8_symbols):
+    # joins the texts of a batch, the grammar classifies it as a punctuation token of its own
+    BATCH_BOUNDARY = ';'
+    BOUNDARY_TOKEN = 'tokens { name: ";" pause_length: PAUSE_MEDIUM phrase_break: true type: PUNCT }'
+    # a classified punctuation token, as of PUNCT in punctuation.grm
+    PUNCT_TOKEN = re.compile(r'tokens \{ name: "[^"]*" pause_length: PAUSE_[A-Z]+ phrase_break: true type: PUNCT \}')
+
+    def __init__(self, path_to_grammar, utf8_symbols, profiler=None, lookahead=False, owner=None):
+        # optional CompositionProfiler, records the size of the composition per classified text
+        self.profiler = profiler
+        # with lookahead, path_to_grammar is an ilabel_lookahead FST, see lookahead_grammar.py
+        self.lookahead_grammar = None
+        self.utf8_symbols = utf8_symbols
+        # the grammar is shared with other configurations in this process (see model_registry.py), read-only
         try:
-            self.thrax_grammar = pn.Fst.read(path_to_grammar)
-            self.thrax_grammar.arcsort()
-            self.utf8_symbols = utf8_symbols
+            if lookahead:
+                self.lookahead_grammar = REGISTRY.acquire('lookahead_grammar', path_to_grammar, owner)
+            else:
+                self.thrax_grammar = REGISTRY.acquire('grammar', path_to_grammar, owner)
         except IOError:
             #TODO: logging
             print('Could not read grammar from: ' + path_to_grammar)
@@ -39,19 +62,127 @@ class Classifier:
         print(classified_string)
         return classified_fst, classified_string
 
+    def classify_batch(self, texts):
+        """
+        Classifies the texts with one composition, the results are the same as of classify() for each text. If
+        the classified batch can't be split at the boundaries, the texts are classified one by one, texts that
+        might be classified differently on their own (see above) are classified again one by one.
 
-    def _create_classified_fst(self, text):
+        :param texts: a list of texts, tokenized (tokens separated by single spaces)
+        :return: a list of (FST, string) tuples as returned by classify(), one per text
+        """
+        if len(texts) < 2 or not all(texts):
+            return [self.classify(text) for text in texts]
 
+        separator = ' ' + self.BATCH_BOUNDARY + ' '
+        batch_fst = self._create_classified_fst(separator.join(texts), sem_class='batch')
+        classified_fsts = self._split_batch(batch_fst, texts, len(separator))
+        if classified_fsts is None:
+            #TODO: logging
+            print('Could not split the classified batch, classifying the sentences one by one')
+            return [self.classify(text) for text in texts]
+
+        results = []
+        for ind, classified_fst in enumerate(classified_fsts):
+            classified_string = self._create_classified_string(classified_fst).replace('<epsilon>', '')
+            if ind > 0 and self.PUNCT_TOKEN.match(classified_string):
+                # the punctuation token might only be valid after the boundary
+                results.append(self.classify(texts[ind]))
+                continue
+            print(classified_string)
+            results.append((classified_fst, classified_string))
+        return results
+
+    def _create_classified_fst(self, text, sem_class='sentence'):
+
+        if self.profiler:
+            start = self.profiler.start()
         compiler = FST_Compiler(self.utf8_symbols, None)
         inp_fst = compiler.fst_stringcompile(text)
-        all_fst = pn.compose(inp_fst, self.thrax_grammar)
+        if self.lookahead_grammar:
+            all_fst = self.lookahead_grammar.compose(inp_fst)
+        else:
+            all_fst = pn.compose(inp_fst, self.thrax_grammar)
         #all_fst.draw('all_class.dot')
         shortest_path = pn.shortestpath(all_fst).optimize()
+        if self.lookahead_grammar:
+            # the parser reads the token names from the input labels
+            self.lookahead_grammar.restore_input(shortest_path)
+        if self.profiler:
+            self.profiler.record('classify', text, sem_class, start, compose_counts=fst_counts(all_fst), paths=1)
         #shortest_path.draw('shortes_class.dot')
         shortest_path.rmepsilon()
 
         return shortest_path
 
+    def _split_batch(self, batch_fst, texts, separator_length):
+        # splits the classified path of the joined texts into the paths of the texts, None if the separators are
+        # not classified as a space, the boundary token and a space
+        arcs = self._path_arcs(batch_fst)
+        if arcs is None:
+            return None
+        # input position of the first and the last character of each separator
+        separators = []
+        position = 0
+        for text in texts[:-1]:
+            position += len(text)
+            separators.append((position, position + separator_length - 1))
+            position += separator_length
+        # split the arcs at the arcs consuming the separator spaces
+        boundaries = {}
+        position = 0
+        for ind, arc in enumerate(arcs):
+            if arc.ilabel:
+                boundaries[position] = ind
+                position += 1
+        if position != sum(len(text) for text in texts) + separator_length * len(separators):
+            return None
+
+        classified_fsts = []
+        text_start = 0
+        for first, last in separators:
+            separator_arcs = arcs[boundaries[first]:boundaries[last] + 1]
+            if [arc.olabel for arc in separator_arcs if arc.olabel] != self._separator_labels():
+                return None
+            classified_fsts.append(self._linear_fst(arcs[text_start:boundaries[first]]))
+            text_start = boundaries[last] + 1
+        classified_fsts.append(self._linear_fst(arcs[text_start:]))
+        return classified_fsts
+
+    @staticmethod
+    def _path_arcs(path):
+        # the arcs of a single path FST in path order, None if path is not a single path
+        arcs = []
+        state = path.start()
+        if state == pn.NO_STATE_ID:
+            return None
+        while path.num_arcs(state):
+            if path.num_arcs(state) > 1 or len(arcs) > path.num_states():
+                return None
+            arc = next(path.arcs(state))
+            arcs.append(arc)
+            state = arc.nextstate
+        if path.final(state) == pn.Weight.zero(path.weight_type()):
+            return None
+        return arcs
+
+    @staticmethod
+    def _linear_fst(arcs):
+        linear_fst = pn.Fst()
+        state = linear_fst.add_state()
+        linear_fst.set_start(state)
+        for arc in arcs:
+            next_state = linear_fst.add_state()
+            linear_fst.add_arc(state, pn.Arc(arc.ilabel, arc.olabel, arc.weight, next_state))
+            state = next_state
+        linear_fst.set_final(state)
+        return linear_fst
+
+    def _separator_labels(self):
+        # the output labels of a classified separator: space, boundary token, space
+        space = self.utf8_symbols.find(self.SPACE)
+        return [space] + [space if c == ' ' else self.utf8_symbols.find(c) for c in self.BOUNDARY_TOKEN] + [space]
+
     def _create_classified_string(self, classified_fst):
         try:
             classified = classified_fst.stringify(token_type=self.utf8_symbols)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Normalization of large corpora (LM and TTS training data) as a resumable job.
+
+The input files are split into shards, byte ranges ending at line boundaries, listed in a manifest (manifest.json
+in the job directory). The shards are normalized line by line in parallel worker processes, each worker loads the
+models once. Each input line is one output line, the sentences the normalizer splits a line into are joined by a
+space. Each shard output is written to a temporary file and renamed when the shard is done, such that the job
+directory only contains complete shard outputs, and the manifest is updated after every shard, in the order the
+shards are finished. An interrupted
+job is resumed by running the same command again: shards that are done are skipped. When all shards are done, the
+shard outputs are merged in the order of the input files.
+
+    python3 corpus_job.py job_dir corpus1.txt corpus2.txt --output corpus_normalized.txt --workers 8
+
+"""
+
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+from timeit import default_timer as timer
+
+MANIFEST = 'manifest.json'
+DEFAULT_SHARD_SIZE = 8 * 1024 * 1024
+
+# the normalizer of a worker process, see init_worker()
+worker_normalizer = None
+
+
+def create_shards(input_files, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Splits input_files into byte ranges of about shard_size bytes, each range ends at the end of a line.
+
+    :return: a list of shard descriptions (dictionaries) in the order of the input
+    """
+    shards = []
+    for filename in input_files:
+        file_size = os.path.getsize(filename)
+        with open(filename, 'rb') as f:
+            start = 0
+            while start < file_size:
+                f.seek(min(start + shard_size, file_size))
+                if f.tell() < file_size:
+                    f.readline()
+                end = f.tell()
+                shards.append({'id': len(shards), 'file': os.path.abspath(filename), 'start': start, 'end': end,
+                               'status': 'pending', 'lines': 0, 'failed': 0, 'seconds': 0.0})
+                start = end
+    return shards
+
+
+def read_shard(shard):
+    with open(shard['file'], 'rb') as f:
+        f.seek(shard['start'])
+        data = f.read(shard['end'] - shard['start'])
+    # only '\n' ends a line (as in create_shards()), not the other line boundaries of str.splitlines()
+    lines = data.decode('utf-8').split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+
+def shard_output(job_dir, shard):
+    return os.path.join(job_dir, 'shard_{:06d}.txt'.format(shard['id']))
+
+
+def write_atomic(filename, content):
+    tmp_file = filename + '.tmp'
+    with open(tmp_file, 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, filename)
+
+
+#
+#  WORKERS
+#
+
+def init_worker(settings):
+    global worker_normalizer
+    from normalizer import Normalizer
+    worker_normalizer = Normalizer(configfile=settings['configfile'], working_dir=settings['working_dir'],
+                                   test_mode=settings['test_mode'], tag_mode=settings['tag_mode'],
+                                   lm_profile=settings['lm_profile'])
+
+
+def normalize_shard(job_dir, shard):
+    """
+    Normalizes the lines of shard and writes the output file of the shard. Lines that fail are written unchanged.
+
+    :return: the shard with updated status and statistics
+    """
+    start = timer()
+    normalized = []
+    failed = 0
+    lines = read_shard(shard)
+    for line in lines:
+        if not line.strip():
+            normalized.append(line)
+            continue
+        try:
+            output = worker_normalizer.normalize(line)
+            if not worker_normalizer.test_mode:
+                # one line per detected sentence, keep the line structure of the input
+                output = ' '.join(output.split('\n'))
+            normalized.append(output)
+        except Exception as e:
+            print('Error in shard ' + str(shard['id']) + ': ' + str(e), file=sys.stderr)
+            normalized.append(line)
+            failed += 1
+    write_atomic(shard_output(job_dir, shard), ''.join(sent + '\n' for sent in normalized))
+    shard = dict(shard)
+    shard.update({'status': 'done', 'lines': len(lines), 'failed': failed, 'seconds': timer() - start})
+    return shard
+
+
+def run_shard(args):
+    # normalize_shard() for Pool.imap_unordered(), returns the shard and the done shard or the error
+    job_dir, shard = args
+    try:
+        return shard, normalize_shard(job_dir, shard), None
+    except Exception as e:
+        return shard, None, str(e)
+
+
+class CorpusJob:
+
+    def __init__(self, job_dir, input_files=None, shard_size=DEFAULT_SHARD_SIZE):
+        """
+        Opens the job in job_dir: reads the manifest if the job exists, else creates the shards of input_files.
+        """
+        self.job_dir = job_dir
+        self.manifest_file = os.path.join(job_dir, MANIFEST)
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as f:
+                self.manifest = json.load(f)
+            if input_files and [os.path.abspath(fn) for fn in input_files] != self.manifest['input_files']:
+                print('Input files differ from the manifest in ' + job_dir + ', resuming the existing job',
+                      file=sys.stderr)
+        else:
+            if not input_files:
+                raise ValueError('No manifest in ' + job_dir + ' and no input files given')
+            os.makedirs(job_dir, exist_ok=True)
+            self.manifest = {'input_files': [os.path.abspath(fn) for fn in input_files], 'shard_size': shard_size,
+                             'shards': create_shards(input_files, shard_size)}
+            self.save_manifest()
+
+    @property
+    def shards(self):
+        return self.manifest['shards']
+
+    def pending_shards(self):
+        # a shard is only done if its output file exists, e.g. after the job directory was partly deleted
+        return [shard for shard in self.shards
+                if shard['status'] != 'done' or not os.path.exists(shard_output(self.job_dir, shard))]
+
+    def save_manifest(self):
+        write_atomic(self.manifest_file, json.dumps(self.manifest, ensure_ascii=False, indent=2))
+
+    def run(self, workers=1, configfile='normalizer.conf', working_dir=None, test_mode=False, tag_mode=False,
+            lm_profile='full'):
+        """
+        Normalizes all pending shards with workers processes, the manifest is updated after each shard as soon as
+        it is done.
+        """
+        settings = {'configfile': configfile, 'working_dir': working_dir, 'test_mode': test_mode,
+                    'tag_mode': tag_mode, 'lm_profile': lm_profile}
+        pending = self.pending_shards()
+        print('Shards: {}, pending: {}'.format(len(self.shards), len(pending)))
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(settings,)) as pool:
+            for shard, done, error in pool.imap_unordered(run_shard, [(self.job_dir, shard) for shard in pending]):
+                if error is not None:
+                    print('Shard ' + str(shard['id']) + ' failed: ' + error, file=sys.stderr)
+                    self.shards[shard['id']]['status'] = 'failed'
+                else:
+                    self.shards[shard['id']] = done
+                    print('Shard {} done: {} lines, {} failed, {:.1f} lines/sec'.format(
+                        done['id'], done['lines'], done['failed'], done['lines'] / max(done['seconds'], 1e-6)))
+                self.save_manifest()
+
+    def is_done(self):
+        return not self.pending_shards()
+
+    def merge(self, output_file):
+        """
+        Concatenates the shard outputs in the order of the input into output_file.
+        """
+        if not self.is_done():
+            raise RuntimeError('Job in ' + self.job_dir + ' has pending or failed shards')
+        with open(output_file + '.tmp', 'w') as out:
+            for shard in self.shards:
+                with open(shard_output(self.job_dir, shard)) as f:
+                    for line in f:
+                        out.write(line)
+        os.replace(output_file + '.tmp', output_file)
+
+    def print_stats(self):
+        print('\nshard\tstatus\tlines\tfailed\tlines/sec')
+        for shard in self.shards:
+            speed = shard['lines'] / shard['seconds'] if shard['seconds'] else 0.0
+            print('{}\t{}\t{}\t{}\t{:.1f}'.format(shard['id'], shard['status'], shard['lines'], shard['failed'], speed))
+        lines = sum(shard['lines'] for shard in self.shards)
+        seconds = sum(shard['seconds'] for shard in self.shards)
+        print('Total: {} lines, {} failed, {:.1f} lines/sec per worker'.format(
+            lines, sum(shard['failed'] for shard in self.shards), lines / seconds if seconds else 0.0))
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("job_dir", type=str, help='directory of the manifest and the shard outputs')
+    parser.add_argument("input_files", type=str, nargs='*', help='corpus files, one sentence per line (not needed '
+                                                                 'to resume a job)')
+    parser.add_argument("--output", type=str, default=None, help='merge the shard outputs into this file')
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--shard_size_mb", type=float, default=DEFAULT_SHARD_SIZE / (1024 * 1024))
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--lm_profile", type=str, default='full', choices=['full', 'compact'])
+    parser.add_argument("--tag_mode", action='store_true')
+    parser.add_argument("--test_mode", action='store_true')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    job = CorpusJob(args.job_dir, args.input_files, int(args.shard_size_mb * 1024 * 1024))
+    job.run(workers=args.workers, configfile=args.configfile, working_dir=args.working_dir,
+            test_mode=args.test_mode, tag_mode=args.tag_mode, lm_profile=args.lm_profile)
+    job.print_stats()
+    if args.output:
+        if job.is_done():
+            job.merge(args.output)
+            print('Merged output: ' + args.output)
+        else:
+            print('Not all shards are done, run again to resume the job', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time budgets for the normalization of a text, with degradation tiers for inputs that would take too long.
+
+When a Normalizer call has a time budget, the verbalization degrades step by step as the budget is used up:
+
+    0 full:      all verbalization paths of the grammar, language model disambiguation
+    1 no_lm:     no language model disambiguation, the best grammar path of each token is taken
+    2 one_best:  the tokens are verbalized with the single shortest path of the grammar only
+    3 digits:    the tokens are read character by character, digits as number words, without the grammar
+
+The tier is decided before the classification of each batch of sentences and each re-classification (digits),
+before each token (one_best, digits) and before the disambiguation and each language model scoring (no_lm) from the
+used fraction of the budget. Very long tokens are read digit by digit right away, and very long sentences are not
+classified at all, their tokens are read without the grammar. The highest tier used for an utterance is stored in
+Utterance.degradation_tier.
+
+"""
+
+from timeit import default_timer as timer
+
+TIER_FULL = 0
+TIER_NO_LM = 1
+TIER_ONE_BEST = 2
+TIER_DIGITS = 3
+TIER_NAMES = ['full', 'no_lm', 'one_best', 'digits']
+
+# used fraction of the budget from which on a tier applies
+NO_LM_FRACTION = 0.4
+ONE_BEST_FRACTION = 0.6
+DIGITS_FRACTION = 0.9
+# with a budget, tokens longer than this are always read digit by digit
+MAX_TOKEN_LENGTH = 20
+# with a budget, sentences with more tokens than this are not classified, they are read without the grammar
+MAX_SENTENCE_TOKENS = 100
+
+
+class Deadline:
+
+    def __init__(self, budget):
+        """
+        :param budget: the time budget in seconds, starting now
+        """
+        self.budget = budget
+        self.start = timer()
+
+    def used(self):
+        """
+        Returns the used fraction of the budget, > 1 if the budget is exceeded.
+        """
+        return (timer() - self.start) / self.budget if self.budget > 0 else float('inf')
+
+    def token_tier(self, token_name):
+        """
+        Returns the tier for the verbalization of the token token_name: TIER_FULL, TIER_ONE_BEST or TIER_DIGITS.
+        """
+        used = self.used()
+        if used >= DIGITS_FRACTION or len(token_name) > MAX_TOKEN_LENGTH:
+            return TIER_DIGITS
+        if used >= ONE_BEST_FRACTION:
+            return TIER_ONE_BEST
+        return TIER_FULL
+
+    def classify_tier(self, num_tokens=0):
+        """
+        Returns the tier for the classification of a sentence with num_tokens tokens: TIER_FULL, or TIER_DIGITS if
+        the budget is nearly used up or the sentence is too long, then it is read without the grammar.
+        """
+        if self.used() >= DIGITS_FRACTION or num_tokens > MAX_SENTENCE_TOKENS:
+            return TIER_DIGITS
+        return TIER_FULL
+
+    def lm_tier(self):
+        """
+        Returns the tier for the disambiguation of an utterance: TIER_FULL or TIER_NO_LM.
+        """
+        return TIER_NO_LM if self.used() >= NO_LM_FRACTION else TIER_FULL
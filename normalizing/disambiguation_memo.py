@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A learned memo of the language model disambiguation, to skip the LM scoring of inflection choices that are
+(nearly) deterministic given the neighbouring words, e.g. 'í 2 ár' or 'kl. 2'.
+
+The memo is trained offline by running the LM disambiguation of the Verbalizer over a corpus. For each ambiguous
+semiotic class token it records, under the key (semiotic class, value pattern, left word, right word), which
+alternative the LM chose and by which margin: the cost difference between the best path and the best path with a
+different choice for the token. The value pattern keeps the last digit of each digit group ('22' -> '#2',
+'1.200' -> '1.##0'), the choice is stored as the LM symbols of the ambiguous words (the tags of tagged words,
+e.g. 'tfkvþf' for 'tveimur_tfkvþf'), such that one entry applies to all numbers with the same inflection.
+
+At runtime (Verbalizer.finalize()), the ambiguous tokens of an utterance are resolved from the memo if the key was
+seen at least min_count times, the recorded choice won in at least the confidence share of these and its mean
+margin is at least min_margin. The LM is only called if ambiguous tokens are left; the hit rate is counted, and
+with audit the LM is called anyway and the agreement of the memo and the LM is counted.
+
+    python3 disambiguation_memo.py train corpus.txt --output data/disambiguation_memo.tsv
+    python3 disambiguation_memo.py evaluate test_sentences.txt --memo data/disambiguation_memo.tsv
+
+"""
+
+import re
+import argparse
+from utterance_structure.utt_coll import TokenType
+
+UNK = '<unk>'
+SENTENCE_START = '<s>'
+SENTENCE_END = '</s>'
+
+METRICS = ['utterances', 'lm_skipped', 'tokens', 'hits', 'unknown', 'low_confidence', 'no_match', 'audited',
+           'agreed']
+
+
+def lm_symbol(word):
+    # the symbol of word in the LM lattice: the tag of tagged words (see FST_Compiler.fst_stringcompile_words())
+    return word[word.index('_') + 1:] if '_' in word else word
+
+
+def token_slots(words):
+    """
+    Returns the word slots of a token verbalization (see Verbalized.extend_paths()), each slot a list of alternative
+    words, None for verbalizations with incompatible paths (depth 3).
+    """
+    if all(isinstance(wrd, str) for wrd in words):
+        return [list(words)] if words else []
+    if all(isinstance(slot, list) and all(isinstance(wrd, str) for wrd in slot) for slot in words):
+        return [list(slot) for slot in words]
+    return None
+
+
+def ambiguous_slots(slots):
+    # indices of the slots with alternatives that the LM can tell apart
+    return [ind for ind, slot in enumerate(slots) if len({lm_symbol(wrd) for wrd in slot}) > 1]
+
+
+def value_pattern(name):
+    return re.sub(r'\d+', lambda match: '#' * (len(match.group()) - 1) + match.group()[-1], name)
+
+
+def context_word(tok):
+    if tok.token_type == TokenType.SEMIOTIC_CLASS:
+        return '<' + tok.semiotic_class.name + '>'
+    wrd = tok.word[:tok.word.index('_')] if '_' in tok.word else tok.word
+    return wrd.lower()
+
+
+def memo_key(tokens, ind):
+    """
+    Returns the memo key of the semiotic class token tokens[ind]: (class, value pattern, left word, right word).
+    """
+    left = context_word(tokens[ind - 1]) if ind > 0 else SENTENCE_START
+    right = context_word(tokens[ind + 1]) if ind + 1 < len(tokens) else SENTENCE_END
+    return tokens[ind].semiotic_class.name, value_pattern(tokens[ind].name), left, right
+
+
+class DisambiguationMemo:
+
+    def __init__(self, confidence=0.95, min_count=5, min_margin=1.0, audit=False):
+        """
+        :param confidence: min share of the recorded choice among the observations of a key
+        :param min_count: min number of observations of a key
+        :param min_margin: min mean LM cost margin of the recorded choice
+        :param audit: call the LM for utterances resolved from the memo as well, to count the agreement
+        """
+        self.confidence = confidence
+        self.min_count = min_count
+        self.min_margin = min_margin
+        self.audit = audit
+        # key -> (choice, count of the choice, count of the key, mean margin of the choice)
+        self.entries = {}
+        # training observations: key -> choice -> (count, summed margin)
+        self.observations = {}
+        self.metrics = {name: 0 for name in METRICS}
+
+    @classmethod
+    def load(cls, filename, **kwargs):
+        memo = cls(**kwargs)
+        with open(filename) as f:
+            for line in f:
+                sem_class, pattern, left, right, choice, count, total, margin = line.rstrip('\n').split('\t')
+                memo.entries[(sem_class, pattern, left, right)] = (tuple(choice.split(' ')), int(count), int(total),
+                                                                   float(margin))
+        return memo
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            for key, (choice, count, total, margin) in sorted(self.entries.items()):
+                f.write('\t'.join(list(key) + [' '.join(choice), str(count), str(total), str(margin)]) + '\n')
+
+    #
+    #  TRAINING
+    #
+
+    def learn(self, tokens, verbalizer):
+        """
+        Disambiguates the verbalizations of tokens (an utterance verbalized by Verbalizer.verbalize_tokens()) with
+        the language model of verbalizer and records the choice and margin of each ambiguous semiotic class token.
+        Utterances with incompatible verbalization paths are skipped.
+
+        :return: the number of recorded tokens
+        """
+        token_slot_lists = [token_slots(tok.verbalization_arr) for tok in tokens]
+        if any(slots is None for slots in token_slot_lists):
+            return 0
+        path = [slot for slots in token_slot_lists for slot in slots]
+        labels, cost = verbalizer.lm_best_path(path)
+        if len(labels) != len(path):
+            return 0
+        unk_label = verbalizer.word_symbols.find(UNK)
+
+        recorded = 0
+        start = 0
+        for ind, (tok, slots) in enumerate(zip(tokens, token_slot_lists)):
+            ambiguous = ambiguous_slots(slots)
+            if tok.token_type == TokenType.SEMIOTIC_CLASS and ambiguous:
+                choice = []
+                for slot_ind in ambiguous:
+                    symbols = [lm_symbol(wrd) for wrd in path[start + slot_ind]
+                               if verbalizer.word_label(lm_symbol(wrd)) == labels[start + slot_ind]]
+                    choice.append(symbols[0] if symbols and labels[start + slot_ind] != unk_label else None)
+                if None not in choice:
+                    # the runner-up differs from the choice in at least one slot
+                    runner_up = min(verbalizer.lm_best_path(self._exclude(path, start + slot_ind, symbol))[1]
+                                    for slot_ind, symbol in zip(ambiguous, choice))
+                    self._observe(memo_key(tokens, ind), tuple(choice), runner_up - cost)
+                    recorded += 1
+            start += len(slots)
+
+        return recorded
+
+    def compile(self):
+        """
+        Compiles the training observations into the memo entries, one choice per key.
+        """
+        for key, choices in self.observations.items():
+            total = sum(count for count, _ in choices.values())
+            choice, (count, margin_sum) = max(choices.items(), key=lambda item: item[1][0])
+            self.entries[key] = (choice, count, total, margin_sum / count)
+
+    #
+    #  RUNTIME
+    #
+
+    def resolve(self, tokens):
+        """
+        Resolves the ambiguous semiotic class tokens of an utterance from the memo.
+
+        :return: the verbalization of each token, with the alternatives of resolved tokens reduced to the recorded
+            choice, None if no token was resolved
+        """
+        self.metrics['utterances'] += 1
+        resolved = [tok.verbalization_arr for tok in tokens]
+        any_resolved = False
+        for ind, tok in enumerate(tokens):
+            slots = token_slots(tok.verbalization_arr) if tok.token_type == TokenType.SEMIOTIC_CLASS else None
+            ambiguous = ambiguous_slots(slots) if slots else []
+            if not ambiguous:
+                continue
+            self.metrics['tokens'] += 1
+            choice = self._confident_choice(memo_key(tokens, ind), len(ambiguous))
+            if choice is None:
+                continue
+            for slot_ind, symbol in zip(ambiguous, choice):
+                matching = [wrd for wrd in slots[slot_ind] if lm_symbol(wrd) == symbol]
+                if not matching:
+                    self.metrics['no_match'] += 1
+                    break
+                # the LM restores the last word of a slot with the chosen symbol
+                slots[slot_ind] = [matching[-1]]
+            else:
+                self.metrics['hits'] += 1
+                resolved[ind] = slots if isinstance(tok.verbalization_arr[0], list) else slots[0]
+                any_resolved = True
+
+        return resolved if any_resolved else None
+
+    def record_agreement(self, agreed):
+        self.metrics['audited'] += 1
+        self.metrics['agreed'] += int(agreed)
+
+    def hit_rate(self):
+        return self.metrics['hits'] / self.metrics['tokens'] if self.metrics['tokens'] else 0.0
+
+    def agreement(self):
+        return self.metrics['agreed'] / self.metrics['audited'] if self.metrics['audited'] else None
+
+    def print_metrics(self):
+        print('Memo entries: ' + str(len(self.entries)))
+        print('Ambiguous tokens: {}, resolved from the memo: {} ({:.1%}), unknown: {}, low confidence: {}, '
+              'no matching alternative: {}'.format(self.metrics['tokens'], self.metrics['hits'], self.hit_rate(),
+                                                   self.metrics['unknown'], self.metrics['low_confidence'],
+                                                   self.metrics['no_match']))
+        print('Utterances: {}, without LM scoring: {}'.format(self.metrics['utterances'], self.metrics['lm_skipped']))
+        if self.metrics['audited']:
+            print('Agreement with the LM: {} of {} ({:.1%})'.format(self.metrics['agreed'], self.metrics['audited'],
+                                                                    self.agreement()))
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _observe(self, key, choice, margin):
+        choices = self.observations.setdefault(key, {})
+        count, margin_sum = choices.get(choice, (0, 0.0))
+        choices[choice] = (count + 1, margin_sum + margin)
+
+    def _confident_choice(self, key, ambiguous_count):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.metrics['unknown'] += 1
+            return None
+        choice, count, total, margin = entry
+        if (len(choice) != ambiguous_count or total < self.min_count or count < self.confidence * total
+                or margin < self.min_margin):
+            self.metrics['low_confidence'] += 1
+            return None
+        return choice
+
+    @staticmethod
+    def _exclude(path, slot_ind, symbol):
+        # a copy of path without the alternatives of symbol in slot slot_ind
+        excluded = list(path)
+        excluded[slot_ind] = [wrd for wrd in path[slot_ind] if lm_symbol(wrd) != symbol]
+        return excluded
+
+
+def load_memo(conf):
+    """
+    Returns the disambiguation memo configured in conf (see normalizer.read_config()), None if there is none.
+    """
+    if not conf['disambiguation_memo']:
+        return None
+    return DisambiguationMemo.load(conf['disambiguation_memo'], confidence=conf['memo_confidence'],
+                                   min_count=conf['memo_min_count'], min_margin=conf['memo_min_margin'])
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=['train', 'evaluate'])
+    parser.add_argument("corpus", type=str, help='sentences, one per line')
+    parser.add_argument("--output", type=str, default='disambiguation_memo.tsv', help='the trained memo (train)')
+    parser.add_argument("--memo", type=str, default=None, help='the memo to evaluate, default of the config')
+    parser.add_argument("--confidence", type=float, default=None)
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--tag_mode", action='store_true')
+
+    return parser.parse_args()
+
+
+def main():
+    from normalizer import Normalizer
+    from utterance_structure.utt_coll import Utterance
+
+    args = arguments()
+    norm = Normalizer(configfile=args.configfile, working_dir=args.working_dir, tag_mode=args.tag_mode)
+    sentences = [line.strip() for line in open(args.corpus) if line.strip()]
+
+    if args.mode == 'train':
+        memo = DisambiguationMemo()
+        recorded = 0
+        for sent in sentences:
+            for utt_sent in norm.tok.tokenize_sentence(sent):
+                utt = Utterance(utt_sent)
+                if not norm.classify_utterance(utt) or not norm.verbalize_utterance_tokens(utt):
+                    continue
+                recorded += memo.learn(utt.ling_structure.tokens, norm.verbalizer)
+        memo.compile()
+        memo.save(args.output)
+        print('Recorded {} tokens, {} memo entries written to {}'.format(recorded, len(memo.entries), args.output))
+        return
+
+    # evaluate: the memo is audited against the LM on every utterance it resolves
+    memo = norm.verbalizer.memo
+    if args.memo:
+        memo = DisambiguationMemo.load(args.memo)
+    if memo is None:
+        print('No disambiguation memo configured, use --memo')
+        return
+    if args.confidence is not None:
+        memo.confidence = args.confidence
+    memo.audit = True
+    norm.verbalizer.memo = memo
+    for sent in sentences:
+        norm.normalize(sent)
+    memo.print_metrics()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+The normalization state of a document, for incremental re-normalization of edited documents
+(see Normalizer.normalize_document()).
+
+The state maps the hash of each sentence of the document, as split by Tokenizer.tokenize_sentence(), to its
+normalized utterance. When the edited document is normalized, the utterances of unchanged sentences are taken
+from the state, such that only the changed sentences are classified and verbalized. The state can be saved
+between editing sessions, as the fingerprint of the models and settings it was created with (Normalizer.fingerprint)
+followed by the utterances encoded by utterance_structure/utt_codec.py, each preceded by its length. A state with
+another fingerprint is not used, the models have been reloaded or the configuration has changed since.
+
+"""
+
+import struct
+from norm_cache import sentence_hash
+from utterance_structure import utt_codec
+
+LENGTH = struct.Struct('<I')
+
+
+class DocumentState:
+
+    def __init__(self, utterances=None, fingerprint=None):
+        """
+        :param utterances: the normalized utterances of the document
+        :param fingerprint: the fingerprint of the normalizer the utterances were created with
+        """
+        self.fingerprint = fingerprint
+        self.utterances = {}
+        # number of utterances taken from / not found in the state
+        self.reused = 0
+        self.missed = 0
+        for utt in utterances or []:
+            self.utterances[sentence_hash(utt.original_sentence)] = utt
+
+    def get(self, sentence):
+        """
+        Returns the normalized utterance of sentence, None if sentence was not part of the document.
+        """
+        utt = self.utterances.get(sentence_hash(sentence))
+        if utt is None:
+            self.missed += 1
+        else:
+            self.reused += 1
+        return utt
+
+    def save(self, filename):
+        fingerprint = (self.fingerprint or '').encode('utf-8')
+        with open(filename, 'wb') as f:
+            f.write(LENGTH.pack(len(fingerprint)))
+            f.write(fingerprint)
+            for utt in self.utterances.values():
+                data = utt_codec.encode(utt)
+                f.write(LENGTH.pack(len(data)))
+                f.write(data)
+
+    @staticmethod
+    def load(filename, fingerprint=None):
+        """
+        Loads a saved state, an empty state if fingerprint is given and the state was saved with another one.
+        """
+        utterances = []
+        with open(filename, 'rb') as f:
+            data = f.read()
+        length = LENGTH.unpack_from(data, 0)[0]
+        saved_fingerprint = data[LENGTH.size:LENGTH.size + length].decode('utf-8') or None
+        if fingerprint is not None and saved_fingerprint != fingerprint:
+            print('Document state ' + filename + ' was created with other models or settings, not used')
+            return DocumentState(fingerprint=fingerprint)
+        pos = LENGTH.size + length
+        while pos < len(data):
+            length = LENGTH.unpack_from(data, pos)[0]
+            pos += LENGTH.size
+            utterances.append(utt_codec.decode(data[pos:pos + length]))
+            pos += length
+        return DocumentState(utterances, saved_fingerprint)
+
+    def __len__(self):
+        return len(self.utterances)
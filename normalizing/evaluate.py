@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Evaluates the normalizer against a gold standard and reports accuracy and speed in one run.
+
+The gold standard has the format of the normalizer test output (Utterance.get_test_output()): one token per line,
+input token and expected verbalization separated by a tab, sentences separated by a '####\t####' line (or an empty
+line):
+
+    Afkoma	Afkoma
+    ársins	ársins
+    2017	tvö þúsund og sautján
+    ####	####
+
+The sentences are normalized in parallel by worker processes, each loading the models once. The predicted tokens
+are aligned to the gold tokens by their input strings, since the tokenizer of the normalizer may split differently
+('5%', 'kl.', several sentences in one line); gold tokens without a predicted token of the same input are counted
+as unaligned and not scored. Reported are token and sentence accuracy overall and per semiotic class (token type
+for non-semiotic tokens), the unaligned tokens, sentences per second and the processing time per normalization
+stage. The results are written as json:
+
+    python3 evaluate.py gold.tsv --output eval_results.json --workers 4
+
+"""
+
+import json
+import argparse
+import difflib
+import multiprocessing
+from timeit import default_timer as timer
+from utterance_structure.utt_coll import TokenType
+
+SENTENCE_SEPARATOR = '####'
+UNALIGNED = '<unaligned>'
+
+# the normalizer of an evaluation worker process, see init_worker()
+worker_normalizer = None
+
+
+def read_gold(gold_file):
+    """
+    Reads the gold standard into a list of sentences, each a list of (input token, expected verbalization) tuples.
+    """
+    sentences = []
+    current = []
+    with open(gold_file) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith(SENTENCE_SEPARATOR):
+                if current:
+                    sentences.append(current)
+                current = []
+                continue
+            arr = line.split('\t')
+            if len(arr) != 2:
+                print(line + ' does not have the correct format!')
+                continue
+            current.append((arr[0], arr[1]))
+    if current:
+        sentences.append(current)
+
+    return sentences
+
+
+def init_worker(configfile, working_dir, tag_mode):
+    from normalizer import Normalizer
+    global worker_normalizer
+    worker_normalizer = Normalizer(configfile=configfile, working_dir=working_dir, test_mode=True, tag_mode=tag_mode)
+
+
+def token_class(tok):
+    if tok.token_type == TokenType.SEMIOTIC_CLASS and tok.semiotic_class:
+        return tok.semiotic_class.name
+    if tok.token_type:
+        return tok.token_type.value
+    return 'unknown'
+
+
+def normalize_sentence(gold_sentence):
+    """
+    Normalizes the input tokens of gold_sentence, returns the predicted (input, class, verbalization) per token, the
+    time spent in each stage and the total time.
+    """
+    stage_times_before = dict(worker_normalizer.stage_times)
+    start = timer()
+    worker_normalizer.normalize(' '.join([inp for inp, expected in gold_sentence]))
+    duration = timer() - start
+
+    predicted = []
+    for utt in worker_normalizer.utterance_collection.collection:
+        for tok, (inp, verbalization) in zip(utt.ling_structure.tokens, utt.get_token_verbalizations()):
+            predicted.append((tok.name, token_class(tok), verbalization))
+    stage_times = {stage: worker_normalizer.stage_times[stage] - stage_times_before[stage]
+                   for stage in worker_normalizer.stage_times}
+
+    return predicted, stage_times, duration
+
+
+def new_counts():
+    return {'tokens': 0, 'correct_tokens': 0, 'unaligned_tokens': 0, 'sentences': 0, 'correct_sentences': 0}
+
+
+def add_accuracies(counts):
+    counts['token_accuracy'] = counts['correct_tokens'] / counts['tokens'] if counts['tokens'] else 0.0
+    counts['sentence_accuracy'] = counts['correct_sentences'] / counts['sentences'] if counts['sentences'] else 0.0
+
+
+def score_sentence(gold_sentence, predicted, totals, class_counts, errors, max_errors):
+    """
+    Compares the predicted tokens to the gold tokens aligned by their input strings and updates the counts. Gold
+    tokens without an aligned predicted token are counted as unaligned, a sentence with unaligned tokens is not
+    correct. A sentence is correct for a semiotic class if all its aligned tokens of that class are correct.
+    """
+    aligned = align_tokens(gold_sentence, predicted)
+    sentence_correct = True
+    class_correct = {}
+    for (inp, expected), pred in zip(gold_sentence, aligned):
+        if pred is None:
+            totals['unaligned_tokens'] += 1
+            sentence_correct = False
+            if len(errors) < max_errors:
+                errors.append({'input': inp, 'expected': expected, 'predicted': '', 'class': UNALIGNED,
+                               'sentence': ' '.join([tok for tok, exp in gold_sentence])})
+            continue
+        sem_class, verbalization = pred
+        correct = verbalization == expected
+        if sem_class not in class_counts:
+            class_counts[sem_class] = new_counts()
+        class_counts[sem_class]['tokens'] += 1
+        totals['tokens'] += 1
+        if correct:
+            class_counts[sem_class]['correct_tokens'] += 1
+            totals['correct_tokens'] += 1
+        else:
+            sentence_correct = False
+            if len(errors) < max_errors:
+                errors.append({'input': inp, 'expected': expected, 'predicted': verbalization, 'class': sem_class,
+                               'sentence': ' '.join([tok for tok, exp in gold_sentence])})
+        class_correct[sem_class] = class_correct.get(sem_class, True) and correct
+
+    totals['sentences'] += 1
+    if sentence_correct:
+        totals['correct_sentences'] += 1
+    for sem_class, correct in class_correct.items():
+        class_counts[sem_class]['sentences'] += 1
+        if correct:
+            class_counts[sem_class]['correct_sentences'] += 1
+
+
+def align_tokens(gold_sentence, predicted):
+    """
+    Aligns the predicted (input, class, verbalization) tokens to the (input, expected) gold tokens by their inputs.
+
+    :return: a list with the predicted (class, verbalization) for each gold token, None for unaligned gold tokens
+    """
+    aligned = [None] * len(gold_sentence)
+    matcher = difflib.SequenceMatcher(None, [inp for inp, expected in gold_sentence],
+                                      [inp for inp, sem_class, verbalization in predicted], autojunk=False)
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            inp, sem_class, verbalization = predicted[block.b + k]
+            aligned[block.a + k] = (sem_class, verbalization)
+    return aligned
+
+
+def evaluate(gold_sentences, configfile='normalizer.conf', working_dir=None, workers=1, tag_mode=False,
+             max_errors=1000):
+    from normalizer import Normalizer
+    totals = new_counts()
+    class_counts = {}
+    errors = []
+    stage_times = {stage: 0.0 for stage in Normalizer.STAGES}
+    normalizing_time = 0.0
+
+    # wall time includes the loading of the models in the workers, normalizing time is the sum of the time spent
+    # on the single sentences
+    start = timer()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(configfile, working_dir, tag_mode)) as pool:
+        for gold_sentence, (predicted, sent_stage_times, duration) in zip(
+                gold_sentences, pool.imap(normalize_sentence, gold_sentences, chunksize=8)):
+            score_sentence(gold_sentence, predicted, totals, class_counts, errors, max_errors)
+            for stage in sent_stage_times:
+                stage_times[stage] = stage_times.get(stage, 0.0) + sent_stage_times[stage]
+            normalizing_time += duration
+    wall_time = timer() - start
+
+    add_accuracies(totals)
+    for sem_class in class_counts:
+        add_accuracies(class_counts[sem_class])
+
+    return {'accuracy': totals,
+            'per_class': class_counts,
+            'speed': {'workers': workers,
+                      'wall_time': wall_time,
+                      'sentences_per_sec': totals['sentences'] / wall_time if wall_time else 0.0,
+                      'normalizing_time': normalizing_time,
+                      'stage_times': stage_times},
+            'errors': errors}
+
+
+def print_results(results):
+    acc = results['accuracy']
+    print('\nSentences: {}, tokens: {}, unaligned tokens: {}'.format(acc['sentences'], acc['tokens'],
+                                                                   acc['unaligned_tokens']))
+    print('Token accuracy: {:.4f}'.format(acc['token_accuracy']))
+    print('Sentence accuracy: {:.4f}'.format(acc['sentence_accuracy']))
+    print('\nclass\ttokens\ttoken acc.\tsentences\tsentence acc.')
+    for sem_class, counts in sorted(results['per_class'].items()):
+        print('{}\t{}\t{:.4f}\t{}\t{:.4f}'.format(sem_class, counts['tokens'], counts['token_accuracy'],
+                                                 counts['sentences'], counts['sentence_accuracy']))
+    speed = results['speed']
+    print('\nSentences/sec: {:.2f} ({} workers, {:.2f} sec)'.format(speed['sentences_per_sec'], speed['workers'],
+                                                                  speed['wall_time']))
+    for stage, seconds in speed['stage_times'].items():
+        print('{}: {:.2f} sec'.format(stage, seconds))
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gold", type=str, help='gold standard, token-by-token TSV as produced in test mode')
+    parser.add_argument("--output", type=str, default='eval_results.json', help='json file for the results')
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--tag_mode", action='store_true')
+    parser.add_argument("--max_errors", type=int, default=1000, help='max number of errors listed in the output')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    gold_sentences = read_gold(args.gold)
+    results = evaluate(gold_sentences, configfile=args.configfile, working_dir=args.working_dir,
+                       workers=args.workers, tag_mode=args.tag_mode, max_errors=args.max_errors)
+    print_results(results)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
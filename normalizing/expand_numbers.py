@@ -22,6 +22,8 @@ import re
 import queue
 import pynini as pn
 import pywrapfst as fst
+from functools import partial
+from model_registry import REGISTRY, load_lm, symbols_variant
 
 
 class Expander:
@@ -35,16 +37,14 @@ class Expander:
         exp_grammarfile = grammar_dir + config['models']['grammar']
         lm_file = grammar_dir + config['models']['language model']
 
-        self.utf8_symbols = pn.SymbolTable.read_text(utf8_symfile)
-        self.word_symbols = pn.SymbolTable.read_text(word_symfile)
-        self.exp_grammar = pn.Fst.read(exp_grammarfile)
-        self.exp_grammar.arcsort()
+        # the models are shared with normalizers in this process, see model_registry.py
+        self.utf8_symbols = REGISTRY.acquire('symbols', utf8_symfile, 'Expander')
+        self.word_symbols = REGISTRY.acquire('symbols', word_symfile, 'Expander')
+        self.exp_grammar = REGISTRY.acquire('grammar', exp_grammarfile, 'Expander')
         print("reading LM file ...")
-        self.LM = pn.Fst.read(lm_file)
+        self.LM = REGISTRY.acquire('lm', lm_file, 'Expander', loader=partial(load_lm, word_symbols=self.word_symbols),
+                                   variant=symbols_variant(self.word_symbols))
         print("initialized LM")
-        self.LM.set_input_symbols(self.word_symbols)
-        self.LM.set_output_symbols(self.word_symbols)
-        self.LM.arcsort()
 
     def should_expand(self, token):
 
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hot reload of the models of a normalizer (grammars, language model, symbol tables and lexicons) without downtime.
+
+ReloadingNormalizer wraps a Normalizer and serves requests with it while a new Normalizer is created in a
+background thread on reload(). The new normalizer is checked with a smoke test corpus (every sentence has to be
+normalized without an error and with a non-empty result) and then swapped in atomically: requests starting
+after the swap use the new models, requests in flight finish on the old ones, and the old normalizer is closed
+when its last request is done. If the smoke test fails, the old models stay in use. A Normalizer keeps the state of
+a call on the object, the requests to one normalizer are therefore serialized: concurrent requests wait for each
+other (normalize_iter() holds the normalizer only while a sentence is normalized).
+
+Models that did not change are not loaded again, they are shared through the model registry (model_registry.py).
+With watch_interval, the model files of the configuration are checked for changes every watch_interval seconds,
+and a reload is started when they have changed and have not been modified for one interval (the deployment of the
+new files is complete).
+
+    python3 hot_reload.py --smoke_test test_sentences.txt --watch_interval 10
+
+"""
+
+import os
+import sys
+import argparse
+import threading
+
+
+class ReloadingNormalizer:
+
+    def __init__(self, smoke_test_file=None, watch_interval=None, factory=None, **normalizer_args):
+        """
+        Creates the normalizer with normalizer_args (the arguments of Normalizer()).
+
+        :param smoke_test_file: sentences to check a reloaded normalizer with, one per line
+        :param watch_interval: check the model files for changes every watch_interval seconds, None: no watching
+        :param factory: creates a normalizer from normalizer_args, default Normalizer
+        """
+        if factory is None:
+            from normalizer import Normalizer
+            factory = Normalizer
+        self.factory = factory
+        self.normalizer_args = normalizer_args
+        self.smoke_test = []
+        if smoke_test_file:
+            self.smoke_test = [line for line in open(smoke_test_file).read().splitlines() if line.strip()]
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_reload_error = None
+
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._normalizer = factory(**normalizer_args)
+        # number of requests in flight per normalizer, normalizers swapped out are closed when they reach 0
+        self._active = {self._normalizer: 0}
+        # one request at a time per normalizer
+        self._request_locks = {self._normalizer: threading.Lock()}
+        self._retired = set()
+
+        self._stop = threading.Event()
+        self._watcher = None
+        if watch_interval:
+            self._watcher = threading.Thread(target=self._watch, args=(watch_interval,), daemon=True)
+            self._watcher.start()
+
+    @property
+    def normalizer(self):
+        """
+        The current normalizer, requests started now are served by it.
+        """
+        return self._normalizer
+
+    def normalize(self, text, time_budget=None):
+        return self._request(lambda norm: norm.normalize(text, time_budget=time_budget))
+
+    def normalize_document(self, text, state=None, time_budget=None):
+        return self._request(lambda norm: norm.normalize_document(text, state, time_budget=time_budget))
+
+    def normalize_iter(self, text, callback=None, time_budget=None):
+        # the normalizer is kept until the generator is exhausted or closed
+        norm = self._begin()
+        try:
+            utts = norm.normalize_iter(text, callback, time_budget=time_budget)
+            while True:
+                with self._request_locks[norm]:
+                    utt = next(utts, None)
+                if utt is None:
+                    return
+                yield utt
+        finally:
+            self._end(norm)
+
+    def reload(self, wait=False):
+        """
+        Creates a new normalizer with the current model files in the background, checks it with the smoke test and
+        swaps it in. Only one reload runs at a time, returns None if a reload is already running.
+
+        :param wait: wait for the reload to finish
+        :return: the reload thread, or if wait is True whether the new models are in use
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return None
+        thread = threading.Thread(target=self._reload, daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+            return self.last_reload_error is None
+        return thread
+
+    def close(self):
+        """
+        Stops watching the model files and closes the current normalizer.
+        """
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join()
+        with self._lock:
+            self._retired.add(self._normalizer)
+            self._close_retired()
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _begin(self):
+        with self._lock:
+            norm = self._normalizer
+            self._active[norm] += 1
+            return norm
+
+    def _end(self, norm):
+        with self._lock:
+            self._active[norm] -= 1
+            self._close_retired()
+
+    def _request(self, process):
+        norm = self._begin()
+        try:
+            with self._request_locks[norm]:
+                return process(norm)
+        finally:
+            self._end(norm)
+
+    def _close_retired(self):
+        for norm in list(self._retired):
+            if self._active[norm] == 0:
+                norm.close()
+                self._retired.discard(norm)
+                del self._active[norm]
+                del self._request_locks[norm]
+
+    def _reload(self):
+        try:
+            new_normalizer = self.factory(**self.normalizer_args)
+            error = self._run_smoke_test(new_normalizer)
+            if error:
+                new_normalizer.close()
+                self.failed_reloads += 1
+                self.last_reload_error = error
+                print('Reload failed, keeping the current models: ' + error, file=sys.stderr)
+                return
+            with self._lock:
+                self._active[new_normalizer] = 0
+                self._request_locks[new_normalizer] = threading.Lock()
+                self._retired.add(self._normalizer)
+                self._normalizer = new_normalizer
+                self._close_retired()
+            self.reloads += 1
+            self.last_reload_error = None
+        except Exception as e:
+            self.failed_reloads += 1
+            self.last_reload_error = str(e)
+            print('Reload failed, keeping the current models: ' + str(e), file=sys.stderr)
+        finally:
+            self._reload_lock.release()
+
+    def _run_smoke_test(self, norm):
+        # returns an error message, None if all smoke test sentences were normalized
+        for sent in self.smoke_test:
+            try:
+                normalized = norm.normalize(sent)
+            except Exception as e:
+                return 'smoke test sentence "' + sent + '": ' + str(e)
+            if not normalized.strip():
+                return 'smoke test sentence "' + sent + '": empty normalization'
+        return None
+
+    def _model_files(self):
+        # all files the output of the normalizer depends on: grammars, language model, symbol tables, the number
+        # lexicon, the case government table and the disambiguation memo, as far as they are configured
+        from normalizer import read_config, model_bundle
+        lm_profile = self.normalizer_args.get('lm_profile', 'full')
+        config, conf = read_config(self.normalizer_args.get('configfile', 'normalizer.conf'),
+                                   self.normalizer_args.get('working_dir'), lm_profile)
+        model_files, settings = model_bundle(conf, lm_profile, self.normalizer_args.get('verbalize', True),
+                                             self.normalizer_args.get('tag_mode', False),
+                                             self.normalizer_args.get('lookahead', False))
+        return model_files
+
+    def _file_versions(self):
+        # the size and modification time per model file, None while the model files can't be listed (e.g. the
+        # number lexicon directory is being replaced)
+        versions = {}
+        try:
+            model_files = self._model_files()
+        except OSError:
+            return None
+        for filename in model_files:
+            try:
+                stat = os.stat(filename)
+                versions[filename] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                versions[filename] = None
+        return versions
+
+    def _watch(self, interval):
+        loaded = self._file_versions()
+        previous = loaded
+        while not self._stop.wait(interval):
+            current = self._file_versions()
+            # reload when the files differ from the loaded ones and did not change during the last interval
+            if current is not None and current != loaded and current == previous and None not in current.values():
+                if self.reload(wait=True) is not None:
+                    loaded = current
+            previous = current
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--smoke_test", type=str, default=None, help='sentences to check reloaded models with')
+    parser.add_argument("--watch_interval", type=float, default=10.0, help='seconds between model file checks')
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--lm_profile", type=str, default='full', choices=['full', 'compact'])
+
+    return parser.parse_args()
+
+
+def main():
+    # normalizes sentences from stdin, one per line, the models are reloaded when the model files change
+    args = arguments()
+    norm = ReloadingNormalizer(smoke_test_file=args.smoke_test, watch_interval=args.watch_interval,
+                               configfile=args.configfile, working_dir=args.working_dir, lm_profile=args.lm_profile)
+    try:
+        for line in sys.stdin:
+            if line.strip():
+                print(norm.normalize(line.strip()), flush=True)
+    finally:
+        norm.close()
+        print('Reloads: {}, failed: {}'.format(norm.reloads, norm.failed_reloads), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares the 'full' and the 'compact' language model profile of the normalizer on a test corpus (one sentence
+per line): disambiguation agreement of the normalized output, loading time, latency per sentence and peak resident
+memory (RSS). Each profile runs in its own process, such that memory is measured separately.
+
+    python3 lm_profile_report.py test_sentences.txt --output lm_profile_report.json
+
+The compact model is created with language_modeling/lm.py --prune ... --compact and configured as
+'compact language model' in normalizer.conf (see normalizer_config.py).
+
+"""
+
+import json
+import argparse
+import resource
+import multiprocessing
+from timeit import default_timer as timer
+from normalizer import Normalizer
+
+PROFILES = ['full', 'compact']
+
+
+def run_profile(profile, sentences, configfile, working_dir, result_queue):
+    start = timer()
+    norm = Normalizer(configfile=configfile, working_dir=working_dir, lm_profile=profile)
+    load_time = timer() - start
+    outputs = []
+    latencies = []
+    for sent in sentences:
+        start = timer()
+        outputs.append(norm.normalize(sent))
+        latencies.append(timer() - start)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result_queue.put({'profile': profile, 'load_time': load_time, 'latencies': latencies, 'peak_rss_kb': peak_rss,
+                      'outputs': outputs})
+
+
+def percentile(values, perc):
+    if not values:
+        return 0.0
+    sorted_values = sorted(values)
+    ind = min(len(sorted_values) - 1, int(round(perc / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[ind]
+
+
+def agreement(outputs1, outputs2):
+    """
+    Returns the ratio of identical sentences and the ratio of identical words (compared position by position)
+    in the two output lists.
+    """
+    same_sentences = 0
+    same_words = 0
+    all_words = 0
+    for out1, out2 in zip(outputs1, outputs2):
+        if out1 == out2:
+            same_sentences += 1
+        words1 = out1.split()
+        words2 = out2.split()
+        all_words += max(len(words1), len(words2))
+        same_words += sum(1 for w1, w2 in zip(words1, words2) if w1 == w2)
+
+    sentence_agreement = same_sentences / len(outputs1) if outputs1 else 1.0
+    word_agreement = same_words / all_words if all_words else 1.0
+    return sentence_agreement, word_agreement
+
+
+def create_report(results):
+    full = results['full']
+    compact = results['compact']
+    sentence_agr, word_agr = agreement(full['outputs'], compact['outputs'])
+    report = {'sentences': len(full['outputs']),
+              'sentence_agreement': sentence_agr,
+              'word_agreement': word_agr,
+              'differences': [(i, out1, out2) for i, (out1, out2) in enumerate(zip(full['outputs'], compact['outputs']))
+                              if out1 != out2]}
+    for profile in PROFILES:
+        res = results[profile]
+        report[profile] = {'load_time': res['load_time'],
+                           'mean_latency': sum(res['latencies']) / max(len(res['latencies']), 1),
+                           'p50_latency': percentile(res['latencies'], 50),
+                           'p95_latency': percentile(res['latencies'], 95),
+                           'max_latency': max(res['latencies'], default=0.0),
+                           'peak_rss_kb': res['peak_rss_kb']}
+
+    return report
+
+
+def print_report(report):
+    print('\nSentences: {}'.format(report['sentences']))
+    print('Sentence agreement full/compact: {:.4f}'.format(report['sentence_agreement']))
+    print('Word agreement full/compact: {:.4f}'.format(report['word_agreement']))
+    print('\nprofile\tload (s)\tmean (s)\tp50 (s)\tp95 (s)\tmax (s)\tpeak RSS (kB)')
+    for profile in PROFILES:
+        res = report[profile]
+        print('{}\t{:.2f}\t{:.4f}\t{:.4f}\t{:.4f}\t{:.4f}\t{}'.format(
+            profile, res['load_time'], res['mean_latency'], res['p50_latency'], res['p95_latency'],
+            res['max_latency'], res['peak_rss_kb']))
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", type=str, help='test sentences, one per line')
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--output", type=str, default=None, help='write the report as json to this file')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    sentences = [line for line in open(args.corpus).read().splitlines() if line.strip()]
+
+    results = {}
+    for profile in PROFILES:
+        result_queue = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=run_profile,
+                                       args=(profile, sentences, args.configfile, args.working_dir, result_queue))
+        proc.start()
+        results[profile] = result_queue.get()
+        proc.join()
+
+    report = create_report(results)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
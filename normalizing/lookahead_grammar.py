@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runtime support for grammars stored as input label lookahead FSTs (see grammar/lookahead_convert.py).
+
+The classifier and verbalizer grammars are the right hand side of the composition with the input string FST.
+Converted to ilabel_lookahead FSTs, the composition uses the lookahead matcher and filter of OpenFst, such that
+paths of the grammar that can't match the rest of the input are not expanded. The conversion relabels the input
+labels of the grammar (label-reachable relabeling), the relabel pairs are stored next to the grammar
+('<grammar>.relabel'). The input string FST is relabeled with these pairs before the composition, and the input
+labels of the result are mapped back to the utf8 symbols.
+
+Reading lookahead FSTs requires OpenFst built with --enable-lookahead-fsts, with the lookahead FST libraries
+(e.g. ilabel_lookahead-fst.so) in the library path.
+
+Compare the runtime of the lookahead grammars configured in normalizer.conf with the default grammars:
+
+    python3 lookahead_grammar.py test_sentences.txt
+
+"""
+
+import argparse
+import pynini as pn
+import pywrapfst as fst
+
+RELABEL_EXTENSION = '.relabel'
+
+
+def read_relabel_pairs(pairs_file):
+    """
+    Reads the 'old_label new_label' pairs written by fstconvert --save_relabel_ipairs into a dictionary.
+    """
+    relabel = {}
+    with open(pairs_file) as f:
+        for line in f:
+            arr = line.split()
+            if len(arr) == 2:
+                relabel[int(arr[0])] = int(arr[1])
+    return relabel
+
+
+class LookaheadGrammar:
+
+    def __init__(self, path_to_grammar, path_to_pairs=None):
+        self.grammar = fst.Fst.read(path_to_grammar)
+        self.relabel = read_relabel_pairs(path_to_pairs or path_to_grammar + RELABEL_EXTENSION)
+        self.inverse_relabel = {new: old for old, new in self.relabel.items()}
+        # labels that don't occur in the grammar are mapped to a label not used after relabeling, such that they
+        # can't collide with relabeled grammar labels
+        self.unused_label = max(self.relabel.values(), default=0) + 1
+
+    def compose(self, inp_fst):
+        """
+        Composes the acceptor inp_fst with the grammar using lookahead matching, inp_fst is relabeled in place.
+
+        :return: the composition result in Pynini format, input labels in the relabeled label space
+        """
+        pairs = [(label, self.relabel.get(label, self.unused_label)) for label in self._labels(inp_fst) if label]
+        if pairs:
+            inp_fst.relabel_pairs(ipairs=pairs, opairs=pairs)
+        return pn.Fst.from_pywrapfst(fst.compose(inp_fst, self.grammar))
+
+    def restore_input(self, composed_fst):
+        """
+        Maps the input labels of composed_fst, a result of compose(), back to the original labels, in place.
+        """
+        pairs = [(label, self.inverse_relabel[label]) for label in self._labels(composed_fst)
+                 if label in self.inverse_relabel]
+        if pairs:
+            composed_fst.relabel_pairs(ipairs=pairs)
+        return composed_fst
+
+    @staticmethod
+    def _labels(inp_fst):
+        return {arc.ilabel for state in inp_fst.states() for arc in inp_fst.arcs(state)}
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", type=str, help='test sentences, one per line')
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def main():
+    from normalizer import Normalizer
+    from utterance_structure.utt_coll import Utterance
+
+    args = arguments()
+    sentences = [line for line in open(args.corpus).read().splitlines() if line.strip()]
+    normalizers = {'default': Normalizer(configfile=args.configfile, working_dir=args.working_dir, load_lm=False),
+                   'lookahead': Normalizer(configfile=args.configfile, working_dir=args.working_dir, load_lm=False,
+                                           lookahead=True)}
+    results = {}
+    for name, norm in normalizers.items():
+        results[name] = []
+        for sent in sentences:
+            utt = Utterance(sent)
+            verbalization = None
+            if norm.classify_utterance(utt):
+                verbalization = norm.verbalize_utterance_tokens(utt)
+            results[name].append((utt.classified, verbalization.paths if verbalization else None))
+
+    differences = sum(1 for default, lookahead in zip(results['default'], results['lookahead'])
+                      if default != lookahead)
+    print('\nSentences: {}, different results: {}'.format(len(sentences), differences))
+    print('grammars\tclassify (s)\tverbalize (s)')
+    for name, norm in normalizers.items():
+        print('{}\t{:.2f}\t{:.2f}'.format(name, norm.stage_times['classify'], norm.stage_times['verbalize']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Process-wide registry of the loaded models (grammar FSTs, language models and symbol tables), such that several
+normalizer configurations in one process, e.g. a tag-mode and a plain-mode Normalizer, or a Normalizer and an
+Expander, share one copy of each model.
+
+A model is identified by its kind (how it is loaded and prepared, e.g. an arcsorted grammar), the resolved path
+and the checksum of the file. A component acquires a model for an owner (a configuration, e.g. one Normalizer)
+and the registry counts the references; the model is dropped from the registry when the last owner has released
+it. The models handed out are shared and must be treated as read-only: compose/intersect with them, but never
+modify them in place (arcsort, set_input_symbols, ...) after loading.
+
+The resident memory of each model is measured as the growth of the process memory while loading it. Print the
+models loaded per configuration and their memory:
+
+    python3 model_registry.py --configfile normalizer.conf
+
+"""
+
+import os
+import argparse
+import threading
+import pynini as pn
+import pywrapfst as fst
+from timeit import default_timer as timer
+from norm_cache import file_checksum
+
+
+def resident_memory():
+    """
+    Returns the resident memory of this process in bytes, None if not available (non-Linux systems).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+#
+#  LOADERS, each returns the prepared model for a file
+#
+
+def load_grammar(path):
+    grammar = pn.Fst.read(path)
+    grammar.arcsort()
+    return grammar
+
+
+def load_lookahead_grammar(path):
+    from lookahead_grammar import LookaheadGrammar
+    return LookaheadGrammar(path)
+
+
+def load_compact_lm(path):
+    # a read-only, arcsorted FST in a compact type (see language_modeling/lm.py --compact)
+    return fst.Fst.read(path)
+
+
+def load_lm(path, word_symbols):
+    lm = pn.Fst.read(path)
+    lm.set_input_symbols(word_symbols)
+    lm.set_output_symbols(word_symbols)
+    lm.arcsort()
+    return lm
+
+
+def load_symbols(path):
+    return pn.SymbolTable.read_text(path)
+
+
+LOADERS = {'grammar': load_grammar, 'lookahead_grammar': load_lookahead_grammar, 'compact_lm': load_compact_lm,
+           'symbols': load_symbols}
+
+
+def symbols_variant(symbols):
+    # the variant of models prepared with the symbol table symbols
+    return ':' + symbols.checksum().hex()
+
+
+class ModelEntry:
+
+    def __init__(self, kind, path, checksum, model, memory, load_time):
+        self.kind = kind
+        self.path = path
+        self.checksum = checksum
+        self.model = model
+        self.memory = memory
+        self.load_time = load_time
+        # owner -> number of references
+        self.owners = {}
+
+    @property
+    def refcount(self):
+        return sum(self.owners.values())
+
+
+class ModelRegistry:
+
+    def __init__(self):
+        self.entries = {}
+        # (path, size, mtime) -> checksum, such that a file is only read for its checksum once per version
+        self._checksums = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, kind, path, owner=None, loader=None, variant=''):
+        """
+        Returns the model of kind for path, loads it if it is not loaded yet, and adds a reference for owner.
+
+        :param kind: the kind of model, a key of LOADERS if no loader is given
+        :param path: the model file
+        :param owner: the configuration using the model, e.g. a Normalizer name
+        :param loader: a function loading and preparing the model from path, default LOADERS[kind]
+        :param variant: distinguishes differently prepared models of the same kind and file, e.g. the symbol
+            table set on a language model
+        """
+        with self._lock:
+            key = self._key(kind + variant, path)
+            entry = self.entries.get(key)
+            if entry is None:
+                load = loader or LOADERS[kind]
+                memory_before = resident_memory()
+                start = timer()
+                model = load(path)
+                load_time = timer() - start
+                memory_after = resident_memory()
+                memory = memory_after - memory_before if memory_before is not None else None
+                entry = ModelEntry(kind, key[1], key[2], model, memory, load_time)
+                self.entries[key] = entry
+            entry.owners[owner] = entry.owners.get(owner, 0) + 1
+            return entry.model
+
+    def release(self, model, owner=None):
+        """
+        Removes a reference of owner to model, the model is dropped from the registry when it has no references.
+        """
+        with self._lock:
+            for key, entry in list(self.entries.items()):
+                if entry.model is model and owner in entry.owners:
+                    entry.owners[owner] -= 1
+                    if entry.owners[owner] == 0:
+                        del entry.owners[owner]
+                    if not entry.owners:
+                        del self.entries[key]
+                    return
+
+    def release_owner(self, owner):
+        """
+        Removes all references of owner, e.g. when a Normalizer is closed.
+        """
+        with self._lock:
+            for key, entry in list(self.entries.items()):
+                entry.owners.pop(owner, None)
+                if not entry.owners:
+                    del self.entries[key]
+
+    def memory_report(self):
+        """
+        Returns the loaded models per owner: kind, path, memory (bytes, None if not measured) and the number of
+        owners sharing the model, and the total memory of the models of the owner.
+        """
+        with self._lock:
+            report = {}
+            for entry in self.entries.values():
+                for owner in entry.owners:
+                    owner_report = report.setdefault(str(owner), {'models': [], 'memory': 0})
+                    owner_report['models'].append({'kind': entry.kind, 'path': entry.path, 'memory': entry.memory,
+                                                   'load_time': entry.load_time, 'shared_by': len(entry.owners)})
+                    owner_report['memory'] += entry.memory or 0
+            return report
+
+    def total_memory(self):
+        with self._lock:
+            return sum(entry.memory or 0 for entry in self.entries.values())
+
+    def print_memory_report(self):
+        print('\nowner\tkind\tmemory (MB)\tshared by\tpath')
+        for owner, owner_report in sorted(self.memory_report().items()):
+            for model in owner_report['models']:
+                memory = '{:.1f}'.format(model['memory'] / (1 << 20)) if model['memory'] is not None else '-'
+                print('{}\t{}\t{}\t{}\t{}'.format(owner, model['kind'], memory, model['shared_by'], model['path']))
+            print('{}\ttotal\t{:.1f}'.format(owner, owner_report['memory'] / (1 << 20)))
+        print('All models: {:.1f} MB'.format(self.total_memory() / (1 << 20)))
+
+    def __len__(self):
+        return len(self.entries)
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _key(self, kind, path):
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        version = (path, stat.st_size, stat.st_mtime)
+        if version not in self._checksums:
+            self._checksums[version] = file_checksum(path)
+        return kind, path, self._checksums[version]
+
+
+# the registry of this process
+REGISTRY = ModelRegistry()
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def main():
+    from normalizer import Normalizer
+
+    args = arguments()
+    plain = Normalizer(configfile=args.configfile, working_dir=args.working_dir)
+    tagged = Normalizer(configfile=args.configfile, working_dir=args.working_dir, tag_mode=True)
+    REGISTRY.print_memory_report()
+    plain.close()
+    tagged.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent on-disk cache of normalized utterances, shared across runs and processes.
+
+The cache is a SQLite database mapping a sentence hash and a fingerprint of the model bundle to the normalized
+utterance (the Utterance object with its tokens and normalized sentence). The utterances are pickled, or encoded by
+utterance_structure/utt_codec.py with codec='utt_codec', which makes the entries about a quarter smaller but is
+slower to encode and decode. The fingerprint is computed from the checksums of the model files (grammars, language
+model, symbol tables), the normalizer settings and the codec, such that entries of changed models are never
+returned. Several configurations can share one cache file: when the cache is
+opened, only the entries of fingerprints with another checksum of one of its model files are deleted, the entries of
+other settings are kept until they are evicted as least recently used. Checksums are stored in the database per file
+path, size and modification time and only recomputed when a file changes. Utterances that could not be normalized
+are not cached.
+
+The database runs in WAL mode, such that several worker processes can read and write concurrently. When the data
+in the cache exceeds max_size bytes, the least recently used entries are deleted.
+
+"""
+
+import os
+import time
+import sqlite3
+import pickle
+import hashlib
+from utterance_structure import utt_codec
+from utterance_structure.utt_coll import Utterance
+
+# check the size of the cache every n-th write
+EVICTION_INTERVAL = 100
+# evict down to this ratio of max_size
+EVICTION_TARGET = 0.9
+# encoding of the cached utterances: (encode, decode) by codec name
+CODECS = {'pickle': (lambda utt: pickle.dumps(utt, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+          'utt_codec': (utt_codec.encode, utt_codec.decode)}
+
+
+def file_checksum(filename, block_size=1 << 20):
+    """
+    Returns the sha1 hex digest of the content of filename.
+    """
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def model_fingerprint(versions, settings):
+    """
+    Returns the fingerprint of a model bundle: the sha1 hex digest of the versions of the model files (e.g. their
+    checksums), the normalizer settings and the utterance encoding version.
+    """
+    sha = hashlib.sha1()
+    for version in versions:
+        sha.update(version.encode('utf-8'))
+    sha.update(settings.encode('utf-8'))
+    # utterances of another encoding version are stale as well
+    sha.update('utt_codec={}'.format(utt_codec.VERSION).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def sentence_hash(sentence):
+    return hashlib.sha1(sentence.encode('utf-8')).hexdigest()
+
+
+class NormCache:
+
+    def __init__(self, db_file, model_files, settings='', max_size=1 << 30, verbalize=True, codec='pickle'):
+        """
+        Opens or creates the cache db_file for the models in model_files.
+
+        :param db_file: the SQLite database file
+        :param model_files: a list of the model files the normalized output depends on
+        :param settings: a string describing the normalizer settings that influence the output
+        :param max_size: max size of the cached data in bytes
+        :param verbalize: the cached utterances are verbalized, else only classified
+        :param codec: the encoding of the cached utterances, one of CODECS
+        """
+        if codec not in CODECS:
+            raise ValueError('Unknown cache codec: ' + codec + ', expected one of ' + ', '.join(CODECS))
+        self.db_file = db_file
+        self.max_size = max_size
+        self.verbalize = verbalize
+        self.codec = codec
+        self._encode, self._decode = CODECS[codec]
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        self._create_tables()
+        self.checksums = {os.path.abspath(filename): self._file_checksum(filename) for filename in model_files}
+        self.fingerprint = self._fingerprint(settings)
+        self._delete_stale_entries()
+
+    def get(self, sentence):
+        """
+        Returns the cached utterance for sentence, None if sentence is not in the cache.
+        """
+        conn = self._connect()
+        key = sentence_hash(sentence)
+        row = conn.execute('SELECT utterance FROM entries WHERE fingerprint = ? AND sentence_hash = ?',
+                           (self.fingerprint, key)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        with conn:
+            conn.execute('UPDATE entries SET last_access = ? WHERE fingerprint = ? AND sentence_hash = ?',
+                         (time.time(), self.fingerprint, key))
+        return self.decode(row[0])
+
+    def put(self, utt):
+        self.put_many([utt])
+
+    def put_many(self, utts):
+        """
+        Stores the normalized utterances utts, keyed by their original sentences. Utterances that could not be
+        normalized are skipped.
+        """
+        utts = [utt for utt in utts if self._normalized(utt)]
+        if not utts:
+            return
+        conn = self._connect()
+        now = time.time()
+        rows = []
+        for utt in utts:
+            data = self.encode(utt)
+            rows.append((self.fingerprint, sentence_hash(utt.original_sentence), data, len(data), now))
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO entries (fingerprint, sentence_hash, utterance, size, '
+                             'last_access) VALUES (?, ?, ?, ?, ?)', rows)
+
+        self.writes += len(utts)
+        if self.writes >= EVICTION_INTERVAL:
+            self.writes = 0
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries if the cached data exceeds max_size.
+        """
+        conn = self._connect()
+        with conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total <= self.max_size:
+                return
+            to_delete = total - int(self.max_size * EVICTION_TARGET)
+            # delete the oldest entries until to_delete bytes are freed
+            conn.execute('DELETE FROM entries WHERE rowid IN (SELECT rowid FROM (SELECT rowid, size, SUM(size) '
+                         'OVER (ORDER BY last_access, rowid) AS cumulative FROM entries) WHERE cumulative - size < ?)',
+                         (to_delete,))
+
+    def size(self):
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def encode(self, utt):
+        return self._encode(utt)
+
+    def decode(self, data):
+        return self._decode(data)
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _connect(self):
+        # connections can't be shared with forked worker processes, each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_file, timeout=60)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+        return self._connection
+
+    def _create_tables(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (fingerprint TEXT NOT NULL, sentence_hash TEXT NOT NULL, '
+                         'utterance BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL, '
+                         'PRIMARY KEY (fingerprint, sentence_hash))')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS checksums (path TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                         'mtime REAL NOT NULL, checksum TEXT NOT NULL)')
+            # the model file checksums of each fingerprint
+            conn.execute('CREATE TABLE IF NOT EXISTS fingerprint_models (fingerprint TEXT NOT NULL, '
+                         'path TEXT NOT NULL, checksum TEXT NOT NULL, PRIMARY KEY (fingerprint, path))')
+
+    def _normalized(self, utt):
+        if self.verbalize:
+            return utt.normalized_sentence != Utterance.NOT_NORMALIZED
+        return bool(utt.classified)
+
+    def _fingerprint(self, settings):
+        # entries of one codec can't be decoded by the other
+        return model_fingerprint(self.checksums.values(), settings + ' codec=' + self.codec)
+
+    def _file_checksum(self, filename):
+        conn = self._connect()
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        row = conn.execute('SELECT checksum FROM checksums WHERE path = ? AND size = ? AND mtime = ?',
+                           (path, stat.st_size, stat.st_mtime)).fetchone()
+        if row:
+            return row[0]
+
+        checksum = file_checksum(path)
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO checksums (path, size, mtime, checksum) VALUES (?, ?, ?, ?)',
+                         (path, stat.st_size, stat.st_mtime, checksum))
+        return checksum
+
+    def _delete_stale_entries(self):
+        # the entries of fingerprints for which one of the model files of this cache has changed
+        conn = self._connect()
+        with conn:
+            for path, checksum in self.checksums.items():
+                stale = 'SELECT fingerprint FROM fingerprint_models WHERE path = ? AND checksum != ?'
+                conn.execute('DELETE FROM entries WHERE fingerprint IN (' + stale + ')', (path, checksum))
+                conn.execute('DELETE FROM fingerprint_models WHERE fingerprint IN (' + stale + ')', (path, checksum))
+            conn.executemany('INSERT OR IGNORE INTO fingerprint_models (fingerprint, path, checksum) '
+                             'VALUES (?, ?, ?)',
+                             [(self.fingerprint, path, checksum) for path, checksum in self.checksums.items()])
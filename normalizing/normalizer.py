@@ -24,77 +24,288 @@ References:
 """
 
 import os
+import itertools
 import configparser
 from timeit import default_timer as timer
-import pynini as pn
-import nlp
+from concurrent.futures import ThreadPoolExecutor
 from fst_parser import FSTParser
 from tokenizer import Tokenizer
 from classifier import Classifier
 from verbalizer import Verbalizer
+from norm_cache import NormCache, model_fingerprint
+from document_state import DocumentState
+from profiler import CompositionProfiler
+from model_registry import REGISTRY
+from deadline import Deadline, TIER_DIGITS, TIER_NAMES
+from disambiguation_memo import load_memo
+from case_government import CaseGovernment
 from utterance_structure.utt_coll import UtteranceCollection
 from utterance_structure.utt_coll import Utterance
 from utterance_structure.utt_coll import TokenType
 
 
-class Normalizer:
+def read_config(configfile='normalizer.conf', working_dir=None, lm_profile='full'):
+    """
+    Reads the normalizer configuration, returns the config object and a dictionary with the absolute paths of the
+    models and the verbalizer settings.
+    """
+    if working_dir:
+        current_dir = working_dir
+    else:
+        current_dir = os.getcwd() + '/'
+
+    config = configparser.ConfigParser()
+    config.read(current_dir + configfile)
+
+    data_dir = current_dir + config['DATA_DIR']['data']
+    if lm_profile == 'compact':
+        # pruned, weight-quantized language model for low-memory deployments, see language_modeling/lm.py
+        lm_file = data_dir + config['models']['compact language model']
+    else:
+        lm_file = data_dir + config['models']['language model']
+    thrax_dir = data_dir + config['thrax']['thrax']
+    weight_threshold = config.get('verbalizer', 'weight threshold', fallback='')
+    time_budget = config.get('verbalizer', 'time budget', fallback='')
+    memo_file = config.get('verbalizer', 'disambiguation memo', fallback='')
+    case_government_file = config.get('verbalizer', 'case government', fallback='')
+
+    conf = {'working_dir': current_dir,
+            'utf8_symbols': data_dir + config['symbol tables']['utf8'],
+            'word_symbols': data_dir + config['symbol tables']['word-symbol'],
+            'lm': lm_file,
+            'compact_lm': lm_profile == 'compact',
+            'classifier_grammar': thrax_dir + config['thrax grammars']['classifier grammar'],
+            'verbalizer_grammar': thrax_dir + config['thrax grammars']['verbalizer grammar'],
+            'classifier_lookahead_grammar': thrax_dir + config.get('thrax grammars', 'classifier lookahead grammar',
+                                                                   fallback=''),
+            'verbalizer_lookahead_grammar': thrax_dir + config.get('thrax grammars', 'verbalizer lookahead grammar',
+                                                                   fallback=''),
+            'max_paths': config.getint('verbalizer', 'max paths', fallback=0),
+            'native_numbers': config.getboolean('verbalizer', 'native numbers', fallback=False),
+            'fst_filters': config.getboolean('verbalizer', 'fst filters', fallback=False),
+            'classify_batch_size': config.getint('classifier', 'batch size', fallback=1),
+            'number_lexicon': thrax_dir + config.get('thrax', 'number lexicon', fallback='verbalize_tags/lexicon/'),
+            'weight_threshold': float(weight_threshold) if weight_threshold else None,
+            'time_budget': float(time_budget) if time_budget else None,
+            'disambiguation_memo': data_dir + memo_file if memo_file else None,
+            'memo_confidence': config.getfloat('verbalizer', 'memo confidence', fallback=0.95),
+            'memo_min_count': config.getint('verbalizer', 'memo min count', fallback=5),
+            'memo_min_margin': config.getfloat('verbalizer', 'memo min margin', fallback=1.0),
+            'case_government': data_dir + case_government_file if case_government_file else None}
+
+    return config, conf
+
+
+def model_bundle(conf, lm_profile='full', verbalize=True, tag_mode=False, lookahead=False):
+    """
+    Returns the model files a normalizer with the configuration conf (see read_config()) loads and a string of the
+    settings that influence its output.
+    """
+    if lookahead:
+        model_files = [conf['classifier_lookahead_grammar'], conf['verbalizer_lookahead_grammar']]
+    else:
+        model_files = [conf['classifier_grammar'], conf['verbalizer_grammar']]
+    model_files = [conf['utf8_symbols'], conf['word_symbols']] + model_files + [conf['lm']]
+    settings = 'lm_profile={} max_paths={} weight_threshold={} verbalize={} tag_mode={} lookahead={} ' \
+               'native_numbers={} fst_filters={}'.format(lm_profile, conf['max_paths'], conf['weight_threshold'],
+                                                         verbalize, tag_mode, lookahead, conf['native_numbers'],
+                                                         conf['fst_filters'])
+    if conf['native_numbers'] or conf['fst_filters']:
+        # the lexicon files of the native number verbalization and the FST filters
+        lexicon_dir = conf['number_lexicon']
+        model_files.extend(os.path.join(lexicon_dir, filename) for filename in sorted(os.listdir(lexicon_dir))
+                           if os.path.isfile(os.path.join(lexicon_dir, filename)))
+    if conf['case_government']:
+        model_files.append(conf['case_government'])
+    if conf['disambiguation_memo']:
+        settings += ' memo_confidence={} memo_min_count={} memo_min_margin={}'.format(
+            conf['memo_confidence'], conf['memo_min_count'], conf['memo_min_margin'])
+        model_files.append(conf['disambiguation_memo'])
+
+    return model_files, settings
+
+
+def file_version(filename):
+    # path, size and modification time of a model file
+    stat = os.stat(filename)
+    return '{}:{}:{}'.format(os.path.abspath(filename), stat.st_size, stat.st_mtime)
 
-    def __init__(self, configfile='normalizer.conf', working_dir=None, verbalize=True, test_mode=False, tag_mode=False):
 
-        #TODO: print out info on used language model/grammar mode/test mode
-        if working_dir:
-            current_dir = working_dir
-        else:
-            current_dir = os.getcwd() + '/'
+class Normalizer:
 
-        config = configparser.ConfigParser()
-        config.read(current_dir + configfile)
+    STAGES = ['tokenize', 'classify', 'parse', 'tag', 'verbalize']
+    # number of re-classification passes per utterance, the tokens still failing are read character by character
+    MAX_RECLASSIFY = 2
+    # numbering of the normalizers of this process, for the model owner names
+    instances = itertools.count(1)
 
-        data_dir = current_dir + config['DATA_DIR']['data']
-        utf8_symfile = data_dir + config['symbol tables']['utf8']
-        word_symfile = data_dir + config['symbol tables']['word-symbol']
-        lm_file = data_dir + config['models']['language model']
-        thrax_dir = data_dir + config['thrax']['thrax']
-        path_to_classifier = thrax_dir + config['thrax grammars']['classifier grammar']
-        verbalizer_grammar_file = thrax_dir + config['thrax grammars']['verbalizer grammar']
-
-        self.utf8_symbols = pn.SymbolTable.read_text(utf8_symfile)
-        word_symbols = pn.SymbolTable.read_text(word_symfile)
+    def __init__(self, configfile='normalizer.conf', working_dir=None, verbalize=True, test_mode=False, tag_mode=False,
+                 lm_profile='full', tag_batch_size=32, cache_file=None, load_lm=True,
+                 profile=False, lookahead=False):
 
+        #TODO: print out info on used language model/grammar mode/test mode
+        config, conf = read_config(configfile, working_dir, lm_profile)
+        current_dir = conf['working_dir']
+        utf8_symfile = conf['utf8_symbols']
+        word_symfile = conf['word_symbols']
+        lm_file = conf['lm']
+        path_to_classifier = conf['classifier_grammar']
+        verbalizer_grammar_file = conf['verbalizer_grammar']
+        max_paths = conf['max_paths']
+        weight_threshold = conf['weight_threshold']
+        number_lexicon_dir = conf['number_lexicon'] if conf['native_numbers'] else None
+        filter_lexicon_dir = conf['number_lexicon'] if conf['fst_filters'] else None
+        if lookahead:
+            # grammars converted to lookahead FSTs, see grammar/lookahead_convert.py
+            path_to_classifier = conf['classifier_lookahead_grammar']
+            verbalizer_grammar_file = conf['verbalizer_lookahead_grammar']
+
+        # the models are shared with other normalizers in this process, see model_registry.py
+        self.owner = 'Normalizer-{} (lm_profile={} tag_mode={} lookahead={})'.format(next(Normalizer.instances),
+                                                                                    lm_profile, tag_mode, lookahead)
+        self.utf8_symbols = REGISTRY.acquire('symbols', utf8_symfile, self.owner)
+        word_symbols = REGISTRY.acquire('symbols', word_symfile, self.owner)
+
+        # records FST sizes and timings per sentence and token, see profiler.py
+        self.profiler = CompositionProfiler() if profile else None
         self.tok = Tokenizer()
-        self.classifier = Classifier(path_to_classifier, self.utf8_symbols)
+        self.classifier = Classifier(path_to_classifier, self.utf8_symbols, profiler=self.profiler,
+                                     lookahead=lookahead, owner=self.owner)
+        # number of sentences classified with one composition, see Classifier.classify_batch()
+        self.classify_batch_size = max(conf['classify_batch_size'], 1)
         self.verbalize = verbalize
         if verbalize:
-            self.verbalizer = Verbalizer(verbalizer_grammar_file, lm_file, self.utf8_symbols, word_symbols)
+            # without the language model the normalizer can only create the token verbalizations, see pipeline.py
+            case_government = CaseGovernment.from_file(conf['case_government']) if conf['case_government'] else None
+            self.verbalizer = Verbalizer(verbalizer_grammar_file, lm_file if load_lm else None, self.utf8_symbols,
+                                         word_symbols, compact_lm=(lm_profile == 'compact'), max_paths=max_paths,
+                                         weight_threshold=weight_threshold, profiler=self.profiler,
+                                         lookahead=lookahead, number_lexicon_dir=number_lexicon_dir,
+                                         filter_lexicon_dir=filter_lexicon_dir, memo=load_memo(conf),
+                                         case_government=case_government, owner=self.owner)
         self.utterance_collection = None
         self.test_mode = test_mode
         self.tag_mode = tag_mode
-
-
-    def normalize(self, text):
+        if tag_mode:
+            from pos_tagger import POSTagger
+            self.tagger = POSTagger()
+            self.tag_batch_size = tag_batch_size
+        # the executor of the background tagging while _normalize_tagged() runs
+        self._tag_executor = None
+        # accumulated processing time in seconds per normalization stage
+        self.stage_times = {stage: 0.0 for stage in self.STAGES}
+        # default time budget per call in seconds (None: no budget), number of utterances per degradation tier
+        self.time_budget = conf['time_budget']
+        self.tier_counts = {name: 0 for name in TIER_NAMES}
+        self._deadline = None
+
+        # the model files and settings the output depends on, the fingerprint of the document states is computed
+        # from the sizes and modification times of the files, the one of the cache from their checksums
+        model_files, settings = model_bundle(conf, lm_profile, verbalize, tag_mode, lookahead)
+        self.fingerprint = model_fingerprint([file_version(filename) for filename in model_files], settings)
+
+        # persistent cache of normalized utterances, the 'file' in [cache] of the config or cache_file
+        if not cache_file and config.get('cache', 'file', fallback=''):
+            cache_file = current_dir + config['cache']['file']
+        self.cache = None
+        if cache_file:
+            max_size = config.getint('cache', 'max size mb', fallback=1024) * 1024 * 1024
+            self.cache = NormCache(cache_file, model_files, settings, max_size, verbalize=verbalize,
+                                   codec=config.get('cache', 'codec', fallback='pickle'))
+
+
+    def normalize(self, text, time_budget=None):
         """
         Normalizes text, i.e. converts all non-standard-words (NSWs) into standard words, readable by a TTS system.
 
         :param text: a string, one or more sentences
+        :param time_budget: time budget for the call in seconds, the verbalization degrades when it is used up (see
+            deadline.py), default the 'time budget' of the config
         :return: a normalized version of text where no non-standard-words should be left
         """
-        self.utterance_collection = UtteranceCollection()
-        normalized_text = []
-        sentence_list = self.tok.tokenize_sentence(text)
-        for sent in sentence_list:
-            print("processing '" + sent + "' ...")
-            self.utterance_collection.add_utterance(Utterance(sent))
-        for utt in self.utterance_collection.collection:
-            self._normalize_utterance(utt)
-            if self.verbalize and not self.test_mode:
-                normalized_text.append(utt.normalized_sentence)
-            elif self.test_mode:
-                normalized_text.append(utt.get_test_output())
-            else:
-                normalized_text.append(utt.classified)
+        self._start_deadline(time_budget)
+        self._normalize_sentences(self._split_sentences(text))
+        self._deadline = None
+        return self._get_output()
 
-        return '\n'.join(normalized_text)
+    def normalize_iter(self, text, callback=None, time_budget=None):
+        """
+        Normalizes text sentence by sentence: sentences are split off text as they are needed and each normalized
+        utterance is returned as soon as it is done, e.g. for a TTS system to start synthesizing the first sentence
+        while the next ones are normalized. The utterance collection of normalize() is not created.
+
+        :param text: a string, one or more sentences
+        :param callback: a function called with each normalized Utterance before it is yielded
+        :param time_budget: time budget per sentence in seconds, see normalize()
+        :return: a generator of the normalized utterances, in the order of the sentences in text
+        """
+        for sent in self._iter_sentences(text):
+            utt = self.cache.get(sent) if self.cache else None
+            if utt is None:
+                utt = Utterance(sent)
+                self._start_deadline(time_budget)
+                self._normalize_utterance(utt)
+                self._deadline = None
+                if self.cache and not utt.degradation_tier:
+                    self.cache.put(utt)
+            if callback:
+                callback(utt)
+            yield utt
+
+    def normalize_document(self, text, state=None, time_budget=None):
+        """
+        Normalizes text, a document that has been normalized before and then edited. Only the sentences not
+        contained in state, the normalization state of the previous version, are classified and verbalized,
+        the utterances of the unchanged sentences are reused.
+
+        :param text: a string, one or more sentences
+        :param state: the DocumentState returned by the previous call for this document, None for a new document;
+            a state created with other models or settings (see DocumentState) is not used
+        :param time_budget: time budget for the call in seconds, see normalize()
+        :return: the normalized text and the DocumentState of text, without the degraded utterances (see deadline.py)
+        """
+        if state and state.fingerprint != self.fingerprint:
+            print('Document state created with other models or settings, normalizing the whole document')
+            state = None
+        self._start_deadline(time_budget)
+        self._normalize_sentences(self._split_sentences(text), state)
+        self._deadline = None
+        utts = [utt for utt in self.utterance_collection.collection if not utt.degradation_tier]
+        return self._get_output(), DocumentState(utts, self.fingerprint)
+
+    def classify_utterance(self, utt):
+        """
+        Tokenizes, classifies and parses utt, the first stage of the normalization of a sentence.
+
+        :param utt: an Utterance
+        :return: False if utt could not be classified
+        """
+        return self._classify_and_parse(utt, parse=True)
 
+    def verbalize_utterance_tokens(self, utt):
+        """
+        Creates the token verbalizations of the classified utterance utt (POS-tagged in tag mode), the second stage
+        of the normalization of a sentence. Tokens that can't be verbalized are re-classified. The best
+        verbalization is chosen by Verbalizer.finalize().
+
+        :param utt: a classified Utterance
+        :return: a Verbalized object, None if utt could not be verbalized
+        """
+        if self.tag_mode:
+            self._tag_utterances([utt])
+        verbalization = self._verbalize_tokens(utt)
+        if self._normalization_failed(utt):
+            # TODO: logging
+            print('Normalization failed for "' + utt.original_sentence + '"')
+        return verbalization
+
+    def close(self):
+        """
+        Releases the models of this normalizer in the model registry, the normalizer can't be used afterwards.
+        """
+        REGISTRY.release_owner(self.owner)
+        if self.cache:
+            self.cache.close()
 
     def print_normalized_text(self):
         """
@@ -110,64 +321,314 @@ class Normalizer:
     #   PRIVATE METHODS
     #
 
+    def _start_deadline(self, time_budget):
+        if time_budget is None:
+            time_budget = self.time_budget
+        self._deadline = Deadline(time_budget) if time_budget is not None else None
+
+    def _add_stage_time(self, stage, start):
+        self.stage_times[stage] += timer() - start
+
+    def _split_sentences(self, text):
+        start = timer()
+        sentence_list = self.tok.tokenize_sentence(text)
+        self._add_stage_time('tokenize', start)
+        return sentence_list
+
+    def _iter_sentences(self, text):
+        sentences = self.tok.iter_sentences(text)
+        while True:
+            start = timer()
+            sent = next(sentences, None)
+            self._add_stage_time('tokenize', start)
+            if sent is None:
+                return
+            yield sent
+
+    def _normalize_sentences(self, sentence_list, state=None):
+        # utterances are reused from the document state or the cache if available
+        self.utterance_collection = UtteranceCollection()
+        to_normalize = []
+        for sent in sentence_list:
+            utt = state.get(sent) if state else None
+            if utt is None and self.cache:
+                utt = self.cache.get(sent)
+            if utt is None:
+                print("processing '" + sent + "' ...")
+                utt = Utterance(sent)
+                to_normalize.append(utt)
+            self.utterance_collection.add_utterance(utt)
+        if self.tag_mode and self.verbalize:
+            self._normalize_tagged(to_normalize)
+        else:
+            self._normalize_utterances(to_normalize)
+        if self.cache:
+            # degraded normalizations are not cached
+            self.cache.put_many([utt for utt in to_normalize if not utt.degradation_tier])
+
+    def _get_output(self):
+        normalized_text = []
+        for utt in self.utterance_collection.collection:
+            if self.verbalize and not self.test_mode:
+                normalized_text.append(utt.normalized_sentence)
+            elif self.test_mode:
+                normalized_text.append(utt.get_test_output())
+            else:
+                normalized_text.append(utt.classified)
+
+        return '\n'.join(normalized_text)
+
     def _normalize_utterance(self, utt):
 
+        if not self._classify_and_parse(utt):
+            return
+        if self.verbalize:
+            if self.tag_mode:
+                self._tag_utterances([utt])
+            self._verbalize_utterance(utt)
+
+    def _normalize_utterances(self, utts):
+        # the utterances are classified in batches of classify_batch_size
+        for i in range(0, len(utts), self.classify_batch_size):
+            batch = utts[i:i + self.classify_batch_size]
+            for utt, classified in zip(batch, self._classify_and_parse_batch(batch)):
+                if classified and self.verbalize:
+                    self._verbalize_utterance(utt)
+
+    def _normalize_tagged(self, utts):
+        # POS tagging in batches of utterances: the tagging of one batch runs in a background thread while the
+        # next batch is classified and the previous one verbalized
+        # the tagger is not thread-safe: all tagging, including the tagging of re-classified spans during the
+        # verbalization, runs in the one thread of the executor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self._tag_executor = executor
+            try:
+                pending = None
+                for i in range(0, len(utts), self.tag_batch_size):
+                    batch = utts[i:i + self.tag_batch_size]
+                    batch = [utt for utt, classified in zip(batch, self._classify_and_parse_batch(batch))
+                             if classified]
+                    tagging = executor.submit(self._tag_utterances, batch)
+                    if pending:
+                        self._verbalize_tagged_batch(*pending)
+                    pending = (batch, tagging)
+                if pending:
+                    self._verbalize_tagged_batch(*pending)
+            finally:
+                self._tag_executor = None
+
+    def _verbalize_tagged_batch(self, batch, tagging):
+        # wait for the tags, re-raises exceptions from the tagger
+        tagging.result()
+        for utt in batch:
+            self._verbalize_utterance(utt)
+
+    def _classify_and_parse(self, utt, parse=None):
+
+        self._tokenize(utt)
+        if self._read_without_grammar(utt):
+            return False
+        classified_fst = self._classify(utt)
+        return self._parse_classified(classified_fst, utt, parse)
+
+    def _classify_and_parse_batch(self, utts, parse=None):
+        # as _classify_and_parse() for each utterance, with one composition per classify_batch_size utterances
+        classified = []
+        for i in range(0, len(utts), self.classify_batch_size):
+            batch = utts[i:i + self.classify_batch_size]
+            for utt in batch:
+                self._tokenize(utt)
+            to_classify = [not self._read_without_grammar(utt) for utt in batch]
+            start = timer()
+            results = iter(self.classifier.classify_batch([utt.tokenized_string for utt, classify
+                                                           in zip(batch, to_classify) if classify]))
+            self._add_stage_time('classify', start)
+            for utt, classify in zip(batch, to_classify):
+                if not classify:
+                    classified.append(False)
+                    continue
+                classified_fst, stringified = next(results)
+                utt.classified = stringified
+                classified.append(self._parse_classified(classified_fst, utt, parse))
+
+        return classified
+
+    def _read_without_grammar(self, utt):
+        # with a time budget, a sentence is not classified when it is too long or the budget is nearly used up, its
+        # tokens are read without the grammar (degradation tier TIER_DIGITS, see deadline.py)
+        if not self.verbalize or not self._deadline:
+            return False
+        if self._deadline.classify_tier(len(utt.tokenized)) != TIER_DIGITS:
+            return False
+        self.verbalizer.read_utterance(utt)
+        self.tier_counts[TIER_NAMES[utt.degradation_tier]] += 1
+        return True
+
+    def _tokenize(self, utt):
+        start = timer()
         utt.tokenized = self.tok.tokenize_words(utt.original_sentence)
         utt.tokenized_string = ' '.join(utt.tokenized)
-        classified_fst = self._classify(utt)
+        self._add_stage_time('tokenize', start)
+
+    def _parse_classified(self, classified_fst, utt, parse):
         if not utt.classified:
-            return
-        if self.verbalize:
-            self._verbalize(classified_fst, utt)
+            return False
+        if self.verbalize if parse is None else parse:
+            self._parse(classified_fst, utt)
 
-        if utt.reclassify:
-            # Some token(s) could not be normalized and where split up into single character tokens
-            # during the verbalizing process. Do a re-classification and verbalization.
-            utt.reclassify = False
-            utt.tokenized_string = self._retokenize(utt)
-            utt.ling_structure.tokens = []
-            classified_fst = self._classify(utt)
-            if self.verbalize:
-                self._verbalize(classified_fst, utt)
+        return True
+
+    def _verbalize_utterance(self, utt):
+
+        verbalization = self._verbalize_tokens(utt)
+        if verbalization:
+            start = timer()
+            self.verbalizer.finalize(utt, verbalization, self._deadline)
+            self._add_stage_time('verbalize', start)
+        if self._deadline:
+            self.tier_counts[TIER_NAMES[utt.degradation_tier]] += 1
 
         if self._normalization_failed(utt):
             # TODO: logging
             print('Normalization failed for "' + utt.original_sentence + '"')
 
+    def _verbalize_tokens(self, utt):
+
+        start = timer()
+        verbalization = self.verbalizer.verbalize_tokens(utt, self._deadline)
+        self._add_stage_time('verbalize', start)
+
+        passes = 0
+        while utt.reclassify:
+            # Some token(s) could not be normalized and where split up into single character tokens
+            # during the verbalizing process. Re-classify only the span of those tokens and verbalize again,
+            # the classification and verbalization of the other tokens is kept. After MAX_RECLASSIFY passes, or
+            # when the time budget is nearly used up, the failed tokens are read character by character.
+            utt.reclassify = False
+            if self._deadline and self._deadline.classify_tier() == TIER_DIGITS:
+                utt.degradation_tier = TIER_DIGITS
+                self._read_failed_tokens(utt)
+            elif passes < self.MAX_RECLASSIFY:
+                self._reclassify_failed_tokens(utt)
+            else:
+                self._read_failed_tokens(utt)
+            passes += 1
+            start = timer()
+            verbalization = self.verbalizer.verbalize_tokens(utt, self._deadline)
+            self._add_stage_time('verbalize', start)
+
+        return verbalization
+
+    def _reclassify_failed_tokens(self, utt):
+
+        tokens = utt.ling_structure.tokens
+        classified_groups = self._classified_token_groups(utt.classified)
+        if len(classified_groups) != len(tokens):
+            # can't map the classified string to the tokens, leave it as it is
+            classified_groups = None
+        ind = 0
+        while ind < len(tokens):
+            tok = tokens[ind]
+            if not tok.reclassify:
+                ind += 1
+                continue
+            span_utt = self._classify_span(tok)
+            span_tokens = span_utt.ling_structure.tokens
+            if not span_tokens:
+                # the span could not be classified either, keep the token and read it character by character
+                self._read_characters(tok)
+                ind += 1
+                continue
+            tokens[ind:ind + 1] = span_tokens
+            if classified_groups:
+                classified_groups[ind:ind + 1] = self._classified_token_groups(span_utt.classified)
+            ind += len(span_tokens)
+
+        if classified_groups:
+            utt.classified = ' '.join(classified_groups)
+
+    def _read_failed_tokens(self, utt):
+        for tok in utt.ling_structure.tokens:
+            if tok.reclassify:
+                self._read_characters(tok)
+
+    @staticmethod
+    def _read_characters(tok):
+        # tok.name is the space separated characters of the failed token
+        tok.reclassify = False
+        tok.verbalization_failed = True
+        tok.set_verbalization_arr([[c] for c in tok.name.split()])
+
+    def _classify_span(self, tok):
+        # tok.name is the space separated characters of the failed token, classify and parse it as an utterance
+        # of its own and map the token indices back to the positions of the characters in the original token
+        span_utt = Utterance(tok.name)
+        span_utt.tokenized = tok.name.split()
+        span_utt.tokenized_string = tok.name
+        classified_fst = self._classify(span_utt)
+        if not span_utt.classified:
+            return span_utt
+        self._parse(classified_fst, span_utt)
+        for span_tok in span_utt.ling_structure.tokens:
+            span_tok.start_index = tok.start_index + span_tok.start_index // 2
+            span_tok.end_index = tok.start_index + span_tok.end_index // 2
+        if self.tag_mode:
+            if self._tag_executor:
+                # after the batch being tagged in the background, see _normalize_tagged()
+                self._tag_executor.submit(self._tag_tokens, span_utt.ling_structure.tokens).result()
+            else:
+                self._tag_tokens(span_utt.ling_structure.tokens)
+
+        return span_utt
+
+    @staticmethod
+    def _classified_token_groups(classified):
+        # splits a classified string into its 'tokens { ... }' groups, one per token
+        groups = []
+        depth = 0
+        in_quotes = False
+        group_start = None
+        for ind, c in enumerate(classified):
+            if c == '"':
+                in_quotes = not in_quotes
+            elif in_quotes:
+                continue
+            elif c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if depth == 0 and group_start is not None:
+                    groups.append(classified[group_start:ind + 1])
+                    group_start = None
+            if group_start is None and depth == 0 and not c.isspace() and c != '}':
+                group_start = ind
+
+        return groups
 
     def _classify(self, utt):
 
+        start = timer()
         classified_fst, stringified = self.classifier.classify(utt.tokenized_string)
         utt.classified = stringified
+        self._add_stage_time('classify', start)
         return classified_fst
 
-    def _verbalize(self, classified_fst, utt):
+    def _parse(self, classified_fst, utt):
+        start = timer()
         parser = FSTParser(self.utf8_symbols)
         parser.parse_tokens_from_fst(classified_fst, utt)
-        if self.tag_mode:
-            self._tag_utterance(utt)
-        self.verbalizer.verbalize(utt)
-
+        self._add_stage_time('parse', start)
 
-    def _tag_utterance(self, utt):
-        #tagged = nlp.tag_sentence(utt.original_sentence)
-        token_arr = []
-        for tok in utt.ling_structure.tokens:
-            token_arr.append(tok.word)
-        tokens = '\n'.join(token_arr)
-        tagged = nlp.tag_sentence(tokens)
-        print(tagged)
-        tagged_arr = tagged.split()
-        tag_ind = 0
-        for ind, tok in enumerate(utt.ling_structure.tokens):
-            if tok.token_type != TokenType.SEMIOTIC_CLASS:
-                tagged_token = tagged_arr[tag_ind]
-                while tagged_token[:tagged_token.index('_')].lower() != tok.word.lower():
-                    tag_ind += 1
-                    tagged_token = tagged_arr[tag_ind]
-                tok.word = tagged_arr[tag_ind]
 
+    def _tag_utterances(self, utts):
+        start = timer()
+        self.tagger.tag_utterances(utts)
+        self._add_stage_time('tag', start)
 
+    def _tag_tokens(self, tokens):
+        start = timer()
+        self.tagger.tag_tokens(tokens)
+        self._add_stage_time('tag', start)
 
     def _normalization_failed(self, utt):
 
@@ -178,15 +639,6 @@ class Normalizer:
         return False
 
 
-    def _retokenize(self, utt):
-
-        utt.tokenized = []
-        for tok in utt.ling_structure.tokens:
-            utt.tokenized.append(tok.name)
-
-        return ' '.join(utt.tokenized)
-
-
 def main():
     import sys
     start = timer()
@@ -222,6 +674,7 @@ def main():
 
     end = timer()
     print('Total duration: ' + str(end - start))
+    norm.verbalizer.print_path_stats()
 
     with open(output, 'w') as f:
         for norm in all_normalized:
@@ -18,10 +18,51 @@ config['symbol tables']['utf8'] = 'utf8.syms'
 config['symbol tables']['word-symbol'] = 'mixed_word_sym.txt'
 config['models'] = {}
 config['models']['language model'] = 'TRAINING_MIXED_for_lm_unk.fst'
+# pruned, weight-quantized model for Normalizer(lm_profile='compact'), see language_modeling/lm.py --compact
+config['models']['compact language model'] = 'TRAINING_MIXED_for_lm_unk_relative_entropy_pruned_compact.fst'
 config['thrax'] = {'thrax': 'thrax_grammar/'}
+# the lexicons of the number grammars, for the native verbalization of numbers (see number_verbalizer.py)
+config['thrax']['number lexicon'] = 'verbalize_tags/lexicon/'
 config['thrax grammars'] = {}
 config['thrax grammars']['classifier grammar'] = 'classify/TOKENIZE_AND_CLASSIFY'
 config['thrax grammars']['verbalizer grammar'] = 'verbalize_tags/ALL'
+# the grammars converted to lookahead FSTs for Normalizer(lookahead=True), see grammar/lookahead_convert.py
+config['thrax grammars']['classifier lookahead grammar'] = 'classify/TOKENIZE_AND_CLASSIFY_lookahead'
+config['thrax grammars']['verbalizer lookahead grammar'] = 'verbalize_tags/ALL_lookahead'
+# number of sentences classified with one composition (1: one by one), see Classifier.classify_batch()
+config['classifier'] = {}
+config['classifier']['batch size'] = '16'
+# limit the verbalization paths of a token before they are enumerated: 'max paths' n-best paths (0: no limit),
+# and/or prune paths with a weight above best + 'weight threshold' (empty: no threshold). Most grammar paths are
+# unweighted, a limit drops arbitrary inflection alternatives before the LM disambiguation and changes the output
+config['verbalizer'] = {}
+config['verbalizer']['max paths'] = '0'
+config['verbalizer']['weight threshold'] = ''
+# verbalize cardinals and ordinals natively instead of with the grammar (faster), only enable after
+# test/number_verbalizer_test.py has passed against the compiled verbalizer grammar
+config['verbalizer']['native numbers'] = 'no'
+# filter the verbalization paths (POS agreement, superfluous 'og') with FSTs before they are listed, with the tags of
+# the number lexicon and the grammar files (same result, faster for tokens with many paths)
+config['verbalizer']['fst filters'] = 'yes'
+# prune the case alternatives of numbers after prepositions and verbs governing a case, with the table in the data
+# directory, e.g. 'case_government.tsv' (empty: no pruning). Pruning can remove correct readings, only enable it
+# after comparing the output with 'python3 case_government.py <corpus>', see case_government.py
+config['verbalizer']['case government'] = ''
+# learned disambiguation memo (file in the data directory, empty: no memo), ambiguous tokens are resolved from it
+# without the language model when the recorded choice is confident enough, see disambiguation_memo.py
+config['verbalizer']['disambiguation memo'] = ''
+config['verbalizer']['memo confidence'] = '0.95'
+config['verbalizer']['memo min count'] = '5'
+config['verbalizer']['memo min margin'] = '1.0'
+# time budget per normalize() call in seconds, the verbalization degrades when it is used up, see deadline.py
+# (empty: no budget)
+config['verbalizer']['time budget'] = ''
+# persistent cache of normalized sentences (SQLite file in the working directory, empty: no cache), see norm_cache.py
+config['cache'] = {}
+config['cache']['file'] = ''
+config['cache']['max size mb'] = '1024'
+# encoding of the cached utterances: pickle (faster) or utt_codec (smaller entries), see norm_cache.py
+config['cache']['codec'] = 'pickle'
 
 with open('normalizer.conf', 'w') as configfile:
     config.write(configfile)
\ No newline at end of file
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Native verbalization of cardinals and ordinals, a fast path for the most frequent semiotic classes that avoids the
+composition with the verbalizer grammar and the enumeration of its paths.
+
+The rules of the thrax grammars verbalize_tags/numbers.grm (CARDINAL) and verbalize_tags/ordinal.grm (ORDINAL)
+are rebuilt here from the same lexicon files, with the same weights, as functions from a digit string to all its
+verbalizations: a dictionary of verbalization -> weight (tropical, the lowest weight of all paths). The results
+are the same alternative sets, in all cases, genders and numbers, as the grammar produces for
+'cardinal|integer: n |' and 'ordinal|integer: n |'. Changes to numbers.grm or ordinal.grm have to be made here as
+well, test/number_verbalizer_test.py compares both against the compiled grammar.
+
+"""
+
+# max number of cached results per rule, the cache is cleared when full
+MAX_CACHE = 100000
+# results with more alternatives are not cached
+MAX_CACHED_ALTERNATIVES = 1000
+
+
+def read_lexicon(lexicon_file):
+    """
+    Reads a thrax StringFile: 'input<tab>output' per line, or 'input' for an acceptor entry.
+
+    :return: a dictionary input -> list of outputs
+    """
+    lexicon = {}
+    with open(lexicon_file) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            arr = line.split('\t')
+            inp = arr[0]
+            out = arr[1] if len(arr) > 1 else arr[0]
+            lexicon.setdefault(inp, []).append(out)
+    return lexicon
+
+
+#
+#  RULES, corresponding to the thrax operators: each rule maps an input string to a dictionary of
+#  output -> weight, empty if the rule does not accept the input
+#
+
+class Rule:
+
+    def __init__(self):
+        self.cache = {}
+        self.count_cache = {}
+
+    def __call__(self, inp):
+        if inp in self.cache:
+            return self.cache[inp]
+        result = self.apply(inp)
+        if len(result) <= MAX_CACHED_ALTERNATIVES:
+            if len(self.cache) >= MAX_CACHE:
+                self.cache = {}
+            self.cache[inp] = result
+        return result
+
+    def count(self, inp):
+        """
+        Returns the number of paths for inp, an upper bound of the number of distinct verbalizations.
+        """
+        if inp not in self.count_cache:
+            if len(self.count_cache) >= MAX_CACHE:
+                self.count_cache = {}
+            self.count_cache[inp] = self.count_paths(inp)
+        return self.count_cache[inp]
+
+    def apply(self, inp):
+        raise NotImplementedError
+
+    def count_paths(self, inp):
+        raise NotImplementedError
+
+
+class Lexicon(Rule):
+
+    def __init__(self, lexicon):
+        super().__init__()
+        self.lexicon = lexicon
+
+    def apply(self, inp):
+        return {out: 0.0 for out in self.lexicon.get(inp, [])}
+
+    def count_paths(self, inp):
+        return len(self.lexicon.get(inp, []))
+
+
+class Cross(Rule):
+    # inp : out, Insert[out] with inp == '', Delete[inp] with out == '', an acceptor with inp == out
+
+    def __init__(self, inp, out):
+        super().__init__()
+        self.inp = inp
+        self.out = out
+
+    def apply(self, inp):
+        return {self.out: 0.0} if inp == self.inp else {}
+
+    def count_paths(self, inp):
+        return 1 if inp == self.inp else 0
+
+
+class Union(Rule):
+
+    def __init__(self, *rules):
+        super().__init__()
+        self.rules = rules
+
+    def apply(self, inp):
+        result = {}
+        for rule in self.rules:
+            add_alternatives(result, rule(inp))
+        return result
+
+    def count_paths(self, inp):
+        return sum(rule.count(inp) for rule in self.rules)
+
+
+class Concat(Rule):
+
+    def __init__(self, *rules):
+        super().__init__()
+        self.first = rules[0]
+        self.rest = Concat(*rules[1:]) if len(rules) > 2 else rules[1]
+
+    def apply(self, inp):
+        result = {}
+        for ind in range(len(inp) + 1):
+            first = self.first(inp[:ind])
+            if not first:
+                continue
+            rest = self.rest(inp[ind:])
+            for out1, weight1 in first.items():
+                add_alternatives(result, {out1 + out2: weight1 + weight2 for out2, weight2 in rest.items()})
+        return result
+
+    def count_paths(self, inp):
+        count = 0
+        for ind in range(len(inp) + 1):
+            first = self.first.count(inp[:ind])
+            if first:
+                count += first * self.rest.count(inp[ind:])
+        return count
+
+
+class Weighted(Rule):
+
+    def __init__(self, rule, weight):
+        super().__init__()
+        self.rule = rule
+        self.weight = weight
+
+    def apply(self, inp):
+        return {out: weight + self.weight for out, weight in self.rule(inp).items()}
+
+    def count_paths(self, inp):
+        return self.rule.count(inp)
+
+
+def add_alternatives(result, alternatives):
+    for out, weight in alternatives.items():
+        if out not in result or weight < result[out]:
+            result[out] = weight
+
+
+def insert(out):
+    return Cross('', out)
+
+
+def delete(inp):
+    return Cross(inp, '')
+
+
+class NumberVerbalizer:
+
+    def __init__(self, lexicon_dir):
+        lex = lambda name: Lexicon(read_lexicon(lexicon_dir + name))
+        self.cardinal = self._cardinal_rules(lex)
+        self.ordinal = self._ordinal_rules(lex)
+
+    def verbalize(self, sem_class, digits, max_count=None):
+        """
+        Returns all verbalizations of digits for sem_class ('cardinal' or 'ordinal') as a dictionary of
+        verbalization -> weight. An empty dictionary means the grammar has no verbalization for digits either.
+        Returns None if sem_class is not handled here, or if digits has more than max_count verbalization paths.
+        """
+        if sem_class == 'cardinal':
+            rule = self.cardinal
+        elif sem_class == 'ordinal':
+            rule = self.ordinal
+        else:
+            return None
+        if max_count and rule.count(digits) > max_count:
+            return None
+        return rule(digits)
+
+    @staticmethod
+    def _cardinal_rules(lex):
+        # verbalize_tags/numbers.grm
+        cardinal_simple = lex('cardinals.tsv')
+        units_not_neutral = lex('units_notNeutral.txt')
+        teens = lex('teens.tsv')
+        decades = lex('decades.tsv')
+        neutral_units2to9 = lex('neutral_units2to9.txt')
+
+        insspace = insert(' ')
+        insand = insert(' og ')
+        space_or_and = Union(insspace, insand)
+        delzero = delete('0')
+
+        zero = Cross('0', 'núll')
+        one_neutr = Cross('1', 'eitt_tfhen')
+        ten = Cross('10', 'tíu')
+
+        teensplus = Union(ten, teens)
+        neutral_units = Union(one_neutr, neutral_units2to9)
+        units = Union(units_not_neutral, neutral_units)
+
+        cardinal_decades = Union(Concat(decades, delzero), Concat(decades, insand, cardinal_simple))
+        numbers_20_to_99 = Union(Concat(decades, delzero),
+                                 Concat(decades, insand, Union(Weighted(units_not_neutral, -3),
+                                                               Weighted(neutral_units, -4))))
+        numbers_20_to_99_neutr = Union(Concat(decades, delzero), Concat(decades, insand, neutral_units))
+
+        hundreds_all = Union(Concat(one_neutr, insert(' hundrað')), Concat(neutral_units2to9, insert(' hundruð')))
+        hundreds_plain = Union(Concat(delete('1'), insert(' hundrað')),
+                               Concat(neutral_units2to9, insert(' hundruð')))
+
+        def cardinal_hundreds(hundreds):
+            return Union(Concat(hundreds, delzero, delzero),
+                         Concat(hundreds, delzero, insand, cardinal_simple),
+                         Concat(hundreds, insand, teens),
+                         Concat(hundreds, space_or_and, cardinal_decades))
+
+        cardinal_hundreds_all = cardinal_hundreds(hundreds_all)
+        cardinal_hundreds_plain = cardinal_hundreds(hundreds_plain)
+
+        year_hundreds = Concat(teens, insspace, insert('hundruð'),
+                               Union(Concat(delzero, delzero),
+                                     Concat(delzero, insand, neutral_units),
+                                     Concat(insand, teensplus),
+                                     Concat(space_or_and, numbers_20_to_99_neutr)))
+        year_mill = Concat(neutral_units2to9, insert(' '), insert('þúsund'),
+                           Union(Concat(delzero, delzero, delzero),
+                                 Concat(delzero, delzero, insand, neutral_units),
+                                 Concat(delzero, insand, teensplus),
+                                 Concat(delzero, space_or_and, numbers_20_to_99_neutr)))
+        year = Union(year_hundreds, year_mill)
+
+        tail_1000_to_1099 = Concat(insert('þúsund'),
+                                   Union(Concat(delzero, delzero, delzero),
+                                         Concat(delzero, delzero, insand, units),
+                                         Concat(delzero, insand, teensplus),
+                                         Concat(delzero, space_or_and, numbers_20_to_99)))
+        numbers_1000_to_1099 = Concat(one_neutr, insspace, tail_1000_to_1099)
+        numbers_1100_to_1999 = Concat(teens, insspace, insert('hundruð'),
+                                      Union(Concat(delzero, delzero),
+                                            Concat(delzero, insand, units),
+                                            Concat(insand, teensplus),
+                                            Concat(space_or_and, numbers_20_to_99)))
+        tail_2000_to_9999 = Concat(insert('þúsund'),
+                                   Union(Concat(delzero, delzero, delzero),
+                                         Concat(delzero, delzero, insand, units),
+                                         Concat(delzero, insand, teensplus),
+                                         Concat(delzero, space_or_and, numbers_20_to_99),
+                                         Concat(space_or_and, cardinal_hundreds_all)))
+        numbers_2000_to_9999 = Concat(neutral_units2to9, insspace, tail_2000_to_9999)
+        numbers_10000_to_99999 = Concat(Union(teensplus, numbers_20_to_99), insspace, tail_2000_to_9999)
+        numbers_100000_to_999999 = Concat(cardinal_hundreds_plain, insspace, tail_2000_to_9999)
+
+        millions = Union(*[insert(million) for million in
+                           ['milljón', 'milljónar', 'milljónir', 'milljónum', 'milljóna']])
+        tail_1m_to_9m = Concat(millions, Union(
+            Concat(*[delzero] * 6),
+            Weighted(Concat(*[delzero] * 5 + [insand, units]), -4),
+            Weighted(Concat(*[delzero] * 4 + [space_or_and, Union(teens, numbers_20_to_99)]), -6),
+            Weighted(Concat(*[delzero] * 3 + [space_or_and, cardinal_hundreds_plain]), -8),
+            Concat(delzero, delzero, space_or_and,
+                   Union(numbers_1000_to_1099, numbers_1100_to_1999, numbers_2000_to_9999)),
+            Weighted(Concat(delzero, space_or_and, numbers_10000_to_99999), -60),
+            Weighted(Concat(space_or_and, numbers_100000_to_999999), -150)))
+        numbers_1m_to_9m = Concat(units, insspace, tail_1m_to_9m)
+        numbers_10m_to_99m = Concat(Union(teensplus, numbers_20_to_99), insspace, tail_1m_to_9m)
+        numbers_100m_to_999m = Concat(cardinal_hundreds_plain, insspace, tail_1m_to_9m)
+
+        numbers_to_99 = Union(zero, cardinal_simple, teensplus, cardinal_decades)
+
+        return Union(numbers_to_99, cardinal_hundreds_plain, numbers_1000_to_1099, numbers_1100_to_1999,
+                     numbers_2000_to_9999, numbers_10000_to_99999, numbers_100000_to_999999, numbers_1m_to_9m,
+                     numbers_10m_to_99m, numbers_100m_to_999m, year)
+
+    @staticmethod
+    def _ordinal_rules(lex):
+        # verbalize_tags/ordinal.grm
+        units = lex('ordinals_simple.txt')
+        teens = lex('ordinals_teens_simple.tsv')
+        decades = lex('ordinals_decades_lexicon.txt')
+        neutral_units2to9 = lex('neutral_units2to9.txt')
+
+        insspace = insert(' ')
+        insand = insert(' og ')
+        delzero = delete('0')
+        # the acceptor "eitt" of the grammar, only matches the input 'eitt'
+        eitt = Union(Concat(Weighted(Cross('eitt', 'eitt'), 2.0), insspace), delete('1'))
+
+        ordinals_20_to_99 = Union(Concat(decades, delzero), Concat(decades, insand, units))
+        hundreds1 = Union(Concat(eitt, Union(insert('hundraðasta'), insert('hundraðasti'))),
+                          Concat(neutral_units2to9, insspace,
+                                 Union(insert('hundraðasti'), insert('hundraðasta'), insert('hundruðustu'))))
+        hundreds2 = Union(Concat(eitt, insert('hundrað')),
+                          Concat(neutral_units2to9, insspace, insert('hundruð')))
+        ordinals_100_to_999 = Union(Concat(hundreds1, delzero, delzero),
+                                    Weighted(Concat(hundreds1, delzero, insand, units), -1),
+                                    Weighted(Concat(hundreds1, insand, teens), -2),
+                                    Weighted(Concat(hundreds2, Union(insspace, insand), ordinals_20_to_99), -10))
+
+        return Union(Weighted(units, -0.5), Weighted(teens, -1), Weighted(ordinals_20_to_99, -2),
+                     Weighted(ordinals_100_to_999, -10))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pipelined normalization of long documents. The normalization of a sentence is split into four stages, each run by
+its own worker processes, connected by bounded queues:
+
+    1) split: sentence splitting of a paragraph (Tokenizer.tokenize_sentence())
+    2) classify: word tokenization, FST classification and parsing (Normalizer.classify_utterance())
+    3) verbalize: token verbalization (Normalizer.verbalize_utterance_tokens())
+    4) lm: language model disambiguation (Verbalizer.finalize())
+
+While one sentence is being disambiguated the next ones are verbalized and classified, such that a long document
+keeps several cores busy. Each worker loads only the models of its stage, the number of workers per stage is
+configurable. The normalized sentences are returned in document order; at most max_paragraphs paragraphs are in
+the pipeline at a time, such that a slow paragraph does not let the reorder buffer grow without bound.
+
+    python3 pipeline.py document.txt --output document_normalized.txt --workers 1 2 3 2
+
+"""
+
+import sys
+import queue
+import argparse
+import threading
+import multiprocessing
+from tokenizer import Tokenizer
+from utterance_structure.utt_coll import Utterance
+
+STAGES = ['split', 'classify', 'verbalize', 'lm']
+DEFAULT_WORKERS = {'split': 1, 'classify': 1, 'verbalize': 1, 'lm': 1}
+
+
+class PipelineItem:
+    """
+    A sentence passing through the pipeline: its position in the document, the utterance and its verbalization
+    paths (after the verbalize stage). An empty paragraph is one item with utt None.
+    """
+
+    def __init__(self, paragraph_ind, sentence_ind=0, sentence_count=0, utt=None):
+        self.paragraph_ind = paragraph_ind
+        self.sentence_ind = sentence_ind
+        self.sentence_count = sentence_count
+        self.utt = utt
+        self.verbalization = None
+
+
+#
+#  STAGES, each function loads the models of the stage and returns the processing function for a pipeline item
+#
+
+def split_stage(settings):
+    tok = Tokenizer()
+
+    def process(item):
+        # item is a (paragraph index, paragraph text) tuple, returns a list of pipeline items
+        paragraph_ind, text = item
+        sentences = tok.tokenize_sentence(text) if text.strip() else []
+        if not sentences:
+            return [PipelineItem(paragraph_ind)]
+        return [PipelineItem(paragraph_ind, ind, len(sentences), Utterance(sent)) for ind, sent in enumerate(sentences)]
+
+    return process
+
+
+def classify_stage(settings):
+    from normalizer import Normalizer
+    norm = Normalizer(configfile=settings['configfile'], working_dir=settings['working_dir'], verbalize=False,
+                      lm_profile=settings['lm_profile'])
+
+    def process(item):
+        if item.utt:
+            norm.classify_utterance(item.utt)
+        return [item]
+
+    return process
+
+
+def verbalize_stage(settings):
+    from normalizer import Normalizer
+    norm = Normalizer(configfile=settings['configfile'], working_dir=settings['working_dir'],
+                      tag_mode=settings['tag_mode'], lm_profile=settings['lm_profile'], load_lm=False)
+
+    def process(item):
+        if item.utt and item.utt.ling_structure.tokens:
+            item.verbalization = norm.verbalize_utterance_tokens(item.utt)
+        return [item]
+
+    return process
+
+
+def lm_stage(settings):
+    from normalizer import read_config
+    from verbalizer import Verbalizer
+    from model_registry import REGISTRY
+    from disambiguation_memo import load_memo
+    config, conf = read_config(settings['configfile'], settings['working_dir'], settings['lm_profile'])
+    owner = 'pipeline lm stage'
+    utf8_symbols = REGISTRY.acquire('symbols', conf['utf8_symbols'], owner)
+    word_symbols = REGISTRY.acquire('symbols', conf['word_symbols'], owner)
+    verbalizer = Verbalizer(None, conf['lm'], utf8_symbols, word_symbols, compact_lm=conf['compact_lm'],
+                            memo=load_memo(conf), owner=owner)
+
+    def process(item):
+        if item.verbalization:
+            verbalizer.finalize(item.utt, item.verbalization)
+            item.verbalization = None
+        return [item]
+
+    return process
+
+
+def unsplit_item(paragraph_ind, text):
+    # a paragraph that could not be split into sentences, passed on as one sentence with the raw text as its
+    # normalization until a later stage normalizes it
+    if not text.strip():
+        return PipelineItem(paragraph_ind)
+    utt = Utterance(text)
+    utt.normalized_sentence = text
+    return PipelineItem(paragraph_ind, 0, 1, utt)
+
+
+STAGE_FUNCTIONS = {'split': split_stage, 'classify': classify_stage, 'verbalize': verbalize_stage,
+                   'lm': lm_stage}
+
+
+def stage_worker(stage, stage_function, settings, in_queue, out_queue):
+    process = stage_function(settings)
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        try:
+            results = process(item)
+        except Exception as e:
+            # pass the item on unchanged, such that the document is complete in the output
+            print('Error in pipeline stage ' + stage + ': ' + str(e), file=sys.stderr)
+            results = [item] if isinstance(item, PipelineItem) else [unsplit_item(*item)]
+        for result in results:
+            out_queue.put(result)
+
+
+class Pipeline:
+
+    def __init__(self, configfile='normalizer.conf', working_dir=None, lm_profile='full', tag_mode=False,
+                 test_mode=False, workers=None, queue_size=32, max_paragraphs=256, stage_functions=None):
+        """
+        Starts the worker processes of all stages.
+
+        :param workers: a dictionary with the number of worker processes per stage (see STAGES), default 1
+        :param queue_size: max number of items waiting between two stages
+        :param max_paragraphs: max number of paragraphs in the pipeline and the reorder buffer
+        :param stage_functions: a dictionary of stage functions replacing those of STAGE_FUNCTIONS
+        """
+        self.test_mode = test_mode
+        self.max_paragraphs = max_paragraphs
+        functions = dict(STAGE_FUNCTIONS)
+        functions.update(stage_functions or {})
+        self.workers = dict(DEFAULT_WORKERS)
+        self.workers.update(workers or {})
+        settings = {'configfile': configfile, 'working_dir': working_dir, 'lm_profile': lm_profile,
+                    'tag_mode': tag_mode}
+
+        self.queues = [multiprocessing.Queue(maxsize=queue_size) for _ in range(len(STAGES) + 1)]
+        self.processes = {stage: [] for stage in STAGES}
+        for ind, stage in enumerate(STAGES):
+            for i in range(self.workers[stage]):
+                proc = multiprocessing.Process(target=stage_worker,
+                                               args=(stage, functions[stage], settings, self.queues[ind],
+                                                     self.queues[ind + 1]),
+                                               daemon=True)
+                proc.start()
+                self.processes[stage].append(proc)
+
+    def run(self, paragraphs):
+        """
+        Normalizes paragraphs, an iterable of strings, each one or more sentences.
+
+        :return: a generator of the normalized utterances, in the order of the paragraphs and sentences
+        """
+        feeder_done = threading.Event()
+        paragraph_count = [0]
+        # released when a paragraph has been yielded
+        in_flight = threading.Semaphore(self.max_paragraphs)
+
+        def feed():
+            for paragraph in paragraphs:
+                in_flight.acquire()
+                self.queues[0].put((paragraph_count[0], paragraph))
+                paragraph_count[0] += 1
+            feeder_done.set()
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        # reorder buffer: paragraph index -> received items
+        pending = {}
+        next_paragraph = 0
+        while not feeder_done.is_set() or next_paragraph < paragraph_count[0]:
+            try:
+                item = self.queues[-1].get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            pending.setdefault(item.paragraph_ind, []).append(item)
+            while next_paragraph in pending and \
+                    len(pending[next_paragraph]) == max(pending[next_paragraph][0].sentence_count, 1):
+                for done in sorted(pending.pop(next_paragraph), key=lambda it: it.sentence_ind):
+                    if done.utt:
+                        yield done.utt
+                next_paragraph += 1
+                in_flight.release()
+
+        feeder.join()
+
+    def normalize(self, text):
+        """
+        Normalizes text, one paragraph per line. Returns the normalized sentences like Normalizer.normalize(), one
+        sentence per line (token-by-token output in test mode).
+        """
+        normalized_text = []
+        for utt in self.run(text.split('\n')):
+            if self.test_mode:
+                normalized_text.append(utt.get_test_output())
+            else:
+                normalized_text.append(utt.normalized_sentence)
+
+        return '\n'.join(normalized_text)
+
+    def close(self):
+        """
+        Stops the worker processes, stage by stage.
+        """
+        for ind, stage in enumerate(STAGES):
+            for _ in self.processes[stage]:
+                self.queues[ind].put(None)
+            for proc in self.processes[stage]:
+                proc.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _check_workers(self):
+        for stage in STAGES:
+            for proc in self.processes[stage]:
+                if not proc.is_alive():
+                    raise RuntimeError('Worker process of pipeline stage ' + stage + ' died with exit code '
+                                       + str(proc.exitcode))
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("document", type=str, help='text file, one paragraph per line')
+    parser.add_argument("--output", type=str, default=None, help='output file, default stdout')
+    parser.add_argument("--workers", type=int, nargs=4, default=[1, 1, 1, 1], metavar=('SPLIT', 'CLASSIFY',
+                                                                                       'VERBALIZE', 'LM'),
+                        help='number of worker processes per stage')
+    parser.add_argument("--queue_size", type=int, default=32)
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--lm_profile", type=str, default='full', choices=['full', 'compact'])
+    parser.add_argument("--tag_mode", action='store_true')
+    parser.add_argument("--test_mode", action='store_true')
+
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    workers = dict(zip(STAGES, args.workers))
+    text = open(args.document).read()
+    with Pipeline(configfile=args.configfile, working_dir=args.working_dir, lm_profile=args.lm_profile,
+                  tag_mode=args.tag_mode, test_mode=args.test_mode, workers=workers,
+                  queue_size=args.queue_size) as pipeline:
+        normalized = pipeline.normalize(text)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(normalized + '\n')
+    else:
+        print(normalized)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Part-of-speech tagging of the word tokens of utterances, for the tag mode of the normalizer.
+
+The tagger is called once for a batch of utterances: the tokens of an utterance are newline separated, utterances
+are separated by an empty line. The tags are aligned to the tokens by index; only if the tagger output does not
+match the tokens (e.g. the tagger split a token) the tokens of an utterance are aligned by searching for the words
+in the tagger output.
+
+"""
+
+import nlp
+from utterance_structure.utt_coll import TokenType
+
+
+class POSTagger:
+
+    TAG_SEP = '_'
+
+    def __init__(self):
+        # the tagger is loaded once, on import of nlp, and used for all batches
+        self.tagger = nlp
+
+    def tag_utterances(self, utts):
+        """
+        Tags the word tokens of all utterances in utts with one call to the tagger. Sets the word of each
+        non-semiotic-class token to 'word_tag'.
+
+        :param utts: a list of utterances with parsed tokens
+        :return: None
+        """
+        token_lists = [utt.ling_structure.tokens for utt in utts if utt.ling_structure.tokens]
+        if not token_lists:
+            return
+        tagger_input = '\n\n'.join(['\n'.join([tok.word for tok in tokens]) for tokens in token_lists])
+        tagged_arr = self.tagger.tag_sentence(tagger_input).split()
+
+        if len(tagged_arr) != sum([len(tokens) for tokens in token_lists]):
+            # the tagger did not return one tag per token, can't split the batch by index
+            for tokens in token_lists:
+                self.tag_tokens(tokens)
+            return
+
+        ind = 0
+        for tokens in token_lists:
+            self._align_tags(tokens, tagged_arr[ind:ind + len(tokens)])
+            ind += len(tokens)
+
+    def tag_tokens(self, tokens):
+        """
+        Tags a list of tokens (one utterance or a part of it) with one call to the tagger.
+        """
+        tagged = self.tagger.tag_sentence('\n'.join([tok.word for tok in tokens]))
+        self._align_tags(tokens, tagged.split())
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _align_tags(self, tokens, tagged_arr):
+        if len(tagged_arr) == len(tokens) and all(self._matches(tagged, tok)
+                                                  for tagged, tok in zip(tagged_arr, tokens)
+                                                  if tok.token_type != TokenType.SEMIOTIC_CLASS):
+            for tagged, tok in zip(tagged_arr, tokens):
+                if tok.token_type != TokenType.SEMIOTIC_CLASS:
+                    tok.word = tagged
+        else:
+            self._align_by_search(tokens, tagged_arr)
+
+    def _align_by_search(self, tokens, tagged_arr):
+        tag_ind = 0
+        for tok in tokens:
+            if tok.token_type != TokenType.SEMIOTIC_CLASS:
+                tagged_token = tagged_arr[tag_ind]
+                while not self._matches(tagged_token, tok):
+                    tag_ind += 1
+                    tagged_token = tagged_arr[tag_ind]
+                tok.word = tagged_arr[tag_ind]
+
+    def _matches(self, tagged_token, tok):
+        if self.TAG_SEP not in tagged_token:
+            return False
+        return tagged_token[:tagged_token.index(self.TAG_SEP)].lower() == tok.word.lower()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profiling of the FST operations of the normalizer, to find the inputs and grammar rules causing latency spikes.
+
+With a CompositionProfiler passed to the Classifier and the Verbalizer (Normalizer(profile=True)), the size
+(states and arcs) of the composition results, the size of the FST the paths are enumerated from, the number of
+verbalization paths and the processing time are recorded per classified sentence and per verbalized token. The
+report shows the totals per semiotic class and the worst inputs (top-N by states, arcs, paths and time):
+
+    python3 profiler.py test_sentences.txt --top 20 --output profile_report.json
+
+"""
+
+import json
+import argparse
+from timeit import default_timer as timer
+
+REPORT_KEYS = ['compose_states', 'compose_arcs', 'paths', 'time']
+
+
+def fst_counts(fst):
+    """
+    Returns the number of states and arcs of fst.
+    """
+    return fst.num_states(), sum(fst.num_arcs(state) for state in fst.states())
+
+
+class CompositionProfiler:
+
+    def __init__(self):
+        self.records = []
+
+    def start(self):
+        return timer()
+
+    def record(self, stage, inp, sem_class, start, compose_counts=None, path_counts=None, paths=None):
+        """
+        Records one FST operation.
+
+        :param stage: 'classify' or 'verbalize'
+        :param inp: the input string (sentence or token name)
+        :param sem_class: the semiotic class of the token ('sentence' for classification)
+        :param start: the start time as returned by start()
+        :param compose_counts: (states, arcs) of the result of the composition with the grammar
+        :param path_counts: (states, arcs) of the FST the paths are enumerated from
+        :param paths: the number of enumerated paths
+        """
+        duration = timer() - start
+        rec = {'stage': stage, 'input': inp, 'class': sem_class, 'time': duration,
+               'compose_states': 0, 'compose_arcs': 0, 'path_states': 0, 'path_arcs': 0, 'paths': paths or 0}
+        if compose_counts:
+            rec['compose_states'], rec['compose_arcs'] = compose_counts
+        if path_counts:
+            rec['path_states'], rec['path_arcs'] = path_counts
+        self.records.append(rec)
+
+    def class_totals(self):
+        """
+        Returns count, time, states, arcs and paths summed up per stage and semiotic class.
+        """
+        totals = {}
+        for rec in self.records:
+            key = rec['stage'] + ':' + rec['class']
+            if key not in totals:
+                totals[key] = {'count': 0, 'time': 0.0, 'compose_states': 0, 'compose_arcs': 0, 'paths': 0,
+                               'max_time': 0.0}
+            tot = totals[key]
+            tot['count'] += 1
+            tot['time'] += rec['time']
+            tot['max_time'] = max(tot['max_time'], rec['time'])
+            for field in ['compose_states', 'compose_arcs', 'paths']:
+                tot[field] += rec[field]
+        return totals
+
+    def top(self, key, n=10):
+        return sorted(self.records, key=lambda rec: rec[key], reverse=True)[:n]
+
+    def report(self, n=10):
+        report = {'records': len(self.records), 'per_class': self.class_totals()}
+        for key in REPORT_KEYS:
+            report['top_' + key] = self.top(key, n)
+        return report
+
+    def print_report(self, n=10):
+        print('\nstage:class\tcount\ttime (s)\tmax time (s)\tstates\tarcs\tpaths')
+        for key, tot in sorted(self.class_totals().items(), key=lambda item: item[1]['time'], reverse=True):
+            print('{}\t{}\t{:.4f}\t{:.4f}\t{}\t{}\t{}'.format(key, tot['count'], tot['time'], tot['max_time'],
+                                                              tot['compose_states'], tot['compose_arcs'],
+                                                              tot['paths']))
+        for key in REPORT_KEYS:
+            print('\nTop {} by {}:'.format(n, key))
+            for rec in self.top(key, n):
+                print('{}\t{}\t{}\t{}'.format(rec[key], rec['stage'], rec['class'], rec['input']))
+
+    def reset(self):
+        self.records = []
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", type=str, help='test sentences, one per line')
+    parser.add_argument("--top", type=int, default=10, help='number of worst inputs listed per measure')
+    parser.add_argument("--configfile", type=str, default='normalizer.conf')
+    parser.add_argument("--working_dir", type=str, default=None)
+    parser.add_argument("--output", type=str, default=None, help='write the report as json to this file')
+
+    return parser.parse_args()
+
+
+def main():
+    from normalizer import Normalizer
+
+    args = arguments()
+    norm = Normalizer(configfile=args.configfile, working_dir=args.working_dir, profile=True)
+    for line in open(args.corpus).read().splitlines():
+        if line.strip():
+            norm.normalize(line)
+
+    norm.profiler.print_report(args.top)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(norm.profiler.report(args.top), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
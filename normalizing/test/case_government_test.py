@@ -0,0 +1,70 @@
+import unittest
+
+from case_government import CaseGovernment, word_case
+from utterance_structure.utt_coll import Token, TokenType
+
+TABLE = 'data/case_government.tsv'
+
+TWO = ['tveir_tfkfn', 'tvo_tfkfo', 'tveimur_tfkfþ', 'tveggja_tfkfe']
+
+
+def tokens(*words, following=()):
+    # the words, the number and the following words
+    toks = []
+    for wrd in words + ('2',) + following:
+        tok = Token()
+        tok.word = wrd
+        tok.set_token_type(TokenType.WORD)
+        toks.append(tok)
+    toks[len(words)].set_semiotic_class('cardinal')
+    return toks
+
+
+class TestCaseGovernment(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.case_government = CaseGovernment.from_file(TABLE)
+
+    def test_word_case(self):
+        self.assertEqual('þ', word_case('tveimur_tfkfþ'))
+        self.assertEqual('o', word_case('annan_lkeovf'))
+        self.assertEqual('e', word_case('fyrstu_kfevf'))
+        self.assertIsNone(word_case('tuttugu'))
+
+    def test_prune(self):
+        self.assertEqual(['tvo_tfkfo', 'tveimur_tfkfþ'], self.case_government.prune(tokens('Með'), 1, TWO))
+        self.assertEqual(['tveggja_tfkfe'], self.case_government.prune(tokens('vegna'), 1, TWO))
+        # the tag of a preposition in tag mode
+        self.assertEqual(['tveimur_tfkfþ'], self.case_government.prune(tokens('handan_aþ'), 1, TWO))
+        self.assertEqual(TWO, self.case_government.prune(tokens('eru'), 1, TWO))
+        self.assertEqual(TWO, self.case_government.prune(tokens(), 0, TWO))
+        # 'að' as a conjunction, a tagged word that is not a preposition or a verb
+        self.assertEqual(TWO, self.case_government.prune(tokens('að'), 1, TWO))
+        self.assertEqual(TWO, self.case_government.prune(tokens('um_c'), 1, TWO))
+        self.assertEqual(['tvo_tfkfo'], self.case_government.prune(tokens('keypti_sfg3eþ'), 1, TWO))
+
+    def test_genitive_noun(self):
+        # the number may modify a following genitive noun: 'á 3 ára fresti'
+        self.assertEqual(['tvo_tfkfo', 'tveimur_tfkfþ', 'tveggja_tfkfe'],
+                         self.case_government.prune(tokens('á', following=('ára',)), 1, TWO))
+        self.assertEqual(['tvo_tfkfo', 'tveggja_tfkfe'],
+                         self.case_government.prune(tokens('á_ao', following=('ára_nhfe',)), 1, TWO))
+        self.assertEqual(['tvo_tfkfo'], self.case_government.prune(tokens('á_ao', following=('daga_nkfo',)), 1, TWO))
+        self.assertEqual(['tvo_tfkfo', 'tveimur_tfkfþ'], self.case_government.prune(tokens('á'), 1, TWO))
+
+    def test_prune_slots(self):
+        twenty_two = [['tuttugu'], ['og'], TWO]
+        self.assertEqual([['tuttugu'], ['og'], ['tveggja_tfkfe']],
+                         self.case_government.prune(tokens('til'), 1, twenty_two))
+        # incompatible paths, a path without an alternative in the governed case is removed
+        paths = [[['tólf_tfhfn'], ['hundruð']], [['eitt'], ['þúsund'], ['og'], TWO, ['hundruð']]]
+        self.assertEqual([[['eitt'], ['þúsund'], ['og'], ['tveggja_tfkfe'], ['hundruð']]],
+                         self.case_government.prune(tokens('til'), 1, paths))
+        # nothing would be left of a word, the verbalization is kept
+        self.assertEqual([['tólf_tfhfn'], ['hundruð']],
+                         self.case_government.prune(tokens('til'), 1, [['tólf_tfhfn'], ['hundruð']]))
+
+
+if __name__ == '__main__':
+    unittest.main()
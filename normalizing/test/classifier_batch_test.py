@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+
+import pynini as pn
+
+from classifier import Classifier
+
+
+def utf8_symbols():
+    # a utf8 symbol table as of thrax, the space is '0x0020'
+    symbols = pn.SymbolTable()
+    symbols.add_symbol('<eps>', 0)
+    symbols.add_symbol('0x0020', 32)
+    for c in [chr(i) for i in range(33, 127)] + list('áéíóúýþæöð'):
+        symbols.add_symbol(c, ord(c))
+    return symbols
+
+
+def toy_grammar():
+    # a small classifying grammar in the format of TOKENIZE_AND_CLASSIFY: words, cardinals, dates spanning a
+    # space and punctuation
+    def insert(markup):
+        return pn.cross('', markup)
+
+    with pn.default_token_type('utf8'):
+        letter = pn.union(*'abcdefghijklmnoprstuvxyáéíóúýþæöð')
+        digit = pn.union(*'0123456789')
+        word = insert('tokens { name: "') + letter.plus + insert('" }') + pn.accep('', weight=10)
+        nsw = insert('tokens { name: "') + pn.union(letter, digit).plus + insert('" }') + pn.accep('', weight=100)
+        cardinal = insert('tokens { cardinal { integer: "') + digit.plus + insert('" } }') + pn.accep('', weight=1)
+        date = (insert('tokens { date { day: "') + digit.plus + insert('" month: "') + pn.cross(' ', '') +
+                pn.union('mars', 'maí') + insert('" } }') + pn.accep('', weight=1))
+        punct = (insert('tokens { name: "') + pn.union(';', ',') +
+                 insert('" pause_length: PAUSE_MEDIUM phrase_break: true type: PUNCT }'))
+        token = pn.union(word, nsw, cardinal, date, punct)
+        return (token + (pn.accep(' ') + token).closure()).optimize()
+
+
+def top_level_grammar():
+    # the top level of TOKENIZE_AND_CLASSIFY: punctuation tokens of their own only after a space, punctuation
+    # attached to words, all other tokens read as NSWs
+    def insert(markup):
+        return pn.cross('', markup)
+
+    with pn.default_token_type('utf8'):
+        letter = pn.union(*'abcdefghijklmnoprstuvxyáéíóúýþæöð')
+        digit = pn.union(*'0123456789')
+        punct_char = pn.union(';', ',', '(', ')')
+        word = insert('name: "') + letter.plus + insert('"') + pn.accep('', weight=10)
+        nsw = (insert('name: "') + pn.union(letter, digit, punct_char).plus + insert('"') +
+               pn.accep('', weight=100))
+        cardinal = insert('cardinal { integer: "') + digit.plus + insert('" }') + pn.accep('', weight=1)
+        punct = (insert('tokens { name: "') + punct_char +
+                 insert('" pause_length: PAUSE_MEDIUM phrase_break: true type: PUNCT }'))
+        word_token = insert('tokens { ') + pn.union(word, nsw) + insert(' }')
+        semclass_token = insert('tokens { ') + cardinal + insert(' }')
+        token_plus_punct = pn.union((punct + insert(' ')).closure() + word_token + (insert(' ') + punct).closure(),
+                                    semclass_token + (insert(' ') + punct).closure())
+        return (token_plus_punct + (pn.accep(' ') + pn.union(token_plus_punct, punct)).closure()).optimize()
+
+
+class LabelClassifier(Classifier):
+    # the classified string from the output labels, Fst.stringify() is not available in all pynini versions
+
+    def _create_classified_string(self, classified_fst):
+        arcs = self._path_arcs(classified_fst)
+        if arcs is None:
+            return ''
+        return ''.join(chr(arc.olabel) for arc in arcs if arc.olabel)
+
+
+class TestClassifyBatch(unittest.TestCase):
+
+    TEXTS = ['í dag er 5', 'mars og 12 , 3a', 'þann 1 maí', 'b7 ;', '17']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        grammar_file = os.path.join(cls.tmp_dir.name, 'TOKENIZE_AND_CLASSIFY')
+        toy_grammar().write(grammar_file)
+        cls.symbols = utf8_symbols()
+        cls.classifier = Classifier(grammar_file, cls.symbols, owner='classifier_batch_test')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def labels(self, classified_fst):
+        return [(arc.ilabel, arc.olabel) for arc in Classifier._path_arcs(classified_fst)]
+
+    def test_same_paths(self):
+        batch_fst = self.classifier._create_classified_fst(' ; '.join(self.TEXTS), sem_class='batch')
+        classified_fsts = self.classifier._split_batch(batch_fst, self.TEXTS, 3)
+        self.assertEqual([self.labels(self.classifier._create_classified_fst(text)) for text in self.TEXTS],
+                         [self.labels(classified_fst) for classified_fst in classified_fsts])
+        # the date of '5' and 'mars' is not found across the sentence boundary
+        output = ''.join(chr(olabel) for _, olabel in self.labels(classified_fsts[0]) if olabel)
+        self.assertTrue(output.endswith('tokens { cardinal { integer: "5" } }'))
+
+    @unittest.skipUnless(hasattr(pn.Fst, 'stringify'), 'Fst.stringify() is not available in this pynini version')
+    def test_same_as_classify(self):
+        texts = self.TEXTS + ['QQ']
+        self.assertEqual([self.classifier.classify(text)[1] for text in texts],
+                         [classified for _, classified in self.classifier.classify_batch(texts)])
+
+
+class TestClassifyBatchTopLevel(unittest.TestCase):
+
+    # sentences starting with punctuation: a punctuation token of its own in the batch, an NSW or attached to the
+    # word on their own
+    TEXTS = ['í dag er 5', ', já', 'þann 1', '( 5 )', '(já', 'b7 ;', ';']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        grammar_file = os.path.join(cls.tmp_dir.name, 'TOKENIZE_AND_CLASSIFY')
+        top_level_grammar().write(grammar_file)
+        cls.classifier = LabelClassifier(grammar_file, utf8_symbols(), owner='classifier_batch_test_top_level')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_same_as_classify(self):
+        self.assertEqual([self.classifier.classify(text)[1] for text in self.TEXTS],
+                         [classified for _, classified in self.classifier.classify_batch(self.TEXTS)])
+        self.assertEqual('tokens { name: "," } tokens { name: "já" }', self.classifier.classify(', já')[1])
+
+    def test_batch_differs(self):
+        # without classifying them again, the sentences starting with punctuation differ from the batch
+        batch_fst = self.classifier._create_classified_fst(' ; '.join(self.TEXTS), sem_class='batch')
+        classified = [self.classifier._create_classified_string(classified_fst)
+                      for classified_fst in self.classifier._split_batch(batch_fst, self.TEXTS, 3)]
+        self.assertTrue(classified[1].startswith('tokens { name: "," pause_length: PAUSE_MEDIUM'))
+        self.assertNotEqual(self.classifier.classify(', já')[1], classified[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+import corpus_job
+from corpus_job import CorpusJob, create_shards, read_shard, shard_output, write_atomic, normalize_shard
+
+
+class StubNormalizer:
+    # one output line per sentence, like Normalizer.normalize()
+
+    test_mode = False
+
+    def normalize(self, text):
+        if 'villa' in text:
+            raise ValueError('normalization failed')
+        return '\n'.join(sent.upper() for sent in text.split('. '))
+
+
+class TestCorpusJob(unittest.TestCase):
+
+    def write_corpus(self, tmp_dir):
+        filename = os.path.join(tmp_dir, 'corpus.txt')
+        with open(filename, 'w') as f:
+            for i in range(200):
+                f.write('Afkoma ársins {} var góð.\n'.format(2000 + i))
+        return filename
+
+    def test_create_shards(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = self.write_corpus(tmp_dir)
+            shards = create_shards([filename], shard_size=1000)
+            self.assertGreater(len(shards), 1)
+            lines = [line for shard in shards for line in read_shard(shard)]
+            self.assertEqual(open(filename).read().splitlines(), lines)
+
+    def test_line_boundaries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'corpus.txt')
+            with open(filename, 'w') as f:
+                f.write('fyrsta\x0bsetning\nönnur\u2028setning\n')
+            self.assertEqual(['fyrsta\x0bsetning', 'önnur\u2028setning'], read_shard(create_shards([filename])[0]))
+
+    def test_normalize_shard(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'corpus.txt')
+            with open(filename, 'w') as f:
+                f.write('fyrsta setning. önnur setning\n\nvilla í línu\nsíðasta\n')
+            corpus_job.worker_normalizer = StubNormalizer()
+            try:
+                done = normalize_shard(tmp_dir, create_shards([filename])[0])
+            finally:
+                corpus_job.worker_normalizer = None
+            self.assertEqual(('done', 4, 1), (done['status'], done['lines'], done['failed']))
+            self.assertEqual('FYRSTA SETNING ÖNNUR SETNING\n\nvilla í línu\nSÍÐASTA\n',
+                             open(shard_output(tmp_dir, done)).read())
+
+    def test_resume_and_merge(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = self.write_corpus(tmp_dir)
+            job_dir = os.path.join(tmp_dir, 'job')
+            job = CorpusJob(job_dir, [filename], shard_size=1000)
+            # simulate the workers: all shards done but the last one
+            for shard in job.shards[:-1]:
+                write_atomic(shard_output(job_dir, shard), '\n'.join(read_shard(shard)).upper() + '\n')
+                shard['status'] = 'done'
+            job.save_manifest()
+
+            resumed = CorpusJob(job_dir)
+            self.assertEqual([resumed.shards[-1]], resumed.pending_shards())
+            self.assertRaises(RuntimeError, resumed.merge, os.path.join(tmp_dir, 'out.txt'))
+
+            shard = resumed.shards[-1]
+            write_atomic(shard_output(job_dir, shard), '\n'.join(read_shard(shard)).upper() + '\n')
+            shard['status'] = 'done'
+            resumed.merge(os.path.join(tmp_dir, 'out.txt'))
+            self.assertEqual(open(filename).read().upper(), open(os.path.join(tmp_dir, 'out.txt')).read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import deadline
+from deadline import Deadline, TIER_FULL, TIER_NO_LM, TIER_ONE_BEST, TIER_DIGITS
+
+
+class TestDeadline(unittest.TestCase):
+
+    def deadline_used(self, fraction):
+        # a deadline of which fraction of the budget is used
+        dl = Deadline(100.0)
+        dl.start -= fraction * 100.0
+        return dl
+
+    def test_tiers(self):
+        self.assertEqual(TIER_FULL, self.deadline_used(0.1).token_tier('2017'))
+        self.assertEqual(TIER_FULL, self.deadline_used(0.1).lm_tier())
+        self.assertEqual(TIER_NO_LM, self.deadline_used(deadline.NO_LM_FRACTION).lm_tier())
+        self.assertEqual(TIER_ONE_BEST, self.deadline_used(deadline.ONE_BEST_FRACTION).token_tier('2017'))
+        self.assertEqual(TIER_DIGITS, self.deadline_used(1.5).token_tier('2017'))
+
+    def test_long_token(self):
+        self.assertEqual(TIER_DIGITS, self.deadline_used(0.0).token_tier('1' * (deadline.MAX_TOKEN_LENGTH + 1)))
+
+    def test_classify_tier(self):
+        self.assertEqual(TIER_FULL, self.deadline_used(0.5).classify_tier(10))
+        self.assertEqual(TIER_DIGITS, self.deadline_used(deadline.DIGITS_FRACTION).classify_tier())
+        self.assertEqual(TIER_DIGITS, self.deadline_used(0.0).classify_tier(deadline.MAX_SENTENCE_TOKENS + 1))
+
+    def test_zero_budget(self):
+        self.assertEqual(TIER_DIGITS, Deadline(0).token_tier('2017'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from disambiguation_memo import DisambiguationMemo, memo_key, value_pattern
+from utterance_structure.utt_coll import Token, TokenType
+
+
+class BigramScorer:
+    # scores word slots like Verbalizer.lm_best_path() with bigram costs of the LM symbols, labels are the symbols
+
+    UNK = '<unk>'
+
+    def __init__(self, costs):
+        self.costs = costs
+        self.word_symbols = self
+
+    def find(self, symbol):
+        return symbol
+
+    def word_label(self, symbol):
+        return symbol
+
+    def lm_best_path(self, verbal_arr):
+        best = {('<s>',): 0.0}
+        for slot in verbal_arr:
+            symbols = {wrd[wrd.index('_') + 1:] if '_' in wrd else wrd for wrd in slot}
+            best = {path + (symbol,): cost + self.costs.get((path[-1], symbol), 5.0)
+                    for path, cost in best.items() for symbol in symbols}
+        path, cost = min(best.items(), key=lambda item: item[1])
+        return list(path[1:]), cost
+
+
+def tokens(words):
+    # words are strings, numbers are (name, verbalization array) tuples
+    toks = []
+    for wrd in words:
+        tok = Token()
+        if isinstance(wrd, tuple):
+            tok.name = wrd[0]
+            tok.set_semiotic_class('cardinal')
+            tok.set_verbalization_arr(wrd[1])
+        else:
+            tok.word = wrd
+            tok.set_token_type(TokenType.WORD)
+            tok.set_verbalization_arr([wrd])
+        toks.append(tok)
+    return toks
+
+
+TWO = ['tveir_tfkfn', 'tvo_tfkfo', 'tveimur_tfkfþ', 'tveggja_tfkfe']
+TWENTY_TWO = [['tuttugu'], ['og'], TWO]
+THIRTY_TWO = [['þrjátíu'], ['og'], TWO]
+
+
+class TestDisambiguationMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.scorer = BigramScorer({('í', 'tfkfþ'): 0.5, ('tfkfþ', 'árum'): 0.5, ('og', 'tfkfþ'): 2.0,
+                                    ('um', 'tfkfo'): 0.5, ('tfkfo', 'daga'): 1.0})
+
+    def train(self, memo, sentences, times=5):
+        for _ in range(times):
+            for words in sentences:
+                memo.learn(tokens(words), self.scorer)
+        memo.compile()
+
+    def test_key(self):
+        self.assertEqual('#2', value_pattern('22'))
+        self.assertEqual('1.##0', value_pattern('1.200'))
+        toks = tokens(['fyrir', ('2', TWO), 'árum'])
+        self.assertEqual(('cardinal', '2', 'fyrir', 'árum'), memo_key(toks, 1))
+        self.assertEqual(('cardinal', '2', '<s>', '</s>'), memo_key(tokens([('2', TWO)]), 0))
+
+    def test_learn_and_resolve(self):
+        memo = DisambiguationMemo()
+        self.train(memo, [['í', ('2', TWO), 'árum'], ['um', ('2', TWO), 'daga'], ['í', ('32', THIRTY_TWO), 'árum']])
+        choice, count, total, margin = memo.entries[('cardinal', '2', 'í', 'árum')]
+        self.assertEqual((('tfkfþ',), 5, 5), (choice, count, total))
+        self.assertAlmostEqual(9.0, margin)
+
+        # learned from 32, the ambiguous slot is the last one
+        self.assertEqual([['tuttugu'], ['og'], ['tveimur_tfkfþ']],
+                         memo.resolve(tokens(['í', ('22', TWENTY_TWO), 'árum']))[1])
+        resolved = memo.resolve(tokens(['um', ('2', TWO), 'daga']))
+        self.assertEqual([['um'], ['tvo_tfkfo'], ['daga']], resolved)
+        self.assertIsNone(memo.resolve(tokens(['með', ('2', TWO), 'árum'])))
+        self.assertEqual({'tokens': 3, 'hits': 2, 'unknown': 1}, {name: memo.metrics[name]
+                                                                  for name in ['tokens', 'hits', 'unknown']})
+
+    def test_confidence(self):
+        memo = DisambiguationMemo(min_count=5)
+        self.train(memo, [['í', ('2', TWO), 'árum']], times=4)
+        self.assertIsNone(memo.resolve(tokens(['í', ('2', TWO), 'árum'])))
+        memo.min_count = 4
+        self.assertIsNotNone(memo.resolve(tokens(['í', ('2', TWO), 'árum'])))
+        # a margin below min_margin
+        memo.min_margin = 10.0
+        self.assertIsNone(memo.resolve(tokens(['í', ('2', TWO), 'árum'])))
+        self.assertEqual(2, memo.metrics['low_confidence'])
+
+    def test_save_and_load(self):
+        memo = DisambiguationMemo()
+        self.train(memo, [['í', ('2', TWO), 'árum'], ['um', ('2', TWO), 'daga']])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'memo.tsv')
+            memo.save(filename)
+            self.assertEqual(memo.entries, DisambiguationMemo.load(filename).entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from document_state import DocumentState
+from utterance_structure.utt_coll import Utterance
+
+
+class TestDocumentState(unittest.TestCase):
+
+    def create_state(self):
+        utterances = []
+        for sent in ['Afkoma ársins 2017 var góð.', 'Selt magn var 14,3 twst.']:
+            utt = Utterance(sent)
+            utt.normalized_sentence = sent.upper()
+            utterances.append(utt)
+        return DocumentState(utterances, fingerprint='models 1')
+
+    def test_get(self):
+        state = self.create_state()
+        self.assertEqual('SELT MAGN VAR 14,3 TWST.', state.get('Selt magn var 14,3 twst.').normalized_sentence)
+        self.assertIsNone(state.get('Selt magn var 14,4 twst.'))
+        self.assertEqual(1, state.reused)
+        self.assertEqual(1, state.missed)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'state.bin')
+            self.create_state().save(filename)
+            state = DocumentState.load(filename)
+        self.assertEqual(2, len(state))
+        self.assertEqual('models 1', state.fingerprint)
+        self.assertEqual('AFKOMA ÁRSINS 2017 VAR GÓÐ.', state.get('Afkoma ársins 2017 var góð.').normalized_sentence)
+
+    def test_load_other_fingerprint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'state.bin')
+            self.create_state().save(filename)
+            self.assertEqual(2, len(DocumentState.load(filename, fingerprint='models 1')))
+            state = DocumentState.load(filename, fingerprint='models 2')
+        self.assertEqual(0, len(state))
+        self.assertEqual('models 2', state.fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from evaluate import score_sentence, new_counts, align_tokens, UNALIGNED
+
+GOLD = [('Hagnaður', 'Hagnaður'), ('jókst', 'jókst'), ('um', 'um'), ('5%', 'fimm prósent'),
+        ('kl.', 'klukkan'), ('2', 'tvö')]
+
+
+class TestScoreSentence(unittest.TestCase):
+
+    def score(self, gold, predicted):
+        totals = new_counts()
+        class_counts = {}
+        errors = []
+        score_sentence(gold, predicted, totals, class_counts, errors, max_errors=10)
+        return totals, class_counts, errors
+
+    def test_correct(self):
+        predicted = [('Hagnaður', 'word', 'Hagnaður'), ('jókst', 'word', 'jókst'), ('um', 'word', 'um'),
+                     ('5%', 'percent', 'fimm prósent'), ('kl.', 'word', 'klukkan'), ('2', 'cardinal', 'tvö')]
+        totals, class_counts, errors = self.score(GOLD, predicted)
+        self.assertEqual((6, 6, 0, 1, 1), (totals['tokens'], totals['correct_tokens'], totals['unaligned_tokens'],
+                                           totals['sentences'], totals['correct_sentences']))
+        self.assertEqual(1, class_counts['cardinal']['correct_sentences'])
+        self.assertEqual([], errors)
+
+    def test_different_tokenization(self):
+        # '5%' and 'kl.' are split by the tokenizer, the following tokens are still scored
+        predicted = [('Hagnaður', 'word', 'Hagnaður'), ('jókst', 'word', 'jókst'), ('um', 'word', 'um'),
+                     ('5', 'cardinal', 'fimm'), ('%', 'word', 'prósent'), ('kl', 'word', 'klukkan'),
+                     ('.', 'punct', '.'), ('2', 'cardinal', 'tveir')]
+        totals, class_counts, errors = self.score(GOLD, predicted)
+        self.assertEqual((4, 3, 2, 0), (totals['tokens'], totals['correct_tokens'], totals['unaligned_tokens'],
+                                        totals['correct_sentences']))
+        self.assertEqual({'tokens': 1, 'correct_tokens': 0}, {name: class_counts['cardinal'][name]
+                                                              for name in ['tokens', 'correct_tokens']})
+        self.assertEqual([UNALIGNED, UNALIGNED, 'cardinal'], [error['class'] for error in errors])
+        self.assertEqual('tveir', errors[-1]['predicted'])
+
+    def test_align_tokens(self):
+        self.assertEqual([None, ('word', 'b')], align_tokens([('a', 'a'), ('b', 'b')], [('b', 'word', 'b')]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+from hot_reload import ReloadingNormalizer
+from utterance_structure.utt_coll import Utterance
+
+
+class StubNormalizer:
+    # keeps the state of a call on the object like Normalizer, counts the calls running at the same time
+
+    def __init__(self, version=1, broken=False):
+        self.version = version
+        self.broken = broken
+        self.time_budget = None
+        self.closed = False
+        self.running = 0
+        self.max_running = 0
+        self._text = None
+
+    def normalize(self, text, time_budget=None):
+        if self.broken:
+            raise ValueError('broken model')
+        self.time_budget = time_budget
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self._text = text
+        time.sleep(0.01)
+        normalized = '{} v{}'.format(self._text, self.version)
+        self.running -= 1
+        return normalized
+
+    def normalize_iter(self, text, callback=None, time_budget=None):
+        for sent in text.split('. '):
+            utt = Utterance(sent)
+            utt.normalized_sentence = self.normalize(sent, time_budget)
+            yield utt
+
+    def close(self):
+        self.closed = True
+
+
+class TestReloadingNormalizer(unittest.TestCase):
+
+    def setUp(self):
+        self.versions = iter(range(1, 10))
+        self.norm = ReloadingNormalizer(factory=lambda: StubNormalizer(next(self.versions)))
+
+    def test_concurrent_requests(self):
+        results = {}
+
+        def request(i):
+            results[i] = self.norm.normalize('setning ' + str(i))
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual({i: 'setning {} v1'.format(i) for i in range(8)}, results)
+        self.assertEqual(1, self.norm.normalizer.max_running)
+
+    def test_reload(self):
+        old = self.norm.normalizer
+        utts = self.norm.normalize_iter('fyrsta. önnur')
+        self.assertEqual('fyrsta v1', next(utts).normalized_sentence)
+        # a request in flight keeps the old normalizer, requests started after the swap use the new one
+        self.assertTrue(self.norm.reload(wait=True))
+        self.assertEqual('setning v2', self.norm.normalize('setning'))
+        self.assertFalse(old.closed)
+        self.assertEqual('önnur v1', next(utts).normalized_sentence)
+        self.assertEqual([], list(utts))
+        self.assertTrue(old.closed)
+
+    def test_time_budget(self):
+        self.norm.normalize('setning', time_budget=0.5)
+        self.assertEqual(0.5, self.norm.normalizer.time_budget)
+        self.assertEqual(['setning v1'], [utt.normalized_sentence
+                                          for utt in self.norm.normalize_iter('setning', time_budget=0.25)])
+        self.assertEqual(0.25, self.norm.normalizer.time_budget)
+
+
+class WatchedNormalizer(ReloadingNormalizer):
+    # watches the given files instead of the model files of a configuration
+
+    def __init__(self, model_files, **args):
+        self.model_files = model_files
+        super().__init__(**args)
+
+    def _model_files(self):
+        return self.model_files
+
+
+class TestReloadFailures(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.smoke_test_file = os.path.join(self.tmp_dir.name, 'smoke_test.txt')
+        with open(self.smoke_test_file, 'w') as f:
+            f.write('fyrsta setning\n\nönnur setning\n')
+        self.model_file = os.path.join(self.tmp_dir.name, 'model.fst')
+        with open(self.model_file, 'w') as f:
+            f.write('model 1')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_failed_smoke_test(self):
+        normalizers = iter([StubNormalizer(1), StubNormalizer(2, broken=True)])
+        norm = ReloadingNormalizer(smoke_test_file=self.smoke_test_file, factory=lambda: next(normalizers))
+        old = norm.normalizer
+        self.assertEqual(['fyrsta setning', 'önnur setning'], norm.smoke_test)
+        self.assertFalse(norm.reload(wait=True))
+        # the old normalizer stays in use, the new one is closed
+        self.assertIs(old, norm.normalizer)
+        self.assertFalse(old.closed)
+        self.assertEqual('setning v1', norm.normalize('setning'))
+        self.assertEqual(1, norm.failed_reloads)
+        self.assertEqual(0, norm.reloads)
+        self.assertIn('fyrsta setning', norm.last_reload_error)
+        self.assertIn('broken model', norm.last_reload_error)
+
+    def test_watch(self):
+        versions = iter(range(1, 10))
+        norm = WatchedNormalizer([self.model_file], watch_interval=0.02,
+                                 factory=lambda: StubNormalizer(next(versions)))
+        try:
+            time.sleep(0.1)
+            self.assertEqual(0, norm.reloads)
+            with open(self.model_file, 'w') as f:
+                f.write('model 2, changed')
+            # reloaded once the file has not changed for one interval
+            for i in range(200):
+                if norm.reloads:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(1, norm.reloads)
+            self.assertEqual('setning v2', norm.normalize('setning'))
+            # missing model files (a deployment in progress) don't start a reload
+            os.remove(self.model_file)
+            time.sleep(0.1)
+            self.assertEqual(1, norm.reloads)
+        finally:
+            norm.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import pynini as pn
+
+from model_registry import ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.grammar_file = os.path.join(self.tmp_dir.name, 'grammar.fst')
+        pn.cross('a', 'b').write(self.grammar_file)
+        self.symbols_file = os.path.join(self.tmp_dir.name, 'symbols.txt')
+        with open(self.symbols_file, 'w') as f:
+            f.write('<eps>\t0\na\t1\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_shared_models(self):
+        registry = ModelRegistry()
+        grammar = registry.acquire('grammar', self.grammar_file, 'plain')
+        # the same file through another path
+        link = os.path.join(self.tmp_dir.name, 'link.fst')
+        os.symlink(self.grammar_file, link)
+        self.assertIs(grammar, registry.acquire('grammar', link, 'tagged'))
+        symbols = registry.acquire('symbols', self.symbols_file, 'tagged')
+        self.assertEqual(1, symbols.find('a'))
+        self.assertEqual(2, len(registry))
+
+        report = registry.memory_report()
+        self.assertEqual(['grammar'], [model['kind'] for model in report['plain']['models']])
+        self.assertEqual(2, report['plain']['models'][0]['shared_by'])
+        self.assertEqual(2, len(report['tagged']['models']))
+
+    def test_release(self):
+        registry = ModelRegistry()
+        grammar = registry.acquire('grammar', self.grammar_file, 'plain')
+        registry.acquire('grammar', self.grammar_file, 'tagged')
+        registry.release(grammar, 'plain')
+        self.assertEqual(1, len(registry))
+        registry.release_owner('tagged')
+        self.assertEqual(0, len(registry))
+        # loaded again after all owners released it
+        self.assertIsNot(grammar, registry.acquire('grammar', self.grammar_file, 'plain'))
+
+    def test_changed_file(self):
+        registry = ModelRegistry()
+        grammar = registry.acquire('grammar', self.grammar_file, 'plain')
+        pn.cross('a', 'bc').write(self.grammar_file)
+        os.utime(self.grammar_file, (0, 0))
+        self.assertIsNot(grammar, registry.acquire('grammar', self.grammar_file, 'plain'))
+
+
+if __name__ == '__main__':
+    unittest.main()
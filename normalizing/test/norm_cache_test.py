@@ -0,0 +1,123 @@
+import os
+import hashlib
+import tempfile
+import unittest
+import multiprocessing
+
+from norm_cache import NormCache, file_checksum
+from utterance_structure.utt_coll import Utterance
+
+
+def normalized_utterance(sentence):
+    utt = Utterance(sentence)
+    utt.normalized_sentence = sentence.replace('2017', 'tvö þúsund og sautján')
+    return utt
+
+
+def write_sentences(db_file, model_file, start):
+    cache = NormCache(db_file, [model_file])
+    cache.put_many([normalized_utterance('setning ' + str(i)) for i in range(start, start + 50)])
+    cache.close()
+
+
+class TestNormCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'cache.db')
+        self.model_file = os.path.join(self.tmp_dir.name, 'model.fst')
+        with open(self.model_file, 'w') as f:
+            f.write('model 1')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_put(self):
+        cache = NormCache(self.db_file, [self.model_file])
+        self.assertIsNone(cache.get('Afkoma ársins 2017 var góð.'))
+        cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        utt = cache.get('Afkoma ársins 2017 var góð.')
+        self.assertEqual('Afkoma ársins tvö þúsund og sautján var góð.', utt.normalized_sentence)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_codecs(self):
+        cache = NormCache(self.db_file, [self.model_file])
+        cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        encoded_cache = NormCache(self.db_file, [self.model_file], codec='utt_codec')
+        # the entries of the other codec are not returned
+        self.assertNotEqual(cache.fingerprint, encoded_cache.fingerprint)
+        self.assertIsNone(encoded_cache.get('Afkoma ársins 2017 var góð.'))
+        encoded_cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        utt = encoded_cache.get('Afkoma ársins 2017 var góð.')
+        self.assertEqual('Afkoma ársins tvö þúsund og sautján var góð.', utt.normalized_sentence)
+        self.assertRaises(ValueError, NormCache, self.db_file, [self.model_file], codec='json')
+
+    def test_persistent(self):
+        cache = NormCache(self.db_file, [self.model_file])
+        cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        cache.close()
+        cache = NormCache(self.db_file, [self.model_file])
+        self.assertIsNotNone(cache.get('Afkoma ársins 2017 var góð.'))
+
+    def test_invalidation(self):
+        cache = NormCache(self.db_file, [self.model_file])
+        cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        cache.close()
+        with open(self.model_file, 'w') as f:
+            f.write('model 2, changed')
+        cache = NormCache(self.db_file, [self.model_file])
+        self.assertIsNone(cache.get('Afkoma ársins 2017 var góð.'))
+        self.assertEqual(0, len(cache))
+        cache = NormCache(self.db_file, [self.model_file], settings='tag_mode=True')
+        self.assertNotEqual(NormCache(self.db_file, [self.model_file]).fingerprint, cache.fingerprint)
+
+    def test_shared_file(self):
+        # the entries of other settings are kept, the entries of changed models are deleted
+        cache = NormCache(self.db_file, [self.model_file])
+        cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        tagged_cache = NormCache(self.db_file, [self.model_file], settings='tag_mode=True')
+        tagged_cache.put(normalized_utterance('Afkoma ársins 2017 var góð.'))
+        cache = NormCache(self.db_file, [self.model_file])
+        self.assertIsNotNone(cache.get('Afkoma ársins 2017 var góð.'))
+        self.assertEqual(2, len(cache))
+        with open(self.model_file, 'w') as f:
+            f.write('model 2, changed')
+        cache = NormCache(self.db_file, [self.model_file], settings='tag_mode=True')
+        self.assertEqual(0, len(cache))
+
+    def test_not_normalized(self):
+        cache = NormCache(self.db_file, [self.model_file])
+        cache.put(Utterance('Afkoma ársins 2017 var góð.'))
+        self.assertIsNone(cache.get('Afkoma ársins 2017 var góð.'))
+        classified = Utterance('Afkoma ársins 2017 var góð.')
+        classified.classified = 'tokens { name: "Afkoma" }'
+        cache = NormCache(self.db_file, [self.model_file], verbalize=False)
+        cache.put(classified)
+        self.assertIsNotNone(cache.get('Afkoma ársins 2017 var góð.'))
+
+    def test_eviction(self):
+        cache = NormCache(self.db_file, [self.model_file], max_size=10000)
+        for i in range(500):
+            cache.put(normalized_utterance('setning ' + str(i)))
+        cache.evict()
+        self.assertLessEqual(cache.size(), 10000)
+        self.assertIsNotNone(cache.get('setning 499'))
+        self.assertIsNone(cache.get('setning 0'))
+
+    def test_concurrent_writers(self):
+        procs = [multiprocessing.Process(target=write_sentences, args=(self.db_file, self.model_file, i * 50))
+                 for i in range(4)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        cache = NormCache(self.db_file, [self.model_file])
+        self.assertEqual(200, len(cache))
+
+    def test_file_checksum(self):
+        self.assertEqual(hashlib.sha1(b'model 1').hexdigest(), file_checksum(self.model_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import time
+import unittest
+
+import deadline
+from deadline import TIER_FULL, TIER_DIGITS, TIER_NAMES
+from normalizer import Normalizer
+from verbalizer import Verbalizer
+from utterance_structure.utt_coll import Token, TokenType
+
+NUMBER_WORDS = {'2017': 'tvö þúsund og sautján', '5': 'fimm'}
+
+
+class StubTokenizer:
+    # sentences are separated by ' | ', tokens by spaces
+
+    def tokenize_sentence(self, text):
+        return text.split(' | ')
+
+    def tokenize_words(self, sentence):
+        return sentence.split()
+
+
+class StubClassifier:
+    # classifies every token as a token of its own, records the classified texts
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.texts = []
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts):
+        time.sleep(self.delay)
+        self.texts.extend(texts)
+        return [(None, ' '.join('tokens { name: "' + wrd + '" }' for wrd in text.split())) for text in texts]
+
+
+class StubVerbalizer(Verbalizer):
+    # the verbalization of Verbalizer, the numbers of NUMBER_WORDS are verbalized, other tokens with digits fail
+    # after delay seconds
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.path_stats = {'tokens': 0}
+        self.case_government = None
+        self.memo = None
+
+    def _verbalize_token(self, token, one_best=False):
+        if token.name in NUMBER_WORDS:
+            return [NUMBER_WORDS[token.name]]
+        time.sleep(self.delay)
+        return [token.name]
+
+
+class StubNormalizer(Normalizer):
+    # a Normalizer without models, tokens with digits are parsed as semiotic classes
+
+    def __init__(self, classifier, verbalizer=None):
+        self.tok = StubTokenizer()
+        self.classifier = classifier
+        self.verbalizer = verbalizer or StubVerbalizer()
+        self.classify_batch_size = 1
+        self.verbalize = True
+        self.test_mode = False
+        self.tag_mode = False
+        self.cache = None
+        self.fingerprint = 'stub'
+        self.utterance_collection = None
+        self.stage_times = {stage: 0.0 for stage in self.STAGES}
+        self.time_budget = None
+        self.tier_counts = {name: 0 for name in TIER_NAMES}
+        self._deadline = None
+
+    def _parse(self, classified_fst, utt):
+        for wrd in utt.tokenized:
+            tok = Token()
+            tok.set_name(wrd)
+            if any(c.isdigit() for c in wrd):
+                tok.set_token_type(TokenType.SEMIOTIC_CLASS)
+            else:
+                tok.set_token_type(TokenType.WORD)
+                tok.append_to_word(wrd)
+            utt.ling_structure.tokens.append(tok)
+
+
+class TestNormalizerBudget(unittest.TestCase):
+
+    def test_no_budget(self):
+        norm = StubNormalizer(StubClassifier())
+        self.assertEqual('Árið tvö þúsund og sautján var gott\nfimm', norm.normalize('Árið 2017 var gott | 5'))
+        self.assertEqual(['Árið 2017 var gott', '5'], norm.classifier.texts)
+        self.assertEqual(0, sum(norm.tier_counts.values()))
+
+    def test_long_sentence(self):
+        norm = StubNormalizer(StubClassifier())
+        long_sentence = ' '.join(['orð'] * deadline.MAX_SENTENCE_TOKENS + ['5,2'])
+        normalized = norm.normalize('Árið 2017 var gott | ' + long_sentence, time_budget=100)
+        # the long sentence is read without the grammar, the other one is normalized
+        self.assertEqual(['Árið 2017 var gott'], norm.classifier.texts)
+        read = ' '.join(['orð'] * deadline.MAX_SENTENCE_TOKENS + ['fimm komma tveir'])
+        self.assertEqual(['Árið tvö þúsund og sautján var gott', read], normalized.split('\n'))
+        utts = norm.utterance_collection.collection
+        self.assertEqual([TIER_FULL, TIER_DIGITS], [utt.degradation_tier for utt in utts])
+        self.assertEqual(TokenType.NEEDS_VERBALIZATION, utts[1].ling_structure.tokens[-1].token_type)
+        self.assertEqual({'full': 1, 'no_lm': 0, 'one_best': 0, 'digits': 1}, norm.tier_counts)
+
+    def test_budget_used_up(self):
+        # the first classification uses up the budget, the next sentence is not classified
+        norm = StubNormalizer(StubClassifier(delay=0.05))
+        normalized = norm.normalize('Árið 2017 var gott | Árið 2017 , já', time_budget=0.02)
+        self.assertEqual(['Árið 2017 var gott'], norm.classifier.texts)
+        self.assertEqual('Árið tveir núll einn sjö , já', normalized.split('\n')[1])
+        self.assertEqual(TIER_DIGITS, norm.utterance_collection.collection[1].degradation_tier)
+
+    def test_reclassify(self):
+        norm = StubNormalizer(StubClassifier())
+        self.assertEqual('Í 1 2 b', norm.normalize('Í 12b'))
+        # the failed token is re-classified as a span of characters
+        self.assertEqual(['Í 12b', '1 2 b'], norm.classifier.texts)
+        self.assertEqual(TIER_FULL, norm.utterance_collection.collection[0].degradation_tier)
+
+    def test_no_reclassify_after_budget(self):
+        # the verbalization of the failing token uses up the budget
+        norm = StubNormalizer(StubClassifier(), StubVerbalizer(delay=0.05))
+        normalized = norm.normalize('Í 12b', time_budget=0.05)
+        # the failed token is read character by character without a re-classification
+        self.assertEqual(['Í 12b'], norm.classifier.texts)
+        self.assertEqual('Í 1 2 b', normalized)
+        utt = norm.utterance_collection.collection[0]
+        self.assertEqual(TIER_DIGITS, utt.degradation_tier)
+        self.assertTrue(utt.ling_structure.tokens[1].verbalization_failed)
+
+    def test_document_state(self):
+        norm = StubNormalizer(StubClassifier())
+        long_sentence = ' '.join(['orð'] * (deadline.MAX_SENTENCE_TOKENS + 1))
+        normalized, state = norm.normalize_document('Árið 2017 var gott | ' + long_sentence, time_budget=100)
+        # the degraded utterance is not reused
+        self.assertEqual(1, len(state))
+        self.assertIsNotNone(state.get('Árið 2017 var gott'))
+        self.assertIsNone(state.get(long_sentence))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import unittest
+
+import pynini as pn
+
+from number_verbalizer import NumberVerbalizer
+
+LEXICON_DIR = 'data/thrax_grammar/verbalize_tags/lexicon/'
+VERBALIZER_GRAMMAR = 'data/thrax_grammar/verbalize_tags/ALL'
+
+
+def grammar_verbalizations(grammar, sem_class, digits):
+    # spaces of the token string are epsilons in the normalizer (see fst_compiler.py)
+    # the grammar has utf8 labels, as the input of the normalizer (see Verbalizer._create_verbalized_fst())
+    verbalized = pn.compose(pn.accep(sem_class + '|integer:' + digits + '|', token_type='utf8'), grammar)
+    verbalized.project('output').rmepsilon()
+    if verbalized.start() == -1:
+        return {}
+    verbalized = pn.determinize(verbalized)
+    paths = verbalized.paths(input_token_type='utf8', output_token_type='utf8')
+    result = {}
+    while not paths.done():
+        result[paths.ostring()] = float(paths.weight().to_string())
+        paths.next()
+    return result
+
+
+def compile_number_grammar(lexicon_dir):
+    """
+    Compiles CARDINAL_MARKUP | ORDINAL_MARKUP of verbalize_tags/numbers.grm and ordinal.grm with pynini, statement
+    by statement, for the comparison with NumberVerbalizer when the compiled thrax grammar is not available.
+    """
+    with pn.default_token_type('utf8'):
+        def string_file(name):
+            return pn.string_file(lexicon_dir + name, input_token_type='utf8', output_token_type='utf8').optimize()
+
+        def insert(out):
+            return pn.cross('', out)
+
+        def delete(inp):
+            return pn.cross(inp, '')
+
+        def weighted(fst, weight):
+            return pn.concat(fst, pn.accep('', weight=weight))
+
+        # numbers.grm
+        cardinal_simple = string_file('cardinals.tsv')
+        units_not_neutral = string_file('units_notNeutral.txt')
+        teens = string_file('teens.tsv')
+        decades = string_file('decades.tsv')
+        neutral_units2to9 = string_file('neutral_units2to9.txt')
+        insspace = insert(' ')
+        insand = insert(' og ')
+        delzero = delete('0')
+        one_neutr = pn.cross('1', 'eitt_tfhen')
+        teensplus = pn.cross('10', 'tíu') | teens
+        neutral_units = one_neutr | neutral_units2to9
+        units = units_not_neutral | neutral_units
+        cardinal_decades = (decades + delzero) | (decades + insand + cardinal_simple)
+        numbers_20_to_99 = (decades + delzero) | (decades + insand + (weighted(units_not_neutral, -3) |
+                                                                     weighted(neutral_units, -4)))
+        numbers_20_to_99_neutr = (decades + delzero) | (decades + insand + neutral_units)
+        hundreds_all = (one_neutr + insert(' hundrað')) | (neutral_units2to9 + insert(' hundruð'))
+        hundreds_plain = (delete('1') + insert(' hundrað')) | (neutral_units2to9 + insert(' hundruð'))
+
+        def cardinal_hundreds(hundreds):
+            return (hundreds + delzero + delzero | (hundreds + delzero + insand + cardinal_simple) |
+                    (hundreds + insand + teens) | (hundreds + (insspace | insand) + cardinal_decades)).optimize()
+
+        cardinal_hundreds_all = cardinal_hundreds(hundreds_all)
+        cardinal_hundreds_plain = cardinal_hundreds(hundreds_plain)
+        year_hundreds = teens + insspace + insert('hundruð') + (
+            (delzero + delzero) | (delzero + insand + neutral_units) | (insand + teensplus) |
+            ((insspace | insand) + numbers_20_to_99_neutr))
+        year_mill = neutral_units2to9 + insert(' ') + insert('þúsund') + (
+            (delzero + delzero + delzero) | (delzero + delzero + insand + neutral_units) |
+            (delzero + insand + teensplus) | (delzero + (insspace | insand) + numbers_20_to_99_neutr))
+        year = (year_hundreds | year_mill).optimize()
+        tail_1000_to_1099 = insert('þúsund') + (
+            delzero + delzero + delzero | (delzero + delzero + insand + units) | (delzero + insand + teensplus) |
+            (delzero + (insspace | insand) + numbers_20_to_99))
+        numbers_1000_to_1099 = (one_neutr + insspace + tail_1000_to_1099).optimize()
+        numbers_1100_to_1999 = (teens + insspace + insert('hundruð') + (
+            (delzero + delzero) | (delzero + insand + units) | (insand + teensplus) |
+            ((insspace | insand) + numbers_20_to_99))).optimize()
+        tail_2000_to_9999 = (insert('þúsund') + (
+            delzero + delzero + delzero | (delzero + delzero + insand + units) | (delzero + insand + teensplus) |
+            (delzero + (insspace | insand) + numbers_20_to_99) |
+            ((insspace | insand) + cardinal_hundreds_all))).optimize()
+        numbers_2000_to_9999 = (neutral_units2to9 + insspace + tail_2000_to_9999).optimize()
+        numbers_10000_to_99999 = ((teensplus | numbers_20_to_99) + insspace + tail_2000_to_9999).optimize()
+        numbers_100000_to_999999 = (cardinal_hundreds_plain + insspace + tail_2000_to_9999).optimize()
+        tail_1m_to_9m = (pn.cross('', pn.union('milljón', 'milljónar', 'milljónir', 'milljónum', 'milljóna')) + (
+            delete('000000') |
+            weighted(delete('00000') + insand + units, -4) |
+            weighted(delete('0000') + (insspace | insand) + (teens | numbers_20_to_99), -6) |
+            weighted(delete('000') + (insspace | insand) + cardinal_hundreds_plain, -8) |
+            (delete('00') + (insspace | insand) + (numbers_1000_to_1099 | numbers_1100_to_1999 |
+                                                   numbers_2000_to_9999)) |
+            weighted(delzero + (insspace | insand) + numbers_10000_to_99999, -60) |
+            weighted((insspace | insand) + numbers_100000_to_999999, -150))).optimize()
+        numbers_1m_to_9m = units + insspace + tail_1m_to_9m
+        numbers_10m_to_99m = (teensplus | numbers_20_to_99) + insspace + tail_1m_to_9m
+        numbers_100m_to_999m = cardinal_hundreds_plain + insspace + tail_1m_to_9m
+        numbers_to_99 = (pn.cross('0', 'núll') | cardinal_simple | teensplus | cardinal_decades).optimize()
+        cardinal = pn.union(numbers_to_99, cardinal_hundreds_plain, numbers_1000_to_1099, numbers_1100_to_1999,
+                            numbers_2000_to_9999, numbers_10000_to_99999, numbers_100000_to_999999,
+                            numbers_1m_to_9m, numbers_10m_to_99m, numbers_100m_to_999m, year).optimize()
+        spaces = pn.accep(' ').closure()
+        cardinal_markup = delete(pn.accep('cardinal|integer:') + spaces) + cardinal + delete(spaces + pn.accep('|'))
+
+        # ordinal.grm
+        ord_units = string_file('ordinals_simple.txt')
+        ord_teens = string_file('ordinals_teens_simple.tsv')
+        ord_decades = string_file('ordinals_decades_lexicon.txt')
+        ordinals_20_to_99 = ord_decades + delzero | (ord_decades + insand + ord_units)
+        eitt_or_one = (weighted(pn.accep('eitt'), 2.0) + insspace) | delete('1')
+        hundreds1 = ((eitt_or_one + insert(pn.union('hundraðasta', 'hundraðasti'))) |
+                     (neutral_units2to9 + insspace + insert(pn.union('hundraðasti', 'hundraðasta', 'hundruðustu'))))
+        hundreds2 = (eitt_or_one + insert('hundrað')) | (neutral_units2to9 + insspace + insert('hundruð'))
+        ordinals_100_to_999 = (hundreds1 + delzero + delzero | weighted(hundreds1 + delzero + insand + ord_units, -1) |
+                               weighted(hundreds1 + insand + ord_teens, -2) |
+                               weighted(hundreds2 + (insspace | insand) + ordinals_20_to_99, -10)).optimize()
+        ordinal = (weighted(ord_units, -0.5) | weighted(ord_teens, -1) | weighted(ordinals_20_to_99, -2) |
+                   weighted(ordinals_100_to_999, -10)).optimize()
+        ordinal_markup = delete('ordinal|integer:') + ordinal + delete(spaces + pn.accep('|'))
+
+        return (cardinal_markup | ordinal_markup).optimize()
+
+
+NUMBERS = [('cardinal', str(i)) for i in range(10000)] + [('ordinal', str(i)) for i in range(1000)] + \
+          [('cardinal', str(i)) for i in range(10007, 1000000000, 39916801)]
+
+
+class TestNumberVerbalizer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.verbalizer = NumberVerbalizer(LEXICON_DIR)
+
+    def test_cardinal(self):
+        verbalized = self.verbalizer.verbalize('cardinal', '21')
+        self.assertIn('tuttugu og eitt_tfhen', verbalized)
+        # 'hundrað' without 'eitt' is inserted with a leading space, as in numbers.grm
+        self.assertIn(' hundrað tuttugu og einn_tfken', self.verbalizer.verbalize('cardinal', '121'))
+        self.assertEqual({'tvö_tfhfn hundruð': 0.0, 'tvö_tfhfo hundruð': 0.0}, self.verbalizer.verbalize('cardinal', '200'))
+        self.assertEqual({}, self.verbalizer.verbalize('cardinal', '1.000'))
+
+    def test_ordinal(self):
+        verbalized = self.verbalizer.verbalize('ordinal', '3')
+        self.assertTrue(verbalized)
+        self.assertTrue(all(weight == -0.5 for weight in verbalized.values()))
+
+    def test_max_count(self):
+        self.assertIsNone(self.verbalizer.verbalize('cardinal', '987654321', max_count=200))
+        self.assertIsNotNone(self.verbalizer.verbalize('cardinal', '4321', max_count=200))
+        self.assertIsNone(self.verbalizer.verbalize('decimal', '4321'))
+
+    def test_compare_with_grammar(self):
+        if not os.path.exists(VERBALIZER_GRAMMAR):
+            self.skipTest('compiled verbalizer grammar not found: ' + VERBALIZER_GRAMMAR)
+        self.compare_with_grammar(pn.Fst.read(VERBALIZER_GRAMMAR))
+
+    def test_compare_with_compiled_rules(self):
+        # numbers.grm and ordinal.grm compiled with pynini, runs without the compiled thrax grammar
+        self.compare_with_grammar(compile_number_grammar(LEXICON_DIR))
+
+    def compare_with_grammar(self, grammar):
+        for sem_class, digits in NUMBERS:
+            expected = grammar_verbalizations(grammar, sem_class, digits)
+            verbalized = self.verbalizer.verbalize(sem_class, digits)
+            self.assertEqual(set(expected), set(verbalized), sem_class + ' ' + digits)
+            for verbal, weight in expected.items():
+                self.assertAlmostEqual(weight, verbalized[verbal], places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
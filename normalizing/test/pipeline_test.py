@@ -0,0 +1,73 @@
+import time
+import unittest
+
+from pipeline import Pipeline
+from utterance_structure.utt_coll import Utterance
+
+
+def split_stage(settings):
+    # sentences separated by '. ', a paragraph containing 'FAIL' can't be split
+    from pipeline import PipelineItem
+
+    def process(item):
+        paragraph_ind, text = item
+        if 'FAIL' in text:
+            raise ValueError('split failed')
+        sentences = [sent for sent in text.split('. ') if sent]
+        if not sentences:
+            return [PipelineItem(paragraph_ind)]
+        return [PipelineItem(paragraph_ind, ind, len(sentences), Utterance(sent)) for ind, sent in enumerate(sentences)]
+
+    return process
+
+
+def classify_stage(settings):
+    # the first paragraph is slow
+    def process(item):
+        if item.paragraph_ind == 0:
+            time.sleep(0.5)
+        return [item]
+
+    return process
+
+
+def identity_stage(settings):
+    return lambda item: [item]
+
+
+def lm_stage(settings):
+    def process(item):
+        if item.utt and item.utt.normalized_sentence == Utterance.NOT_NORMALIZED:
+            item.utt.normalized_sentence = item.utt.original_sentence.upper()
+        return [item]
+
+    return process
+
+
+STUB_STAGES = {'split': split_stage, 'classify': classify_stage, 'verbalize': identity_stage, 'lm': lm_stage}
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_order(self):
+        paragraphs = ['fyrsta. önnur', '', 'þriðja FAIL. fjórða'] + ['setning ' + str(i) for i in range(20)]
+        consumed = []
+
+        def feed():
+            for paragraph in paragraphs:
+                consumed.append(paragraph)
+                yield paragraph
+
+        with Pipeline(stage_functions=STUB_STAGES, max_paragraphs=3) as pipeline:
+            utts = pipeline.run(feed())
+            first = next(utts)
+            # the paragraphs after the slow first one wait for it
+            self.assertLessEqual(len(consumed), 4)
+            normalized = [first.normalized_sentence] + [utt.normalized_sentence for utt in utts]
+        # the paragraph that could not be split is passed on unnormalized
+        self.assertEqual(['FYRSTA', 'ÖNNUR', 'þriðja FAIL. fjórða'] + ['SETNING ' + str(i) for i in range(20)],
+                         normalized)
+
+
+if __name__ == '__main__':
+    unittest.main()
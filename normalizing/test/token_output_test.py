@@ -0,0 +1,69 @@
+import io
+import unittest
+
+from utterance_structure.utt_coll import Utterance, Token, TokenType, PauseLength
+from utterance_structure import token_output
+
+
+class TestTokenOutput(unittest.TestCase):
+
+    def create_utterance(self):
+        utt = Utterance('Afkoma ársins 2017 .')
+        utt.normalized_sentence = 'Afkoma ársins tvö þúsund og sautján .'
+        for name, start, token_type in [('Afkoma', 0, TokenType.WORD), ('ársins', 6, TokenType.WORD),
+                                        ('2017', 12, None), ('.', 16, TokenType.PUNCT)]:
+            tok = Token()
+            tok.set_name(name)
+            tok.start_index = start
+            tok.end_index = start + len(name) - 1
+            if token_type:
+                tok.set_token_type(token_type)
+            else:
+                tok.set_semiotic_class('cardinal')
+            tok.set_verbalization_arr([name])
+            utt.ling_structure.tokens.append(tok)
+        utt.ling_structure.tokens[2].set_verbalization_arr([[['tvö'], ['þúsund'], ['og'], ['sautján']]])
+        utt.ling_structure.tokens[3].set_pause_length(PauseLength.PAUSE_LONG)
+        utt.ling_structure.tokens[3].set_phrase_break(True)
+        return utt
+
+    def test_token_records(self):
+        records = token_output.token_records(self.create_utterance(), sentence_id=3)
+        self.assertEqual(4, len(records))
+        self.assertEqual({'sentence_id': 3, 'token_id': 2, 'input': '2017', 'start_index': 12, 'end_index': 15,
+                          'token_type': 'sem_class', 'semiotic_class': 'cardinal',
+                          'verbalization': 'tvö þúsund og sautján', 'pause_length': 'none', 'phrase_break': False,
+                          'verbalization_failed': False}, records[2])
+        self.assertEqual('long', records[3]['pause_length'])
+        self.assertTrue(records[3]['phrase_break'])
+
+    def test_columns(self):
+        utt = self.create_utterance()
+        columns = token_output.to_columns([utt, utt], first_sentence_id=10)
+        self.assertEqual(token_output.FIELDS, list(columns.keys()))
+        self.assertEqual([10, 10, 10, 10, 11, 11, 11, 11], columns['sentence_id'])
+        self.assertEqual(['Afkoma', 'ársins', '2017', '.'] * 2, columns['input'])
+
+    def test_jsonl(self):
+        utt = self.create_utterance()
+        out = io.StringIO()
+        token_output.write_jsonl([utt], out)
+        lines = token_output.read_jsonl(io.StringIO(out.getvalue()))
+        self.assertEqual(1, len(lines))
+        self.assertEqual(utt.normalized_sentence, lines[0]['normalized'])
+        self.assertEqual([0, 6, 12, 16], lines[0]['tokens']['start_index'])
+        self.assertEqual(['', '', 'cardinal', ''], lines[0]['tokens']['semiotic_class'])
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+        arr = token_output.to_numpy([self.create_utterance()])
+        self.assertEqual(4, len(arr))
+        self.assertEqual('tvö þúsund og sautján', arr[2]['verbalization'])
+        self.assertEqual(15, arr['end_index'][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
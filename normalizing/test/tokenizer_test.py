@@ -0,0 +1,23 @@
+import unittest
+
+from tokenizer import Tokenizer
+
+TEXT = 'Afkoma ársins 2017 var góð. Hagnaður fyrir óinnleysta fjármagnsliði hefur aldrei verið meiri. ' \
+       'Selt magn var 14,3 twst og jókst um 5,1% milli ára.'
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_iter_sentences(self):
+        tok = Tokenizer()
+        try:
+            expected = tok.tokenize_sentence(TEXT)
+        except LookupError:
+            self.skipTest('nltk punkt model not installed')
+        sentences = tok.iter_sentences(TEXT)
+        self.assertEqual(expected[0], next(sentences))
+        self.assertEqual(expected[1:], list(sentences))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from enum import Enum
+
+from utterance_structure import utt_codec
+from utterance_structure.utt_coll import Utterance, TokenType
+
+
+def as_tree(obj):
+    # the object graph as nested builtins, to compare decoded and original utterances
+    if isinstance(obj, list):
+        return [as_tree(elem) for elem in obj]
+    if isinstance(obj, tuple):
+        return tuple(as_tree(elem) for elem in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, Enum):
+        return type(obj), {name: as_tree(value) for name, value in obj.__dict__.items()}
+    return type(obj), obj
+
+
+class TestUttCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        utt = utt_codec.example_utterance()
+        utt.ling_structure.tokens[0].start_index = -3
+        utt.ling_structure.tokens[0].weight = 0.25
+        utt.ling_structure.tokens[0].alignment = (1, 'a')
+        decoded = utt_codec.decode(utt_codec.encode(utt))
+        self.assertEqual(as_tree(utt), as_tree(decoded))
+        self.assertIs(TokenType.PUNCT, decoded.ling_structure.tokens[-1].token_type)
+        self.assertEqual(utt.get_test_output(), decoded.get_test_output())
+
+    def test_empty_utterance(self):
+        utt = Utterance('')
+        self.assertEqual(as_tree(utt), as_tree(utt_codec.decode(utt_codec.encode(utt))))
+
+    def test_invalid_data(self):
+        data = utt_codec.encode(utt_codec.example_utterance())
+        self.assertRaises(utt_codec.CodecError, utt_codec.decode, b'XXXX' + data[4:])
+        self.assertRaises(utt_codec.CodecError, utt_codec.decode, data[:4] + bytes([99]) + data[5:])
+        self.assertRaises(utt_codec.CodecError, utt_codec.encode, object())
+
+
+if __name__ == '__main__':
+    unittest.main()
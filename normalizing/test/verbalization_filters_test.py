@@ -0,0 +1,71 @@
+import unittest
+
+import pynini as pn
+
+from number_verbalizer import NumberVerbalizer
+from verbalization_filters import VerbalizationFilters, filter_strings, valid_pos_pattern
+
+LEXICON_DIR = 'data/thrax_grammar/verbalize_tags/lexicon/'
+
+
+def utf8_symbols():
+    # a utf8 symbol table as of thrax, the space is '0x0020'
+    symbols = pn.SymbolTable()
+    symbols.add_symbol('<eps>', 0)
+    symbols.add_symbol('0x0020', 32)
+    for c in [chr(i) for i in range(33, 127)] + list('áéíóúýþæöðÁÉÍÓÚÝÞÆÖÐ'):
+        symbols.add_symbol(c, ord(c))
+    return symbols
+
+
+class TestVerbalizationFilters(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.symbols = utf8_symbols()
+        cls.filters = VerbalizationFilters.from_lexicon(LEXICON_DIR, cls.symbols)
+        cls.number_verbalizer = NumberVerbalizer(LEXICON_DIR)
+
+    def verbalized_fst(self, verbalizations):
+        return pn.string_map([' '.join('0x0020' if c == ' ' else c for c in verbal) for verbal in verbalizations],
+                             input_token_type=self.symbols, output_token_type=self.symbols)
+
+    def test_pos_pattern(self):
+        self.assertTrue(valid_pos_pattern('tuttugasta_lhenvf og fyrsta_lhenvf'))
+        self.assertFalse(valid_pos_pattern('tuttugasta_lhenvf og fyrsta_lheþvf'))
+        # the number of 'one' is ignored
+        self.assertTrue(valid_pos_pattern('tuttugu og eitt_tfhen þúsund_tfhfn'))
+
+    def test_filter_strings(self):
+        verbalizations = ['sjö_tfhfn hundruð og sjötíu og sjö', 'sjö_tfhfn hundruð sjötíu og sjö',
+                          'sjö_tfhfn hundruð og sjötíu sjö', 'sjö_tfhfn hundruð sjötíu sjö', ' hundrað og sjötíu',
+                          ' hundrað sjötíu', 'tuttugasta_lhenvf og fyrsta_lheþvf']
+        self.assertEqual(['sjö_tfhfn hundruð sjötíu og sjö', 'hundrað og sjötíu'], filter_strings(verbalizations))
+        self.assertEqual(['sjö_tfhfn hundruð sjötíu og sjö'],
+                         filter_strings(['sjö_tfhfn hundruð og sjötíu og sjö'], one_best=True))
+        # the separator starts a new number
+        self.assertEqual(['hundrað og sjötíu til tuttugu og tveir_tfkfn'],
+                         filter_strings(['hundrað og sjötíu til tuttugu og tveir_tfkfn']))
+
+    def test_fst_filters(self):
+        numbers = [('cardinal', str(i)) for i in range(0, 3000, 7)] + [('ordinal', str(i)) for i in range(0, 200, 3)]
+        for sem_class, digits in numbers:
+            verbalizations = list(self.number_verbalizer.verbalize(sem_class, digits))
+            if not verbalizations:
+                continue
+            verbalized_fst = self.verbalized_fst(verbalizations)
+            self.assertEqual(set(filter_strings(verbalizations)), set(self.filters.verbalizations(verbalized_fst)),
+                             sem_class + ' ' + digits)
+        ranges = [a + ' til ' + b for a in self.number_verbalizer.verbalize('cardinal', '170')
+                  for b in self.number_verbalizer.verbalize('cardinal', '1102')]
+        self.assertEqual(set(filter_strings(ranges)), set(self.filters.verbalizations(self.verbalized_fst(ranges))))
+
+    def test_generic_labels(self):
+        # characters that the filters do not depend on are relabeled and restored
+        verbalizations = ['Ýmis_character Ö_character', 'Ýmis_character og Ö_character']
+        self.assertEqual(['Ýmis_character og Ö_character'],
+                         self.filters.verbalizations(self.verbalized_fst(verbalizations)))
+
+
+if __name__ == '__main__':
+    unittest.main()
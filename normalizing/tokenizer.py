@@ -8,12 +8,19 @@ Contains tokenizer methods from the nltk.tokenize library.
 
 from nltk.tokenize import sent_tokenize
 from nltk.tokenize import TreebankWordTokenizer
+try:
+    from nltk.tokenize.punkt import PunktTokenizer
+except ImportError:
+    # nltk < 3.8.2
+    PunktTokenizer = None
 
 import re
 class Tokenizer:
 
     def __init__(self):
         self.tokenizer = TreebankWordTokenizer()
+        # punkt sentence tokenizer for iter_sentences(), loaded on first use
+        self.sentence_splitter = None
         # remove % and @ from the4th list as compared to original PUNCTUATION:
         self.tokenizer.PUNCTUATION = [
             (re.compile(r'([:,])([^\d])'), r' \1 \2'),
@@ -35,6 +42,20 @@ class Tokenizer:
         sentence_list = sent_tokenize(text)
         return sentence_list
 
+    def iter_sentences(self, text):
+        """
+        Lazy version of tokenize_sentence(): yields the sentences of text one by one, a sentence boundary is found
+        without tokenizing the rest of the text.
+        """
+        if not self.sentence_splitter:
+            if PunktTokenizer:
+                self.sentence_splitter = PunktTokenizer('english')
+            else:
+                import nltk.data
+                self.sentence_splitter = nltk.data.load('tokenizers/punkt/english.pickle')
+        for start, end in self.sentence_splitter.span_tokenize(text):
+            yield text[start:end]
+
     def tokenize_words(self, sentence):
         word_list = self.tokenizer.tokenize(sentence)
 
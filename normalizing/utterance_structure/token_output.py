@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structured token-level output of normalized utterances, such that consumers (TTS frontend, alignment tools) do not
+have to re-tokenize and re-align the normalized sentence strings.
+
+Each token of an utterance is one record with the fields in FIELDS. start_index and end_index are the character
+offsets of the token in the classifier input as set by the FSTParser (end_index inclusive), input is the
+corresponding token of the original sentence and verbalization the chosen verbalization, aligned as in
+Utterance.get_test_output().
+
+Output formats:
+    - columns: a dict of field name -> list of values, all lists have one entry per token
+    - JSON lines: one line per utterance, the tokens as columns (write_jsonl())
+    - NumPy structured array (to_numpy(), requires numpy)
+    - Arrow record batch (to_arrow(), requires pyarrow)
+
+"""
+
+import json
+
+FIELDS = ['sentence_id', 'token_id', 'input', 'start_index', 'end_index', 'token_type', 'semiotic_class',
+          'verbalization', 'pause_length', 'phrase_break', 'verbalization_failed']
+INT_FIELDS = ['sentence_id', 'token_id', 'start_index', 'end_index']
+BOOL_FIELDS = ['phrase_break', 'verbalization_failed']
+
+
+def token_records(utt, sentence_id=0):
+    """
+    Returns a list of dictionaries, one for each token in utt, with the fields in FIELDS.
+    """
+    records = []
+    token_verbalizations = utt.get_token_verbalizations()
+    for ind, tok in enumerate(utt.ling_structure.tokens):
+        inp, verbalization = token_verbalizations[ind] if ind < len(token_verbalizations) else ('', '')
+        records.append({'sentence_id': sentence_id,
+                        'token_id': ind,
+                        'input': inp,
+                        'start_index': tok.start_index,
+                        'end_index': tok.end_index,
+                        'token_type': tok.token_type.value if tok.token_type else '',
+                        'semiotic_class': tok.semiotic_class.name if tok.semiotic_class else '',
+                        'verbalization': verbalization,
+                        'pause_length': tok.pause_length.value,
+                        'phrase_break': tok.phrase_break,
+                        'verbalization_failed': tok.verbalization_failed})
+    return records
+
+
+def to_columns(utts, first_sentence_id=0):
+    """
+    Returns the tokens of all utterances in utts as columns: a dictionary of field name -> list of values.
+    Sentence ids are counted from first_sentence_id.
+    """
+    columns = {field: [] for field in FIELDS}
+    for sentence_id, utt in enumerate(utts, first_sentence_id):
+        for record in token_records(utt, sentence_id):
+            for field in FIELDS:
+                columns[field].append(record[field])
+    return columns
+
+
+def write_jsonl(utts, out, first_sentence_id=0):
+    """
+    Writes one json line per utterance in utts to the file object out: the sentence id, original and normalized
+    sentence, and the tokens as columns (without sentence_id).
+    """
+    for sentence_id, utt in enumerate(utts, first_sentence_id):
+        records = token_records(utt, sentence_id)
+        tokens = {field: [record[field] for record in records] for field in FIELDS if field != 'sentence_id'}
+        line = {'sentence_id': sentence_id,
+                'original': utt.original_sentence,
+                'normalized': utt.normalized_sentence,
+                'tokens': tokens}
+        out.write(json.dumps(line, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def read_jsonl(inp):
+    """
+    Reads utterance lines as written by write_jsonl() from the file object inp, returns a list of dictionaries.
+    """
+    return [json.loads(line) for line in inp if line.strip()]
+
+
+def to_numpy(utts, first_sentence_id=0):
+    """
+    Returns the tokens of all utterances in utts as a NumPy structured array with one row per token, string fields
+    as fixed width unicode.
+    """
+    import numpy as np
+
+    columns = to_columns(utts, first_sentence_id)
+    dtype = []
+    for field in FIELDS:
+        if field in INT_FIELDS:
+            dtype.append((field, np.int32))
+        elif field in BOOL_FIELDS:
+            dtype.append((field, np.bool_))
+        else:
+            dtype.append((field, 'U{}'.format(max([len(val) for val in columns[field]], default=1) or 1)))
+
+    arr = np.zeros(len(columns['token_id']), dtype=dtype)
+    for field in FIELDS:
+        arr[field] = columns[field]
+    return arr
+
+
+def to_arrow(utts, first_sentence_id=0):
+    """
+    Returns the tokens of all utterances in utts as a pyarrow RecordBatch with one row per token.
+    """
+    import pyarrow as pa
+
+    columns = to_columns(utts, first_sentence_id)
+    arrays = []
+    for field in FIELDS:
+        if field in INT_FIELDS:
+            arrays.append(pa.array(columns[field], type=pa.int32()))
+        elif field in BOOL_FIELDS:
+            arrays.append(pa.array(columns[field], type=pa.bool_()))
+        else:
+            arrays.append(pa.array(columns[field], type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=FIELDS)
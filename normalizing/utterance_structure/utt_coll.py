@@ -20,17 +20,32 @@ class UtteranceCollection:
 
 class Utterance(object):
 
+    # the normalized sentence of an utterance that has not been (successfully) verbalized
+    NOT_NORMALIZED = "I'm normalized"
+
     def __init__(self, inp):
         self.original_sentence = inp
-        self.normalized_sentence = "I'm normalized" # or same as original at initialization time?
+        self.normalized_sentence = self.NOT_NORMALIZED # or same as original at initialization time?
         self.ling_structure = LinguisticStructure(inp)
         self.tokenized = []
         self.tokenized_string = ""
         self.classified = ""
         self.reclassify = False
+        # the highest degradation tier used for the normalization under a time budget, 0: none (see deadline.py)
+        self.degradation_tier = 0
 
     def get_test_output(self):
-        test_output = []
+        test_output = [inp + '\t' + verbalization for inp, verbalization in self.get_token_verbalizations()]
+        test_output.append('####\t####')
+        return '\n'.join(test_output)
+
+    def get_token_verbalizations(self):
+        """
+        Aligns the tokens of the linguistic structure to the original input and to the normalized sentence.
+
+        :return: a list with an (input token, verbalization) tuple for each token in ling_structure.tokens
+        """
+        token_verbalizations = []
         original_input = self.original_sentence.split()
         normalized_output = self.normalized_sentence.split()
         org_ind = 0
@@ -45,9 +60,9 @@ class Utterance(object):
                 else:
                     verbalization = tok.verbalization_arr[0]
                 if org_ind >= len(original_input):
-                    test_output.append('' + '\t' + verbalization)
+                    token_verbalizations.append(('', verbalization))
                 else:
-                    test_output.append(original_input[org_ind] + '\t' + verbalization)
+                    token_verbalizations.append((original_input[org_ind], verbalization))
                 org_ind += 1
                 norm_ind += 1
             elif isinstance(tok.verbalization_arr[0], list):
@@ -80,7 +95,7 @@ class Utterance(object):
                         # we might have followed a wrong path, start over
                         current_verbalization = []
 
-                test_output.append(current_input_token + '\t' + ' '.join(current_verbalization))
+                token_verbalizations.append((current_input_token, ' '.join(current_verbalization)))
                 org_ind += 1
 
             else:
@@ -99,12 +114,11 @@ class Utterance(object):
                         #current_normalized = normalized_output[norm_ind]
                         break
 
-                test_output.append(current_input_token + '\t' + ' '.join(current_verbalization))
+                token_verbalizations.append((current_input_token, ' '.join(current_verbalization)))
                 org_ind += 1
                # norm_ind += 1
 
-        test_output.append('####\t####')
-        return '\n'.join(test_output)
+        return token_verbalizations
 
     #def to_jsonpickle(self, filename):
     #    json_enc = jsonpickle.encode(self)
@@ -166,6 +180,7 @@ class Token(object):
         self.phrase_break = False
         self.verbalization_arr = []
         self.verbalization_failed = False
+        self.reclassify = False
         self.start_index = 0
         self.end_index = 0
 
@@ -11,6 +11,8 @@ class Verbalized:
     def __init__(self):
         self.paths = []
         self.max_depth = 0
+        # set if at least one token has more than one verbalization
+        self.needs_disambiguation = False
 
     def __str__(self):
         return str(self.paths)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Filters for the verbalization paths of a token, compiled as FSTs and composed with the verbalized FST before its
+paths are listed, such that invalid and redundant verbalizations are never enumerated:
+
+    POS agreement:      all POS tags (word_tag) of a verbalization have to be the same, for the words of 'one'
+                        (einn, eitt, ...) the number is ignored (adjust_pos_for_one), e.g. 'tuttugasta_lhenvf og
+                        fyrsta_lhenvf' is valid, 'tuttugasta_lhenvf og fyrsta_lheþvf' is not.
+    connector cleanup:  the grammar allows 'og' (and) between all parts of a number, e.g.
+                        'sjö hundruð og sjötíu og sjö'. Only the last 'og' of a number is kept, where a separator
+                        ('komma', 'til') starts a new number if it occurs once in the verbalization. A verbalization is
+                        redundant if another one only differs in an 'og' in a later position, or if another one
+                        has an 'og' where it has none, e.g. 'sjö hundruð sjötíu og sjö' is kept and not
+                        'sjö hundruð og sjötíu sjö' or 'sjö hundruð sjötíu sjö'. Whitespace is normalized.
+
+The alternative sets are the same as of the former string post-processing of the verbalizer (valid_pos_pattern()
+and the pairwise comparison of the verbalizations), the POS agreement of more than one tagged word is checked for
+the tags of the grammar (read_tags()).
+
+The filters only depend on the characters of 'og', the separators, the tags and the words of 'one'. They are built
+once for these characters and a number of generic labels; the other characters of a verbalized FST are relabeled to
+the generic labels for filtering and back. Verbalized FSTs with more different characters than generic labels,
+and the native verbalizations of numbers, are filtered as strings with the same rules (filter_strings()), in
+linear time with lookups of the redundant variants of each verbalization.
+
+"""
+
+import os
+import re
+import pynini as pn
+from fst_compiler import FST_Compiler
+
+AND = 'og'
+SEPARATORS = ['komma', 'til']
+# the forms of 'one', their tag is agreeing with the tags of plural numbers
+ONE_WORDS = ['einn', 'einum', 'eins', 'ein', 'eina', 'einni', 'einnar', 'eitt', 'einu']
+# tags in the string literals of the grammar files, e.g. "einn_tfken", util.Insert["_character"]
+GRAMMAR_TAG = re.compile(r'"[^"\s]*_([^"\s_]+)"')
+# number of generic labels for the other characters of a verbalized FST
+GENERIC_LABELS = 64
+
+
+def adjust_pos_for_one(wrd, pos):
+    if wrd in ONE_WORDS:
+        pos = pos[:3] + 'f' + pos[-1]
+    return pos
+
+
+def valid_pos_pattern(verbalization):
+    if not '_' in verbalization:
+        return True
+
+    tokens = verbalization.split()
+    pos_set = set()
+    for tok in tokens:
+        if '_' in tok:
+            wrd, pos = tok.split('_')
+            pos = adjust_pos_for_one(wrd, pos)
+            pos_set.add(pos)
+            if len(pos_set) > 1:
+                return False
+
+    return len(pos_set) == 1
+
+
+def read_tags(lexicon_dir):
+    """
+    Returns the tag inventory of the verbalizer grammar: the tags of the words in the lexicon files of lexicon_dir
+    and in the string literals of the grammar files of its parent directory.
+    """
+    tags = set()
+    for filename in sorted(os.listdir(lexicon_dir)):
+        with open(os.path.join(lexicon_dir, filename)) as f:
+            for wrd in f.read().split():
+                if wrd.count('_') == 1 and not wrd.endswith('_'):
+                    tags.add(wrd.split('_')[1])
+    grammar_dir = os.path.dirname(os.path.normpath(lexicon_dir))
+    for filename in sorted(os.listdir(grammar_dir)):
+        if filename.endswith('.grm'):
+            with open(os.path.join(grammar_dir, filename)) as f:
+                for line in f:
+                    if not line.lstrip().startswith('#'):
+                        tags.update(GRAMMAR_TAG.findall(line))
+    return tags
+
+
+def path_strings(acceptor, utf8_symbols):
+    """
+    Returns the verbalizations of the paths of acceptor, an FST over utf8_symbols.
+    """
+    if acceptor.num_states() == 0:
+        return []
+    return [path.replace(' ', '').replace('0x0020', ' ')
+            for path in acceptor.paths(output_token_type=utf8_symbols).ostrings()]
+
+
+def filter_strings(verbalizations, one_best=False):
+    """
+    Applies the filters to a list of verbalizations, with one_best only the connector cleanup.
+
+    :return: the valid verbalizations, cleaned and without redundant ones, in the order of verbalizations
+    """
+    if not one_best:
+        verbalizations = [verbal for verbal in verbalizations if valid_pos_pattern(verbal)]
+    cleaned = {}
+    for verbal in verbalizations:
+        words = _delete_ands(verbal)
+        if words:
+            cleaned.setdefault(' '.join(words), words)
+    if one_best:
+        return list(cleaned)
+    return [verbal for verbal, words in cleaned.items() if not _is_redundant(words, cleaned)]
+
+
+def _separator(verbalization):
+    # the separator starting a new number, if it occurs once
+    for sep in SEPARATORS:
+        if verbalization.count(sep) == 1:
+            return sep
+    return None
+
+
+def _delete_ands(verbalization):
+    # deletes every 'og' followed by another 'og' in the same number
+    sep = _separator(verbalization)
+    result = []
+    later_and = False
+    for wrd in reversed(verbalization.split()):
+        if sep is not None and sep in wrd:
+            later_and = False
+        elif wrd == AND:
+            if later_and:
+                continue
+            later_and = True
+        result.append(wrd)
+    result.reverse()
+    return result
+
+
+def _is_redundant(words, verbalizations):
+    if AND not in words:
+        # an 'og' is missing
+        return any(' '.join(words[:i] + [AND] + words[i:]) in verbalizations for i in range(len(words) + 1))
+    first = words.index(AND)
+    if AND in words[first + 1:] and ' '.join(words[:first] + words[first + 1:]) in verbalizations:
+        # the first 'og' is superfluous
+        return True
+    for i, wrd in enumerate(words[:-1]):
+        # an 'og' can be moved to a later position
+        if wrd == AND and words[i + 1] != AND:
+            for j in range(i + 2, len(words) + 1):
+                if ' '.join(words[:i] + words[i + 1:j] + [AND] + words[j:]) in verbalizations:
+                    return True
+    return False
+
+
+class VerbalizationFilters:
+
+    SPACE = ' '
+    TAG_SEPARATOR = '_'
+
+    def __init__(self, utf8_symbols, tags):
+        """
+        :param utf8_symbols: the symbol table of the verbalized FSTs
+        :param tags: the tag inventory, see read_tags()
+        """
+        self.utf8_symbols = utf8_symbols
+        self.compiler = FST_Compiler(utf8_symbols, None)
+        characters = set(self.SPACE + self.TAG_SEPARATOR + AND + ''.join(SEPARATORS) + ''.join(ONE_WORDS) +
+                         ''.join(tags))
+        self.alphabet = {self._label(c) for c in characters} - {-1}
+        first_generic = max(label for label, symbol in utf8_symbols) + 1
+        self.generic_labels = list(range(first_generic, first_generic + GENERIC_LABELS))
+        labels = sorted(self.alphabet) + self.generic_labels
+        space = self._label(self.SPACE)
+
+        self.sigma_star = self._label_union(labels).closure().optimize()
+        self.non_space = self._label_union([label for label in labels if label != space])
+        self.word_char = self._label_union([label for label in labels
+                                            if label not in (space, self._label(self.TAG_SEPARATOR))])
+        self.pos_filter = self._pos_filter(tags)
+        self.connector_filter = self._connector_filter()
+        self._redundancy_filters()
+        for filter_fst in (self.pos_filter, self.connector_filter, self.no_and, self.insert_and, self.move_and,
+                           self.delete_first_and, self.unpad):
+            filter_fst.arcsort('ilabel')
+
+    @classmethod
+    def from_lexicon(cls, lexicon_dir, utf8_symbols):
+        return cls(utf8_symbols, read_tags(lexicon_dir))
+
+    def verbalizations(self, verbalized_fst, one_best=False):
+        """
+        Returns the valid verbalizations of verbalized_fst, the projected, epsilon-free output of the verbalizer
+        grammar. With one_best, only the connector cleanup is applied.
+        """
+        filtered = self.apply(verbalized_fst, one_best)
+        if filtered is None:
+            return filter_strings(path_strings(verbalized_fst, self.utf8_symbols), one_best)
+        return path_strings(filtered, self.utf8_symbols)
+
+    def apply(self, verbalized_fst, one_best=False):
+        """
+        Composes the filters with verbalized_fst (see verbalizations()).
+
+        :return: a deterministic acceptor of the valid verbalizations, None if verbalized_fst has more different
+            characters than the filters have generic labels
+        """
+        labels = {arc.olabel for state in verbalized_fst.states() for arc in verbalized_fst.arcs(state)}
+        others = sorted(labels - self.alphabet - {0})
+        if len(others) > len(self.generic_labels):
+            return None
+        to_generic = list(zip(others, self.generic_labels))
+        verbalized_fst = verbalized_fst.copy()
+        if to_generic:
+            verbalized_fst.relabel_pairs(ipairs=to_generic, opairs=to_generic)
+
+        verbalized_fst.arcsort('olabel')
+        if not one_best:
+            verbalized_fst = pn.compose(verbalized_fst, self.pos_filter)
+        padded = pn.compose(verbalized_fst, self.connector_filter).project('output').rmepsilon()
+        if not one_best and padded.num_states() > 0:
+            padded.arcsort('olabel')
+            missing_and = pn.compose(pn.compose(self.insert_and, padded).project('input'), self.no_and)
+            earlier_and = pn.union(pn.compose(self.move_and, padded).project('input'),
+                                   pn.compose(self.delete_first_and, padded).project('input'))
+            redundant = self._unweighted_dfa(pn.union(missing_and, earlier_and))
+            if redundant.num_states() > 0:
+                padded = pn.difference(padded, redundant)
+        padded.arcsort('olabel')
+        filtered = pn.compose(padded, self.unpad).project('output').rmepsilon()
+        if filtered.num_states() > 0:
+            filtered = pn.determinize(filtered)
+        if to_generic:
+            from_generic = [(generic, label) for label, generic in to_generic]
+            filtered.relabel_pairs(ipairs=from_generic, opairs=from_generic)
+        return filtered
+
+    #
+    #  PRIVATE METHODS
+    #
+
+    def _label(self, character):
+        label = self.utf8_symbols.find(character)
+        if label == -1:
+            label = self.utf8_symbols.find('0x%04x' % ord(character))
+        return label
+
+    def _accep(self, string):
+        return self.compiler.fst_stringcompile(string)
+
+    @staticmethod
+    def _label_union(labels):
+        union = pn.Fst()
+        start = union.add_state()
+        final = union.add_state()
+        union.set_start(start)
+        union.set_final(final)
+        for label in labels:
+            union.add_arc(start, pn.Arc(label, label, pn.Weight.one(union.weight_type()), final))
+        return union
+
+    @staticmethod
+    def _concat(*fsts):
+        result = fsts[0].copy()
+        for fst in fsts[1:]:
+            result.concat(fst)
+        return result.optimize()
+
+    @staticmethod
+    def _unweighted_dfa(fst):
+        fst = pn.arcmap(fst, map_type='rmweight').rmepsilon()
+        return pn.determinize(fst).minimize()
+
+    def _pos_filter(self, tags):
+        # verbalizations without tags, with one tag, or with agreeing tags of the inventory
+        space = self._accep(self.SPACE).closure(1)
+        spaces = self._accep(self.SPACE).closure()
+        word = self.word_char.copy().closure()
+        untagged = self.word_char.copy().closure(1)
+        tag_separator = self._accep(self.TAG_SEPARATOR)
+
+        no_tag = pn.difference(self.sigma_star, self._concat(self.sigma_star, tag_separator, self.sigma_star))
+        one_tag = self._concat(spaces, pn.concat(untagged, space).closure(), word, tag_separator, word,
+                               pn.concat(space, untagged).closure(), spaces)
+        one_word = pn.union(*[self._accep(wrd) for wrd in ONE_WORDS]).optimize()
+        non_one_word = pn.difference(word, one_word)
+        agreeing = []
+        for tag in sorted(set(tags) | {adjust_pos_for_one(ONE_WORDS[0], tag) for tag in tags}):
+            tagged = self._concat(non_one_word, tag_separator, self._accep(tag))
+            if len(tag) == 5 and tag[3] == 'f':
+                # the tags of the words of 'one' adjusted to tag
+                one_tags = self._concat(self._accep(tag[:3]), word, self._accep(tag[-1]))
+                tagged = pn.union(tagged, self._concat(one_word, tag_separator, one_tags))
+            token = pn.union(untagged, tagged).optimize()
+            agreeing.append(self._concat(spaces, pn.concat(token, space).closure(), token, spaces))
+        pos_filter = pn.union(no_tag, one_tag, *agreeing).rmepsilon()
+        return pn.determinize(pos_filter).minimize()
+
+    def _connector_filter(self):
+        # normalizes whitespace to ' w1 w2 ... wn ' (padded with spaces, verbalizations without words are removed)
+        # and deletes every 'og' followed by another 'og' in the same number
+        space = self._accep(self.SPACE)
+        word = self.non_space.copy().closure(1)
+        normalize = self._concat(pn.cross(space.copy().closure(), space), word,
+                                 pn.concat(pn.cross(space.copy().closure(1), space), word).closure(),
+                                 pn.cross(space.copy().closure(), space))
+
+        def containing(string):
+            return self._concat(self.sigma_star, self._accep(string), self.sigma_star)
+
+        def occurs_once(string):
+            none = pn.difference(self.sigma_star, containing(string))
+            return self._concat(none, self._accep(string), none)
+
+        def delete_ands(sep):
+            number_word = word if sep is None else pn.difference(word, containing(sep))
+            right = self._concat(pn.concat(number_word, space).closure(), self._accep(AND + self.SPACE))
+            return pn.cdrewrite(pn.cross(self._accep(AND + self.SPACE), pn.accep('')), space, right,
+                                self.sigma_star)
+
+        komma, til = SEPARATORS
+        komma_once = occurs_once(komma)
+        til_once = pn.difference(occurs_once(til), komma_once).optimize()
+        neither = pn.difference(pn.difference(self.sigma_star, komma_once), til_once).optimize()
+        connector_filter = pn.union(pn.compose(komma_once.arcsort('olabel'), delete_ands(komma)),
+                                    pn.compose(til_once.arcsort('olabel'), delete_ands(til)),
+                                    pn.compose(neither.arcsort('olabel'), delete_ands(None)))
+        return pn.compose(normalize.arcsort('olabel'), connector_filter.optimize()).optimize()
+
+    def _redundancy_filters(self):
+        # transducers from a padded verbalization to its redundant variants, see _is_redundant()
+        space = self._accep(self.SPACE)
+        word = self.non_space.copy().closure(1)
+        and_word = self._accep(AND + self.SPACE)
+        insert = pn.cross(pn.accep(''), and_word)
+        delete = pn.cross(and_word, pn.accep(''))
+        with_and = pn.union(self._concat(self.sigma_star, space, and_word, self.sigma_star),
+                            self._concat(self.sigma_star, space, self._accep(AND))).optimize()
+        self.no_and = pn.difference(self.sigma_star, with_and).optimize()
+        # ' a b ' -> ' a og b '
+        self.insert_and = self._concat(self.sigma_star, space, insert, self.sigma_star)
+        # ' a og b c ' -> ' a b og c '
+        not_and = pn.difference(word, self._accep(AND)).optimize()
+        self.move_and = self._concat(self.sigma_star, space, delete, not_and, pn.concat(space, word).closure(),
+                                     space, insert, self.sigma_star)
+        # ' a og b og c ' -> ' a b og c '
+        self.delete_first_and = self._concat(self.no_and, space, delete, self.sigma_star, space, and_word,
+                                             self.sigma_star)
+        # ' a b ' -> 'a b'
+        self.unpad = self._concat(pn.cross(space, pn.accep('')), self.sigma_star, pn.cross(space, pn.accep('')))
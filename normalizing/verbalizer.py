@@ -6,11 +6,18 @@ Verbalize semiotic class tokens for an utterance.
 
 """
 import pynini as pn
+import pywrapfst as fst
 import copy
 from timeit import default_timer as timer
 import re
 from fst_compiler import FST_Compiler
-from utt_coll import TokenType
+from profiler import fst_counts
+from functools import partial
+from model_registry import REGISTRY, load_lm, symbols_variant
+from number_verbalizer import NumberVerbalizer
+from verbalization_filters import VerbalizationFilters, filter_strings, path_strings
+from deadline import TIER_FULL, TIER_NO_LM, TIER_ONE_BEST, TIER_DIGITS
+from utt_coll import Token, TokenType
 from verbalized import Verbalized
 
 
@@ -18,48 +25,116 @@ class Verbalizer:
 
     SIL = '<sil>'
     UNK = '<unk>'
-    AND = 'og'
-    SEPARATORS = ['komma', 'til']
-
-    def __init__(self, path_to_grammar, path_to_lm, utf8_symbols, word_symbols):
+    # digit by digit reading (degradation tier TIER_DIGITS, see deadline.py)
+    DIGIT_WORDS = {'0': 'núll', '1': 'einn', '2': 'tveir', '3': 'þrír', '4': 'fjórir', '5': 'fimm', '6': 'sex',
+                   '7': 'sjö', '8': 'átta', '9': 'níu'}
+    # the decimal and group separators in digit by digit reading
+    SEPARATOR_WORDS = {',': 'komma', '.': 'punktur'}
+
+    def __init__(self, path_to_grammar, path_to_lm, utf8_symbols, word_symbols, compact_lm=False, max_paths=0,
+                 weight_threshold=None, profiler=None, lookahead=False, number_lexicon_dir=None,
+                 filter_lexicon_dir=None, memo=None, case_government=None, owner=None):
+        # path_to_grammar/path_to_lm can be None for a verbalizer that only creates token verbalizations
+        # (verbalize_tokens()) or only disambiguates (finalize()), see pipeline.py
+        # the grammar and the LM are shared with other configurations in this process (see model_registry.py),
+        # they are read-only
         #TODO: error handling for grammar reading
-        self.thrax_grammar = pn.Fst.read(path_to_grammar)
-        self.thrax_grammar.arcsort()
+        self.thrax_grammar = None
+        # with lookahead, path_to_grammar is an ilabel_lookahead FST, see lookahead_grammar.py
+        self.lookahead_grammar = None
+        if path_to_grammar and lookahead:
+            self.lookahead_grammar = REGISTRY.acquire('lookahead_grammar', path_to_grammar, owner)
+        elif path_to_grammar:
+            self.thrax_grammar = REGISTRY.acquire('grammar', path_to_grammar, owner)
         self.word_symbols = word_symbols
-        start = timer()
-        self.lm = pn.Fst.read(path_to_lm)
-        self.lm.set_input_symbols(self.word_symbols)
-        self.lm.set_output_symbols(self.word_symbols)
-        self.lm.arcsort()
-        end = timer()
-        print('LM-loading: ' + str(end - start))
+        self.compact_lm = compact_lm
+        self.lm = None
+        if path_to_lm:
+            start = timer()
+            if compact_lm:
+                # a read-only, arcsorted FST in a compact type (see language_modeling/lm.py --compact), reading it
+                # with pynini would copy it into a mutable vector FST
+                self.lm = REGISTRY.acquire('compact_lm', path_to_lm, owner)
+            else:
+                self.lm = REGISTRY.acquire('lm', path_to_lm, owner, loader=partial(load_lm, word_symbols=word_symbols),
+                                           variant=symbols_variant(word_symbols))
+            end = timer()
+            print('LM-loading: ' + str(end - start))
         self.utf8_symbols = utf8_symbols
         self.compiler = FST_Compiler(utf8_symbols, word_symbols)
         self.oov_queue = None
-
-
-    def verbalize(self, utt):
+        # limits for the verbalization paths of a token, applied before enumerating the paths (0/None: no limit)
+        self.max_paths = max_paths
+        self.weight_threshold = weight_threshold
+        self.path_stats = {'tokens': 0, 'nbest_limited': 0, 'threshold_pruned': 0, 'native': 0}
+        # native verbalization of cardinals and ordinals from the grammar lexicons, bypassing the grammar
+        self.number_verbalizer = NumberVerbalizer(number_lexicon_dir) if number_lexicon_dir else None
+        # POS agreement and connector cleanup of the verbalization paths as FST filters, with the tags of the grammar
+        # lexicons, else the listed paths are filtered as strings (see verbalization_filters.py)
+        self.filters = None
+        if filter_lexicon_dir and path_to_grammar:
+            self.filters = VerbalizationFilters.from_lexicon(filter_lexicon_dir, utf8_symbols)
+        # optional CaseGovernment, prunes the alternatives of a token in cases not governed by the preceding word
+        # (see case_government.py)
+        self.case_government = case_government
+        # optional DisambiguationMemo, resolves ambiguous tokens in known contexts without the LM
+        # (see disambiguation_memo.py)
+        self.memo = memo
+        # optional CompositionProfiler, records FST sizes, path counts and time per verbalized token
+        self.profiler = profiler
+        self._compose_counts = None
+
+
+    def verbalize(self, utt, deadline=None):
         """
         Verbalizes/normalizes the classified structures from utt and sets the normalized_sentence attribute of utt
         to the normalized version of the original_sentence.
 
         :param utt:
+        :param deadline: an optional Deadline, the verbalization degrades when its budget is used up
         :return:
         """
+        verbalization = self.verbalize_tokens(utt, deadline)
+        if verbalization:
+            self.finalize(utt, verbalization, deadline)
+
+    def verbalize_tokens(self, utt, deadline=None):
+        """
+        Creates the possible verbalizations of the tokens of utt. Returns None if utt has no tokens or if a token
+        could not be verbalized and utt is marked for re-classification.
+
+        :param utt:
+        :param deadline: an optional Deadline, tokens are verbalized with the one-best path or digit by digit when
+            its budget is used up (see deadline.py)
+        :return: a Verbalized object with the verbalization paths of utt
+        """
 
         tokens = utt.ling_structure.tokens
         if not tokens:
             print('No tokens for ' + utt.original_sentence)
-            return
+            return None
         verbalization = Verbalized()
         needs_disambiguation = False
 
-        for tok in tokens:
-            if tok.token_type == TokenType.SEMIOTIC_CLASS:
-                words = self._verbalize_token(tok)
-                needs_disambiguation = self._validate_verbalization(needs_disambiguation, tok, utt, words)
-                if utt.reclassify:
-                    return
+        for ind, tok in enumerate(tokens):
+            if tok.token_type == TokenType.SEMIOTIC_CLASS and tok.verbalization_arr:
+                # kept from a previous run on this utterance, only re-classified tokens are verbalized again
+                words = tok.verbalization_arr
+                if len(words) > 1:
+                    needs_disambiguation = True
+
+            elif tok.token_type == TokenType.SEMIOTIC_CLASS:
+                tier = deadline.token_tier(tok.name) if deadline else TIER_FULL
+                utt.degradation_tier = max(utt.degradation_tier, tier)
+                if tier == TIER_DIGITS:
+                    words = self._read_digits(tok)
+                else:
+                    words = self._verbalize_token(tok, one_best=(tier == TIER_ONE_BEST))
+                    needs_disambiguation = self._validate_verbalization(needs_disambiguation, tok, utt, words)
+                    if utt.reclassify:
+                        return None
+                    if self.case_government:
+                        words = self.case_government.prune(tokens, ind, words)
 
             elif tok.token_type == TokenType.PUNCT:
                 #words = [self.SIL]
@@ -74,8 +149,25 @@ class Verbalizer:
             tok.set_verbalization_arr(words)
             verbalization.extend_paths(words)
 
-        if needs_disambiguation or verbalization.max_depth > 1:
-            verbalized = self.disambiguate(verbalization)
+        verbalization.needs_disambiguation = needs_disambiguation
+        return verbalization
+
+    def finalize(self, utt, verbalization, deadline=None):
+        """
+        Chooses the best verbalization path (language model disambiguation if there is more than one) and sets
+        the normalized_sentence attribute of utt. With a deadline, the disambiguation is skipped when the budget is
+        used up or the tokens were already verbalized in a degraded tier.
+        """
+        needs_lm = verbalization.needs_disambiguation or verbalization.max_depth > 1
+        if needs_lm and deadline and (utt.degradation_tier > TIER_FULL or deadline.lm_tier() == TIER_NO_LM):
+            utt.degradation_tier = max(utt.degradation_tier, TIER_NO_LM)
+            verbalized = self._best_grammar_path(verbalization)
+
+        elif needs_lm and self.memo:
+            verbalized = self._disambiguate_with_memo(utt, verbalization, deadline)
+
+        elif needs_lm:
+            verbalized = self.disambiguate(verbalization, deadline, utt)
 
         else:
             verbalized_arr = [wrd for sublist in verbalization.paths[0] for wrd in sublist]
@@ -83,6 +175,34 @@ class Verbalizer:
 
         utt.normalized_sentence = verbalized
 
+    def read_utterance(self, utt):
+        """
+        Degradation tier TIER_DIGITS for a whole sentence that is not classified: creates a token for each word of
+        utt.tokenized and sets the normalized_sentence attribute of utt without the grammar and the language model.
+        Words and punctuation are kept as they are, the other tokens are read character by character.
+        """
+        utt.degradation_tier = TIER_DIGITS
+        verbalization = Verbalized()
+        start = 0
+        for wrd in utt.tokenized:
+            tok = Token()
+            tok.set_name(wrd)
+            tok.start_index = start
+            tok.end_index = start + len(wrd)
+            start = tok.end_index + 1
+            if wrd.isalpha() or not any(c.isalnum() for c in wrd):
+                tok.set_token_type(TokenType.WORD if wrd.isalpha() else TokenType.PUNCT)
+                tok.append_to_word(wrd)
+                words = [wrd]
+            else:
+                tok.set_token_type(TokenType.NEEDS_VERBALIZATION)
+                words = self._read_digits(tok)
+            tok.set_verbalization_arr(words)
+            utt.ling_structure.tokens.append(tok)
+            verbalization.extend_paths(words)
+
+        utt.normalized_sentence = self._best_grammar_path(verbalization) if verbalization.paths else ''
+
     @staticmethod
     def extract_string(arr):
         #TODO: util?
@@ -136,27 +256,15 @@ class Verbalizer:
 
         return result_arr
 
-    @staticmethod
-    def adjust_pos_for_one(wrd, pos):
-        if wrd in ['einn', 'einum', 'eins', 'ein', 'eina', 'einni', 'einnar', 'eitt', 'einu']:
-            pos = pos[:3] + 'f' + pos[-1]
-        return pos
-
-    def valid_pos_pattern(self, verbalization):
-        if not '_' in verbalization:
-            return True
-
-        tokens = verbalization.split()
-        pos_set = set()
-        for tok in tokens:
-            if '_' in tok:
-                wrd, pos = tok.split('_')
-                pos = self.adjust_pos_for_one(wrd, pos)
-                pos_set.add(pos)
-                if len(pos_set) > 1:
-                    return False
-
-        return len(pos_set) == 1
+    def print_path_stats(self):
+        print('Verbalized tokens: ' + str(self.path_stats['tokens']))
+        print('Limited to ' + str(self.max_paths) + '-best paths: ' + str(self.path_stats['nbest_limited']))
+        print('Pruned by weight threshold: ' + str(self.path_stats['threshold_pruned']))
+        print('Verbalized natively: ' + str(self.path_stats['native']))
+        if self.case_government:
+            self.case_government.print_stats()
+        if self.memo:
+            self.memo.print_metrics()
 
     #
     #  PRIVATE METHODS
@@ -167,8 +275,9 @@ class Verbalizer:
         word_str = self.extract_string(words)
         if len(word_str) > 1 and word_str == tok.name and not utt.reclassify:
             # verbalization failed, we create a space separated token name
-            # and mark the utterance for re-classification and verbalization
+            # and mark the token and the utterance for re-classification and verbalization
             tok.name = ' '.join(word_str)
+            tok.reclassify = True
             utt.reclassify = True
 
         elif len(words) > 1:
@@ -180,8 +289,16 @@ class Verbalizer:
     # CREATE POSSIBLE VERBALIZATIONS FOR A TOKEN
     #
 
-    def _verbalize_token(self, token):
+    def _verbalize_token(self, token, one_best=False):
+        # one_best: only the shortest path of the grammar (degradation tier TIER_ONE_BEST)
 
+        if self.number_verbalizer:
+            splitted_arr = self._verbalize_number(token, one_best)
+            if splitted_arr is not None:
+                return splitted_arr
+
+        if self.profiler:
+            start = self.profiler.start()
         verbalized_fst = self._create_verbalized_fst(token)
         ###############################
         # Baseline: no language model:
@@ -206,28 +323,89 @@ class Verbalizer:
             for c in token.name:
                 splitted_arr.append([c])
         else:
-            res = verbalized_fst.paths(output_token_type=self.utf8_symbols).ostrings()
-            p = list(res)
-            verbalized_arr = []
-            for elem in p:
-                verbal = elem.replace(' ', '')
-                verbal = verbal.replace('0x0020', ' ')
-                #for mixed modus: ensure every number has the same pos, in a multi number token
-                # 24. : tuttugustu_lvfnvf og fjórðu_lvfnvf and not: tuttugustu_lvfþvf og fjórðu_lvfnvf
-                if self.valid_pos_pattern(verbal):
-                    verbalized_arr.append(verbal)
+            if one_best:
+                self.path_stats['tokens'] += 1
+                verbalized_fst = pn.shortestpath(verbalized_fst).rmepsilon()
+            else:
+                verbalized_fst = self._limit_paths(verbalized_fst)
+            # for mixed modus: ensure every number has the same pos, in a multi number token
+            # 24. : tuttugustu_lvfnvf og fjórðu_lvfnvf and not: tuttugustu_lvfþvf og fjórðu_lvfnvf
+            # and remove superfluous 'og', see verbalization_filters.py
+            if self.filters:
+                verbalized_arr = self.filters.verbalizations(verbalized_fst, one_best)
+            else:
+                verbalized_arr = filter_strings(path_strings(verbalized_fst, self.utf8_symbols), one_best)
             splitted_arr = self._split_verbalized_arr(verbalized_arr)
 
+        if self.profiler:
+            sem_class = token.semiotic_class.name if token.semiotic_class else 'unknown'
+            self.profiler.record('verbalize', token.name, sem_class, start, compose_counts=self._compose_counts,
+                                 path_counts=fst_counts(verbalized_fst), paths=len(verbalized_arr) if fst_size else 0)
+
         return splitted_arr
 
 
+    def _verbalize_number(self, token, one_best=False):
+        # Verbalizes cardinals and ordinals without the grammar, returns None if the grammar is needed: for other
+        # classes, for numbers without verbalization, and when the number of paths has to be limited to the
+        # n-best paths of the grammar
+        sem_class = token.semiotic_class
+        # without threshold the number of paths has to be below max_paths, with threshold the pruned paths;
+        # for the one-best path, numbers with many paths are left to the shortest path of the grammar
+        max_count = self.max_paths if self.weight_threshold is None or one_best else None
+        alternatives = self.number_verbalizer.verbalize(sem_class.name, getattr(sem_class, 'integer', None) or '',
+                                                        max_count)
+        if not alternatives:
+            return None
+        if one_best:
+            best = min(alternatives, key=alternatives.get)
+            alternatives = {best: alternatives[best]}
+        elif self.weight_threshold is not None:
+            best = min(alternatives.values())
+            pruned = {verbal: weight for verbal, weight in alternatives.items()
+                      if weight <= best + self.weight_threshold}
+            if self.max_paths and len(pruned) > self.max_paths:
+                return None
+            if len(pruned) < len(alternatives):
+                self.path_stats['threshold_pruned'] += 1
+            alternatives = pruned
+
+        self.path_stats['tokens'] += 1
+        self.path_stats['native'] += 1
+        verbalized_arr = filter_strings(sorted(alternatives, key=alternatives.get), one_best)
+        return self._split_verbalized_arr(verbalized_arr)
+
+    def _read_digits(self, token):
+        # degradation tier TIER_DIGITS: reads the token character by character without the grammar, digits and
+        # separators as words, letters as they are, other characters are dropped
+        self.path_stats['tokens'] += 1
+        words = [[self.DIGIT_WORDS.get(c, c)] if c.isalnum() else [self.SEPARATOR_WORDS[c]] for c in token.name
+                 if c.isalnum() or c in self.SEPARATOR_WORDS]
+        return words or [[token.name]]
+
+    def _best_grammar_path(self, verbalization):
+        # degradation tier TIER_NO_LM: the first alternative of each word of the first path, without POS tags
+        best = []
+        for alternatives in verbalization.paths[0]:
+            wrd = alternatives
+            while isinstance(wrd, list):
+                wrd = wrd[0]
+            if '_' in wrd:
+                wrd = wrd[:wrd.index('_')]
+            best.append(wrd)
+        return ' '.join(best)
+
     def _create_verbalized_fst(self, token):
 
         token_fst = self.compiler.fst_stringcompile_token(token)
         #token_fst.draw('token.dot')
         #self.thrax_grammar.draw('formatted_digits_grammar.dot')
-        verbalized_fst = pn.compose(token_fst, self.thrax_grammar)
-        fst_size = verbalized_fst.num_states()
+        if self.lookahead_grammar:
+            verbalized_fst = self.lookahead_grammar.compose(token_fst)
+        else:
+            verbalized_fst = pn.compose(token_fst, self.thrax_grammar)
+        if self.profiler:
+            self._compose_counts = fst_counts(verbalized_fst)
         #verbalized_fst.draw('verbalized.dot')
         verbalized_fst.optimize()
         verbalized_fst.project(True)
@@ -237,6 +415,38 @@ class Verbalizer:
         return verbalized_fst
 
 
+    def _limit_paths(self, verbalized_fst):
+        # Long numbers, ranges and dates can have thousands of inflectional verbalization paths, bound their number
+        # in the FST before they are enumerated and filtered.
+        self.path_stats['tokens'] += 1
+        if self.weight_threshold is not None:
+            num_paths = self._count_paths(verbalized_fst)
+            verbalized_fst = pn.prune(verbalized_fst, weight=self.weight_threshold)
+            if self._count_paths(verbalized_fst) < num_paths:
+                self.path_stats['threshold_pruned'] += 1
+        if self.max_paths and self._count_paths(verbalized_fst, self.max_paths) > self.max_paths:
+            self.path_stats['nbest_limited'] += 1
+            verbalized_fst = pn.shortestpath(verbalized_fst, nshortest=self.max_paths, unique=True)
+            verbalized_fst.rmepsilon()
+
+        return verbalized_fst
+
+    @staticmethod
+    def _count_paths(acyclic_fst, max_count=None):
+        # number of successful paths of an acyclic fst, counting stops at max_count + 1
+        acyclic_fst.topsort()
+        zero = pn.Weight(acyclic_fst.weight_type(), 'Infinity')
+        path_counts = [0] * acyclic_fst.num_states()
+        for state in reversed(range(acyclic_fst.num_states())):
+            count = 0 if acyclic_fst.final(state) == zero else 1
+            for arc in acyclic_fst.arcs(state):
+                count += path_counts[arc.nextstate]
+            if max_count is not None:
+                count = min(count, max_count + 1)
+            path_counts[state] = count
+
+        return path_counts[acyclic_fst.start()]
+
     def _split_verbalized_arr(self, verbalized_arr):
 
         # ['níu hundruð og tvö', 'níu hundruð og tvær', 'níu hundruð og tveir'] ->
@@ -249,8 +459,6 @@ class Verbalizer:
         #     [[...]]]
 
 
-        verbalized_arr = self._clean_connectors(verbalized_arr)
-
         if not self._needs_splitting(verbalized_arr):
             return verbalized_arr
 
@@ -277,73 +485,23 @@ class Verbalizer:
         return result_arr
 
 
-    def _clean_connectors(self, verbalization_arr):
-        # For now we are dealing with AND/og in verbalized numbers. The grammar allows for e.g.
-        # sjö hundruð og sjötíu og sjö (seven hundred and seventy and seven).
-        # Delete superfluous 'og' and choose a version with 'og' in the last possible position,
-        # as opposed to e.g. sjö hundruð og sjötíu sjö (which is a non-valid verbalization).
-
-        result = []
-
-        for elem in verbalization_arr:
-            arr = self._remove_connectors(elem)
-            result.append(' '.join(arr))
-
-        for res in result:
-            # now every string should have max one 'og' - choose the one with the 'og' in last possible position,
-            # given that all other elements are equal, and remove the others
-            for r in result:
-                diff = [i for i in res.split() if i not in r.split()]
-                if diff == [self.AND]:
-                    result[result.index(r)] = ''
-                elif not diff:
-                    if self.AND in r and self.AND in res:
-                        if res.index(self.AND) > r.index(self.AND):
-                            result[result.index(r)] = ''
-
-        while '' in result:
-            result.remove('')
-
-        return result
-
-
-    def _remove_connectors(self, elem):
-        removed = False
-        for sep in self.SEPARATORS:
-            splitted = elem.split(sep)
-            if len(splitted) == 2:
-                arr = self._delete_and(splitted[0].split())
-                arr2 = self._delete_and(splitted[1].split())
-                arr.append(sep)
-                arr.extend(arr2)
-                removed = True
-                break
-        if not removed:
-            arr = self._delete_and(elem.split())
-
-        return arr
-
-    def _delete_and(self, arr):
-        DELETE = 'delete_me'
-
-        if self.AND in arr and len(arr) > 3:
-            last_and_index = len(arr) - arr[::-1].index(self.AND) - 1
-            while arr.index(self.AND) != last_and_index:
-                arr[arr.index(self.AND)] = DELETE
-                if not self.AND in arr:
-                    break
-        while DELETE in arr:
-            arr.remove(DELETE)
-        return arr
-
     #
     # DISAMBIGUATE AND FINALIZE VERBALIZATION
     #
 
-    def disambiguate(self, verbalization):
+    def disambiguate(self, verbalization, deadline=None, utt=None):
+        """
+        Scores each verbalization path with the language model and returns the normalized text of the best one.
+        With a deadline, the paths left when the budget for the disambiguation is used up are not scored, the best
+        of the scored paths is taken and the degradation tier of utt is set to TIER_NO_LM.
+        """
         normalized = {}
         replacement_dicts = {}
         for verbal_arr in verbalization.paths:
+            if normalized and deadline and deadline.lm_tier() == TIER_NO_LM:
+                if utt:
+                    utt.degradation_tier = max(utt.degradation_tier, TIER_NO_LM)
+                break
             shortest_path = self._language_model_scoring(verbal_arr)
             normalized_text = shortest_path.stringify(token_type=self.word_symbols)
             normalized[normalized_text] = pn.shortestdistance(shortest_path)
@@ -364,6 +522,51 @@ class Verbalizer:
         return best_normalized
 
 
+    def lm_best_path(self, verbal_arr):
+        """
+        Scores verbal_arr, a list of word slots (lists of alternative words), with the language model.
+
+        :return: the word symbol labels of the best path and its cost, ([], inf) if there is no path
+        """
+        shortest_path = self._language_model_scoring(verbal_arr)
+        state = shortest_path.start()
+        if state == pn.NO_STATE_ID:
+            return [], float('inf')
+        labels = []
+        cost = 0.0
+        while shortest_path.num_arcs(state):
+            arc = next(iter(shortest_path.arcs(state)))
+            if arc.olabel:
+                labels.append(arc.olabel)
+            cost += float(arc.weight.to_string())
+            state = arc.nextstate
+
+        return labels, cost + float(shortest_path.final(state).to_string())
+
+    def word_label(self, symbol):
+        # the label of symbol in the LM lattice, unknown symbols are <unk>
+        label = self.word_symbols.find(symbol)
+        return label if label != -1 else self.word_symbols.find(self.UNK)
+
+    def _disambiguate_with_memo(self, utt, verbalization, deadline=None):
+        # resolves the ambiguous tokens known to the memo, the LM is only called if ambiguous tokens are left
+        resolved = self.memo.resolve(utt.ling_structure.tokens)
+        if resolved is None:
+            return self.disambiguate(verbalization, deadline, utt)
+        memo_verbalization = Verbalized()
+        for words in resolved:
+            memo_verbalization.extend_paths(words)
+        if len(memo_verbalization.paths) == 1 and all(len(slot) == 1 for slot in memo_verbalization.paths[0]):
+            self.memo.metrics['lm_skipped'] += 1
+            verbalized = ' '.join(wrd[:wrd.index('_')] if '_' in wrd else wrd
+                                  for slot in memo_verbalization.paths[0] for wrd in slot)
+        else:
+            verbalized = self.disambiguate(memo_verbalization, deadline, utt)
+        if self.memo.audit:
+            self.memo.record_agreement(verbalized == self.disambiguate(verbalization))
+
+        return verbalized
+
     def _lowest_cost(self, normalized):
         if len(normalized) == 1:
             return list(normalized.keys())[0]
@@ -398,7 +601,10 @@ class Verbalizer:
         word_fst.project(True)
         word_fst.arcsort()
         #word_fst.draw('word_fst.dot')
-        lm_intersect = pn.intersect(word_fst, self.lm)
+        if self.compact_lm:
+            lm_intersect = pn.Fst.from_pywrapfst(fst.intersect(word_fst, self.lm))
+        else:
+            lm_intersect = pn.intersect(word_fst, self.lm)
         lm_intersect.optimize()
         #lm_intersect.draw('lm_intersect.dot')
         shortest_path = pn.shortestpath(lm_intersect).optimize()